@@ -1,32 +1,52 @@
 import os
+import asyncio
+import json
 import logging
 import re
-from groq import Groq
-from app.core.config import settings
-from typing import List, Dict
+import time
+from json_repair import repair_json
+from groq import Groq, AsyncGroq, APITimeoutError, BadRequestError, RateLimitError
+from pydantic import BaseModel, ValidationError
+from app.core.config import LLMRoute, settings
+from app.core.llm_client import get_async_client
+from app.core.hedging import llm_hedger, is_hedged_task
+from app.core.llm_cache import llm_cache, llm_cache_key, is_cacheable_task
+from app.core.metrics import llm_request_duration, llm_outcome, record_llm_usage
+from app.core.rate_limiter import rate_limiter_for, estimate_tokens
+from app.core.singleflight import llm_singleflight
+from typing import Any, List, Dict, Optional, AsyncIterator, Awaitable, Tuple, Type, TypeVar
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
 
 class ConversableAgent:
     """A base class for AI agents that can converse with each other."""
 
-    def __init__(self, name: str, system_message: str, client: Groq, model: str = settings.GROQ_MODEL_DEFAULT):
+    def __init__(self, name: str, system_message: str, client: Groq, model: str = settings.GROQ_MODEL_DEFAULT, async_client: Optional[AsyncGroq] = None):
         self.name = name
         self.system_message = system_message
         self.model = model
         self.client = client
+        self._async_client = async_client
 
-    def get_image_query_from_text(self, text: str) -> str:
-        """Extract keywords from a text to be used as an image query."""
-        if not self.client or not text or text.isspace():
-            return ""
+    @property
+    def async_client(self) -> AsyncGroq:
+        """The async client used by the `a*` methods; defaults to the shared pool."""
+        return self._async_client or get_async_client()
 
-        if not isinstance(text, str):
-            logging.warning(f"Input to get_image_query_from_text is not a string: {text}")
-            return ""
+    # ---------------------------------------------------------------------
+    # PROMPT HELPERS (shared by the sync and async APIs)
+    # ---------------------------------------------------------------------
+    def _image_query_prompt(self, text: str) -> Optional[str]:
+        """Build the keyword-extraction prompt, or None if the text is unusable."""
+        if not text or not isinstance(text, str) or text.isspace():
+            if text and not isinstance(text, str):
+                logging.warning(f"Input to get_image_query_from_text is not a string: {text}")
+            return None
 
         # Truncate the text to the first 500 characters to avoid overly long prompts
         truncated_text = text[:500]
 
-        prompt = f"""Analyze the following text and extract a concise, 3-5 word image search query that visually represents the core concepts.
+        return f"""Analyze the following text and extract a concise, 3-5 word image search query that visually represents the core concepts.
 
         **Instructions:**
         1.  **Think Visually:** Focus on concrete objects, actions, and metaphors described in the text.
@@ -39,44 +59,451 @@ class ConversableAgent:
         **Search Query:**
         """
 
+    def _parse_image_query(self, content: str) -> str:
+        keywords = (content or "").strip().lower()
+
+        # Add a check to ensure the returned keywords are not too long
+        if len(keywords) > 75:
+            logging.warning(f"Returned keywords are too long: {keywords}")
+            return ""
+
+        return keywords.strip()
+
+    def _image_queries_prompt(self, sections: List[Tuple[str, str]]) -> str:
+        """Prompt extracting one image query per (title, text) pair in a single call."""
+        section_list = "\n".join(
+            f'{i}. Title: {title}\n   Text: "{(text or "")[:500]}"' for i, (title, text) in enumerate(sections, start=1)
+        )
+        return f"""For each numbered section below, write a concise, 3-5 word image search query that visually represents its core concepts.
+
+        **Instructions:**
+        1.  **Think Visually:** Focus on concrete objects, actions, and metaphors described in the text.
+        2.  **Be Specific:** Instead of "business", think "team collaborating office". Instead of "data", think "glowing data network".
+        3.  **Format:** Each query is a single, lowercase, space-separated string without punctuation.
+        4.  **Output Format:** Return ONLY a JSON object of the form {{"queries": [{{"index": 1, "query": "..."}}, ...]}} with exactly one entry per section.
+
+        **Sections:**
+        {section_list}
+        """
+
+    def _parse_image_queries(self, content: str, count: int) -> List[Optional[str]]:
+        """Map a batch response to one query per section; None where the entry is missing or unusable."""
+        queries: List[Optional[str]] = [None] * count
+        data = self._parse_json(content)
+        entries = data.get("queries") if isinstance(data, dict) else data
+        if not isinstance(entries, list):
+            return queries
+        for position, entry in enumerate(entries):
+            if isinstance(entry, dict):
+                index, query = entry.get("index"), entry.get("query")
+            else:
+                index, query = position + 1, entry
+            if not isinstance(index, int) or not 1 <= index <= count or not isinstance(query, str):
+                continue
+            parsed = self._parse_image_query(query)
+            if parsed:
+                queries[index - 1] = parsed
+        return queries
+
+    def _parse_json(self, content: Optional[str]) -> Any:
+        """Decode a JSON response, repairing it if needed; None if nothing usable came back."""
+        if not content:
+            return None
+        try:
+            return json.loads(content)
+        except json.JSONDecodeError:
+            try:
+                return json.loads(repair_json(content))
+            except (json.JSONDecodeError, ValueError) as e:
+                logging.warning(f"Agent '{self.name}' returned unparseable JSON: {e}")
+                return None
+
+    def _validate_items(self, items: Any, schema: Type[ModelT]) -> Tuple[List[ModelT], List[Any]]:
+        """Validate list elements one by one; returns (valid models, malformed elements)."""
+        if not isinstance(items, list):
+            return [], []
+        valid, malformed = [], []
+        for item in items:
+            try:
+                valid.append(schema.model_validate(item))
+            except ValidationError as e:
+                logging.warning(f"Agent '{self.name}' returned a malformed {schema.__name__}: {e.errors()[0].get('msg')}")
+                malformed.append(item)
+        return valid, malformed
+
+    def _build_messages(self, message_history: List[Dict]) -> List[Dict]:
+        return [
+            {"role": "system", "content": self.system_message},
+            message_history[-1], # Only send the last user message
+        ]
+
+    # ---------------------------------------------------------------------
+    # ROUTING (shared by the sync and async APIs)
+    # ---------------------------------------------------------------------
+    def _resolve_route(self, task: Optional[str], model: Optional[str] = None) -> LLMRoute:
+        """Routing entry for a task; an explicit `model` wins, then the route's, then the agent's."""
+        route = settings.llm_route(task)
+        return route.model_copy(update={"model": model or route.model or self.model})
+
+    def _route_models(self, route: LLMRoute) -> List[str]:
+        """Models to try in order: the primary, then the fallback when it differs."""
+        models = [route.model]
+        if route.fallback_model and route.fallback_model != route.model:
+            models.append(route.fallback_model)
+        return models
+
+    def _skip_to_fallback(self, model: str, estimated_tokens: int, final: bool) -> bool:
+        """True when the primary's limiter would hold us back longer than falling back costs."""
+        if final:
+            return False
+        wait = rate_limiter_for(model).expected_wait(estimated_tokens)
+        if wait > settings.LLM_FALLBACK_MAX_WAIT:
+            logging.info(f"Agent '{self.name}': {model} is over quota for {wait:.1f}s; using the fallback model")
+            return True
+        return False
+
+    def _request_kwargs(self, model: str, route: LLMRoute) -> Dict:
+        kwargs = {"model": model, "temperature": route.temperature}
+        if route.max_tokens:
+            kwargs["max_tokens"] = route.max_tokens
+        if route.timeout:
+            kwargs["timeout"] = route.timeout
+        if self._json_mode(route):
+            kwargs["response_format"] = {"type": "json_object"}
+        return kwargs
+
+    def _json_mode(self, route: LLMRoute) -> bool:
+        return route.json_mode and settings.LLM_JSON_MODE_ENABLED
+
+    def _without_json_mode(self, route: LLMRoute, error: BadRequestError) -> LLMRoute:
+        """Groq answers 400 when a JSON-mode generation isn't valid JSON; retry unconstrained and repair instead."""
+        logging.warning(f"Agent '{self.name}': JSON mode request was rejected ({error}); retrying without response_format")
+        return route.model_copy(update={"json_mode": False})
+
+    def _log_fallback(self, model: str, fallback: str, error: Exception) -> None:
+        reason = "timed out" if isinstance(error, APITimeoutError) else "is over quota"
+        logging.warning(f"Agent '{self.name}': {model} {reason}; falling back to {fallback}")
+
+    def _observe_call(self, task: Optional[str], model: str, attempt: int, started: float, error: Optional[BaseException] = None) -> None:
+        """Record one model call (including any rate-limiter wait) in the LLM latency histogram."""
+        llm_request_duration.observe(
+            time.perf_counter() - started,
+            agent=self.name,
+            task=task or "default",
+            model=model,
+            attempt=str(attempt),
+            outcome=llm_outcome(error),
+        )
+
+    # ---------------------------------------------------------------------
+    # ASYNC API
+    # ---------------------------------------------------------------------
+    async def _arate_limited(self, model: str, estimated_tokens: int, send, final: bool = True):
+        """Run `send()` once the model's rate limiter grants capacity.
+
+        429s feed their retry-after into the limiter, which then holds back every
+        agent in the process. The last model in a route retries once capacity
+        frees up; a primary with a fallback raises so the caller can switch.
+        """
+        limiter = rate_limiter_for(model)
+        retries = settings.GROQ_RATE_LIMIT_RETRIES if final else 0
+        for attempt in range(retries + 1):
+            await limiter.acquire(estimated_tokens)
+            try:
+                return await send()
+            except RateLimitError as e:
+                limiter.update_from_headers(e.response.headers, rate_limited=True)
+                if attempt == retries:
+                    raise
+                logging.warning(f"Agent '{self.name}' hit the rate limit; retrying after limiter backoff")
+
+    async def _awith_fallback(self, route: LLMRoute, estimated_tokens: int, call):
+        """Run `call(model, final)` on the route's primary model, then on its fallback
+        if the primary times out or is over quota."""
+        models = self._route_models(route)
+        for i, model in enumerate(models):
+            final = i == len(models) - 1
+            if self._skip_to_fallback(model, estimated_tokens, final):
+                continue
+            try:
+                return await call(model, final)
+            except (APITimeoutError, RateLimitError) as e:
+                if final:
+                    raise
+                self._log_fallback(model, models[i + 1], e)
+
+    async def _acall_model(self, messages: List[Dict], model: str, route: LLMRoute, final: bool = True, task: Optional[str] = None, attempt: int = 1) -> str:
+        """Send one chat completion through the model's rate limiter."""
+        estimated = estimate_tokens(messages, route.max_tokens)
+        # Don't let the SDK retry a primary that has somewhere to fall back to
+        client = self.async_client if final else self.async_client.with_options(max_retries=0)
+        started = time.perf_counter()
         try:
-            resp = self.client.chat.completions.create(
-                model=settings.GROQ_MODEL_DEFAULT,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2, # Lower temperature for more focused output
+            raw = await self._arate_limited(
+                model,
+                estimated,
+                lambda: client.chat.completions.with_raw_response.create(
+                    messages=messages,
+                    **self._request_kwargs(model, route),
+                ),
+                final=final,
             )
-            keywords = resp.choices[0].message.content.strip().lower()
-            
-            # Add a check to ensure the returned keywords are not too long
-            if len(keywords) > 75:
-                logging.warning(f"Returned keywords are too long: {keywords}")
-                return ""
-
-            return keywords.strip()
+            limiter = rate_limiter_for(model)
+            limiter.update_from_headers(raw.headers)
+            chat_completion = await raw.parse()
+        except Exception as e:
+            self._observe_call(task, model, attempt, started, e)
+            if isinstance(e, BadRequestError) and self._json_mode(route):
+                return await self._acall_model(messages, model, self._without_json_mode(route, e), final, task=task, attempt=attempt)
+            raise
+        self._observe_call(task, model, attempt, started)
+        usage = getattr(chat_completion, "usage", None)
+        limiter.reconcile(estimated, getattr(usage, "total_tokens", None))
+        record_llm_usage(self.name, task, model, usage)
+        return chat_completion.choices[0].message.content
+
+    async def astream_response(self, message_history: List[Dict], task: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream a response as content deltas; errors propagate to the caller.
+
+        The fallback model is only used if the primary fails before streaming starts.
+        """
+        messages = self._build_messages(message_history)
+        route = self._resolve_route(task)
+        estimated = estimate_tokens(messages, route.max_tokens)
+
+        async def open_stream(model: str, final: bool):
+            client = self.async_client if final else self.async_client.with_options(max_retries=0)
+            started = time.perf_counter()
+            try:
+                stream = await self._arate_limited(
+                    model,
+                    estimated,
+                    lambda: client.chat.completions.create(
+                        messages=messages,
+                        stream=True,
+                        **self._request_kwargs(model, route),
+                    ),
+                    final=final,
+                )
+            except Exception as e:
+                self._observe_call(task, model, 1, started, e)
+                raise
+            return model, stream, started
+
+        model, stream, started = await self._awith_fallback(route, estimated, open_stream)
+        limiter = rate_limiter_for(model)
+        limiter.update_from_headers(stream.response.headers)
+        error: Optional[BaseException] = None
+        try:
+            async with stream:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+                    # Groq reports usage on the final chunk under x_groq
+                    usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+                    if usage is not None:
+                        limiter.reconcile(estimated, getattr(usage, "total_tokens", None))
+                        record_llm_usage(self.name, task, model, usage)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            # The histogram covers the whole stream, not just time to first byte
+            self._observe_call(task, model, 1, started, error)
+
+    async def _acreate_completion(self, messages: List[Dict], task: Optional[str] = None, model: Optional[str] = None, refresh_cache: bool = False, attempt: int = 1) -> str:
+        """Single entry point for async chat completions; returns the message content.
+
+        The task's route picks the model, sampling parameters and fallback.
+        Tasks listed in `LLM_CACHE_TASKS` are served from the response cache.
+        `refresh_cache` skips the lookup but still stores the fresh answer.
+        Concurrent identical requests share one underlying call, except
+        refreshes, which would otherwise get back the answer they bypass.
+        Tasks in `LLM_HEDGE_TASKS` get a backup request when the first one is
+        slow.
+        `attempt` is the caller's retry count, recorded in the latency metrics.
+        """
+        route = self._resolve_route(task, model)
+        request_key = llm_cache_key(task, route, self.system_message, messages)
+        cacheable = is_cacheable_task(task)
+        if cacheable and not refresh_cache:
+            cached = await llm_cache.aget(request_key)
+            if cached is not None:
+                return cached
+
+        def complete() -> Awaitable[str]:
+            return self._awith_fallback(
+                route,
+                estimate_tokens(messages, route.max_tokens),
+                lambda model, final: self._acall_model(messages, model, route, final, task=task, attempt=attempt),
+            )
+
+        async def call() -> str:
+            if is_hedged_task(task):
+                content = await llm_hedger.run(f"{task}:{route.model}", complete)
+            else:
+                content = await complete()
+            if cacheable and content:
+                await llm_cache.aset(request_key, content)
+            return content
+
+        if refresh_cache:
+            return await call()
+        return await llm_singleflight.do(request_key, call)
+
+    async def aget_image_query_from_text(self, text: str) -> str:
+        """Extract keywords from a text to be used as an image query."""
+        prompt = self._image_query_prompt(text)
+        if not prompt:
+            return ""
+
+        try:
+            content = await self._acreate_completion([{"role": "user", "content": prompt}], task="image_query")
+            return self._parse_image_query(content)
         except Exception as e:
             logging.error(f"Error extracting keywords from text: {e}")
             return ""
 
-    def generate_response(self, message_history: List[Dict]) -> str:
+    async def aget_image_queries(self, sections: List[Tuple[str, str]]) -> List[str]:
+        """Image queries for many (title, text) pairs from one LLM call.
+
+        Sections the batch response doesn't cover (or the whole batch, if it
+        can't be parsed) fall back to `aget_image_query_from_text`.
+        """
+        if not sections:
+            return []
+        if len(sections) == 1:
+            return [await self.aget_image_query_from_text(sections[0][1])]
+
+        queries: List[Optional[str]] = [None] * len(sections)
+        try:
+            content = await self._acreate_completion(
+                [{"role": "user", "content": self._image_queries_prompt(sections)}], task="image_query_batch"
+            )
+            queries = self._parse_image_queries(content, len(sections))
+        except Exception as e:
+            logging.error(f"Error extracting batched image queries: {e}")
+
+        missing = [i for i, query in enumerate(queries) if query is None]
+        if missing:
+            logging.warning(f"Batched image query extraction missed {len(missing)}/{len(sections)} sections; falling back to per-section calls")
+            fallbacks = await asyncio.gather(*(self.aget_image_query_from_text(sections[i][1]) for i in missing))
+            for i, query in zip(missing, fallbacks):
+                queries[i] = query
+        return queries
+
+    async def agenerate_json(self, message_history: List[Dict], task: str) -> Any:
+        """Like `agenerate_response`, decoded as JSON; routes with `json_mode` get a JSON object back."""
+        return self._parse_json(await self.agenerate_response(message_history, task=task))
+
+    async def agenerate_response(self, message_history: List[Dict], task: Optional[str] = None, refresh_cache: bool = False, attempt: int = 1) -> str:
+        """Generate a response based on the message history without blocking the event loop."""
+        try:
+            response = await self._acreate_completion(
+                self._build_messages(message_history), task=task, refresh_cache=refresh_cache, attempt=attempt
+            )
+            logging.info(f"✅ Agent '{self.name}' generated response: {(response or '')[:100]}...")
+            return response
+
+        except Exception as e:
+            logging.error(f"Error generating response from agent '{self.name}': {e}")
+            return ""
+
+    # ---------------------------------------------------------------------
+    # SYNC API (thin shims for callers that run in worker threads)
+    # ---------------------------------------------------------------------
+    def _call_model(self, messages: List[Dict], model: str, route: LLMRoute, final: bool = True, task: Optional[str] = None, attempt: int = 1) -> str:
+        """Blocking counterpart of `_acall_model`."""
+        estimated = estimate_tokens(messages, route.max_tokens)
+        limiter = rate_limiter_for(model)
+        client = self.client if final else self.client.with_options(max_retries=0)
+        retries = settings.GROQ_RATE_LIMIT_RETRIES if final else 0
+        started = time.perf_counter()
+        for retry in range(retries + 1):
+            limiter.acquire_blocking(estimated)
+            try:
+                raw = client.chat.completions.with_raw_response.create(
+                    messages=messages,
+                    **self._request_kwargs(model, route),
+                )
+            except RateLimitError as e:
+                limiter.update_from_headers(e.response.headers, rate_limited=True)
+                if retry == retries:
+                    self._observe_call(task, model, attempt, started, e)
+                    raise
+                logging.warning(f"Agent '{self.name}' hit the rate limit; retrying after limiter backoff")
+                continue
+            except Exception as e:
+                self._observe_call(task, model, attempt, started, e)
+                if isinstance(e, BadRequestError) and self._json_mode(route):
+                    return self._call_model(messages, model, self._without_json_mode(route, e), final, task=task, attempt=attempt)
+                raise
+
+            self._observe_call(task, model, attempt, started)
+            limiter.update_from_headers(raw.headers)
+            chat_completion = raw.parse()
+            usage = getattr(chat_completion, "usage", None)
+            limiter.reconcile(estimated, getattr(usage, "total_tokens", None))
+            record_llm_usage(self.name, task, model, usage)
+            return chat_completion.choices[0].message.content
+
+    def _create_completion(self, messages: List[Dict], task: Optional[str] = None, model: Optional[str] = None, refresh_cache: bool = False, attempt: int = 1) -> str:
+        """Blocking counterpart of `_acreate_completion`."""
+        route = self._resolve_route(task, model)
+        cache_key = None
+        if is_cacheable_task(task):
+            cache_key = llm_cache_key(task, route, self.system_message, messages)
+            if not refresh_cache:
+                cached = llm_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+
+        def complete() -> str:
+            estimated = estimate_tokens(messages, route.max_tokens)
+            models = self._route_models(route)
+            for i, model in enumerate(models):
+                final = i == len(models) - 1
+                if self._skip_to_fallback(model, estimated, final):
+                    continue
+                try:
+                    return self._call_model(messages, model, route, final, task=task, attempt=attempt)
+                except (APITimeoutError, RateLimitError) as e:
+                    if final:
+                        raise
+                    self._log_fallback(model, models[i + 1], e)
+
+        if is_hedged_task(task):
+            content = llm_hedger.run_blocking(f"{task}:{route.model}", complete)
+        else:
+            content = complete()
+        if cache_key and content:
+            llm_cache.set(cache_key, content)
+        return content
+
+    def get_image_query_from_text(self, text: str) -> str:
+        """Extract keywords from a text to be used as an image query."""
+        prompt = self._image_query_prompt(text)
+        if not self.client or not prompt:
+            return ""
+
+        try:
+            content = self._create_completion([{"role": "user", "content": prompt}], task="image_query")
+            return self._parse_image_query(content)
+        except Exception as e:
+            logging.error(f"Error extracting keywords from text: {e}")
+            return ""
+
+    def generate_response(self, message_history: List[Dict], task: Optional[str] = None, refresh_cache: bool = False, attempt: int = 1) -> str:
         """Generate a response based on the message history."""
         if not self.client:
             logging.warning("⚠️ Missing GROQ_API_KEY.")
             return ""
 
-        messages = [
-            {"role": "system", "content": self.system_message},
-            message_history[-1], # Only send the last user message
-        ]
-
         try:
-            chat_completion = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0.7,
+            response = self._create_completion(
+                self._build_messages(message_history), task=task, refresh_cache=refresh_cache, attempt=attempt
             )
-
-            response = chat_completion.choices[0].message.content
-            logging.info(f"✅ Agent '{self.name}' generated response: {response[:100]}...")
+            logging.info(f"✅ Agent '{self.name}' generated response: {(response or '')[:100]}...")
             return response
 
         except Exception as e:
@@ -2,18 +2,21 @@ import os
 import logging
 import httpx
 import asyncio
-import json
 from typing import List, Dict, Optional, Any
 from groq import Groq
 from app.core.config import settings
+from app.core.llm_client import get_sync_client
+from app.core.metrics import timed_async_transport
+from app.core.singleflight import image_search_singleflight
 from .base_agent import ConversableAgent
 from sqlalchemy.ext.asyncio import AsyncSession
 from app import crud
-from json_repair import repair_json
+from app.schemas import RfpDigest, TechStackItem
+from .rfp_digest_agent import format_rfp_digest
 
 
-# Initialize Groq client
-client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
+# Shared Groq client
+client = get_sync_client()
 
 class ContentWriterAgent(ConversableAgent):
     """AI-powered agent for writing the content of proposal sections."""
@@ -119,7 +122,6 @@ class ContentWriterAgent(ConversableAgent):
 
     async def search_pixabay_images(self, client: httpx.AsyncClient, query: str) -> List[Dict]:
         """Search relevant business or tech imagery via Pixabay API."""
-        PIXABAY_API_URL = "https://pixabay.com/api/"
         params = {
             "key": settings.PIXABAY_API_KEY,
             "q": query,
@@ -128,7 +130,7 @@ class ContentWriterAgent(ConversableAgent):
         }
         try:
             logging.info(f"Searching Pixabay for: {query}")
-            res = await client.get(PIXABAY_API_URL, params=params)
+            res = await client.get(settings.PIXABAY_API_URL, params=params)
             res.raise_for_status()
             data = res.json()
             logging.info(f"Pixabay API response: {data}")
@@ -146,7 +148,6 @@ class ContentWriterAgent(ConversableAgent):
 
     async def search_pexels_images(self, client: httpx.AsyncClient, query: str) -> List[Dict]:
         """Search relevant business or tech imagery via Pexels API."""
-        PEXELS_API_URL = "https://api.pexels.com/v1/search"
         headers = {
             "Authorization": settings.PEXELS_API_KEY
         }
@@ -156,7 +157,7 @@ class ContentWriterAgent(ConversableAgent):
         }
         try:
             logging.info(f"Searching Pexels for: {query}")
-            res = await client.get(PEXELS_API_URL, headers=headers, params=params)
+            res = await client.get(settings.PEXELS_API_URL, headers=headers, params=params)
             res.raise_for_status()
             data = res.json()
             logging.info(f"Pexels API response: {data}")
@@ -167,8 +168,15 @@ class ContentWriterAgent(ConversableAgent):
             return []
 
     async def search_images(self, query: str, provider: str = "both") -> List[Dict]:
-        """Search for images from multiple providers and return the best results."""
-        async with httpx.AsyncClient() as client:
+        """Search for images from multiple providers and return the best results.
+
+        Concurrent searches for the same query and provider share one set of provider calls.
+        """
+        results = await image_search_singleflight.do((query, provider), lambda: self._search_images(query, provider))
+        return list(results)
+
+    async def _search_images(self, query: str, provider: str) -> List[Dict]:
+        async with httpx.AsyncClient(transport=timed_async_transport()) as client:
             tasks = []
             if provider == "pexels" or provider == "both":
                 tasks.append(self.search_pexels_images(client, query))
@@ -202,11 +210,11 @@ class ContentWriterAgent(ConversableAgent):
             "original-line"       # Original colors with line art
         ]
         
-        async with httpx.AsyncClient() as client:
+        async with httpx.AsyncClient(transport=timed_async_transport()) as client:
             valid_variants = []
             for variant in variants:
                 # Using the exact devicon CDN URL structure
-                url = f"https://cdn.jsdelivr.net/gh/devicons/devicon/icons/{tech_slug}/{tech_slug}-{variant}.svg"
+                url = f"{settings.DEVICON_CDN_URL}/{tech_slug}/{tech_slug}-{variant}.svg"
                 try:
                     response = await client.head(url)
                     if response.status_code == 200:
@@ -218,7 +226,7 @@ class ContentWriterAgent(ConversableAgent):
             # If no variants found, try the base icon
             if not valid_variants:
                 try:
-                    url = f"https://cdn.jsdelivr.net/gh/devicons/devicon/icons/{tech_slug}/{tech_slug}.svg"
+                    url = f"{settings.DEVICON_CDN_URL}/{tech_slug}/{tech_slug}.svg"
                     response = await client.head(url)
                     if response.status_code == 200:
                         valid_variants.append(tech_slug)
@@ -248,7 +256,7 @@ class ContentWriterAgent(ConversableAgent):
                     # Use the first available variant
                     variant = variants[0]
                     # Construct URL using exact devicon CDN format
-                    logo_url = f"https://cdn.jsdelivr.net/gh/devicons/devicon/icons/{tech_slug}/{variant}.svg"
+                    logo_url = f"{settings.DEVICON_CDN_URL}/{tech_slug}/{variant}.svg"
                     tech_logos.append({
                         "name": tech_name,
                         "logo_url": logo_url,
@@ -275,89 +283,93 @@ class ContentWriterAgent(ConversableAgent):
 
 
 
-    async def analyze_tech_stack(self, rfp: str, proposal_content: str, db: AsyncSession) -> List[Dict]:
-        """Analyze the RFP and proposal content to identify the technology stack."""
+    async def analyze_tech_stack(self, rfp_digest: RfpDigest, proposal_content: str, db: AsyncSession) -> List[Dict]:
+        """Analyze the RFP digest and proposal content to identify the technology stack."""
         prompt = f"""As a senior solution architect, your task is to analyze the provided RFP and proposal content to identify the key technologies that form the proposed solution.
 
         **Context:**
-        - **RFP:** ```{rfp}```
+        - **RFP Digest:** ```{format_rfp_digest(rfp_digest)}```
         - **Proposal Content:** ```{proposal_content}```
 
         **Instructions:**
         1.  **Identify Core Technologies:** From the documents, extract only the specific technologies (languages, frameworks, databases, platforms, tools) that are actively part of the proposed technical solution.
         2.  **Exclude Mentions:** Do NOT include technologies that are merely mentioned or part of the client's existing infrastructure unless they are being integrated with.
         3.  **Provide Descriptions:** For each technology, write a concise, one-sentence description of its role in the project.
-        4.  **Output Format:** Return a valid JSON array of objects inside a ```json ... ``` block. Each object must have two keys: "name" (string) and "description" (string).
+        4.  **Output Format:** Return ONLY a JSON object with a single key "technologies" holding an array of objects. Each object must have two keys: "name" (string) and "description" (string).
 
         **Example:**
-        ```json
-        [
-          {{
-            "name": "React",
-            "description": "The primary frontend framework for building a responsive and interactive user interface."
-          }},
-          {{
-            "name": "FastAPI",
-            "description": "The backend framework for creating high-performance, asynchronous APIs to power the application."
-          }},
-          {{
-            "name": "PostgreSQL",
-            "description": "The relational database used for storing all application data securely and efficiently."
-          }}
-        ]
-        ```
-
-        Return ONLY the JSON array.
+        {{
+          "technologies": [
+            {{
+              "name": "React",
+              "description": "The primary frontend framework for building a responsive and interactive user interface."
+            }},
+            {{
+              "name": "FastAPI",
+              "description": "The backend framework for creating high-performance, asynchronous APIs to power the application."
+            }},
+            {{
+              "name": "PostgreSQL",
+              "description": "The relational database used for storing all application data securely and efficiently."
+            }}
+          ]
+        }}
         """
-        response_text = self.generate_response(
-            message_history=[{"role": "user", "content": prompt}]
-        )
-        logging.info(f"Tech stack analysis response: {response_text}")
-        
-        try:
-            tech_data = json.loads(repair_json(response_text))
-            logging.info(f"Parsed tech data: {tech_data}")
-        except json.JSONDecodeError as e:
-            logging.error(f"LLM tech extraction failed or returned invalid result: {e}")
-            tech_data = []
+        tech_data = await self.agenerate_json([{"role": "user", "content": prompt}], task="tech_stack")
+        logging.info(f"Parsed tech data: {tech_data}")
+
+        items = tech_data.get("technologies", tech_data) if isinstance(tech_data, dict) else tech_data
+        if isinstance(items, dict):
+            # Tolerate the {"React": "description", ...} shape
+            items = [{"name": name, "description": description} for name, description in items.items()]
+        technologies, malformed = self._validate_items(items, TechStackItem)
+        if malformed:
+            technologies += await self._describe_technologies(malformed, rfp_digest)
 
         logos = []
-        if isinstance(tech_data, dict):
-            for name, description in tech_data.items():
-                if name:
-                    tech_logos = await self.search_tech_logos(db, name)
-                    if tech_logos:
-                        for tech_logo in tech_logos:
-                            logos.append({
-                                "name": tech_logo["name"],
-                                "logo_url": tech_logo["logo_url"],
-                                "description": description,
-                                "source": tech_logo.get("source", "unknown")
-                            })
-        elif isinstance(tech_data, list):
-            for item in tech_data:
-                if isinstance(item, dict) and "name" in item and "description" in item:
-                    name = item["name"]
-                    description = item["description"]
-                    tech_logos = await self.search_tech_logos(db, name)
-                    if tech_logos:
-                        for tech_logo in tech_logos:
-                            logos.append({
-                                "name": tech_logo["name"],
-                                "logo_url": tech_logo["logo_url"],
-                                "description": description,
-                                "source": tech_logo.get("source", "unknown")
-                            })
+        for tech in technologies:
+            tech_logos = await self.search_tech_logos(db, tech.name)
+            for tech_logo in tech_logos:
+                logos.append({
+                    "name": tech_logo["name"],
+                    "logo_url": tech_logo["logo_url"],
+                    "description": tech.description,
+                    "source": tech_logo.get("source", "unknown")
+                })
 
         logging.info(f"Found {len(logos)} technology logos with descriptions")
         return logos
 
-    async def generate_section(self, section_title: str, rfp_text: str, full_proposal_content: str, db: AsyncSession) -> dict:
+    async def _describe_technologies(self, malformed: List[Any], rfp_digest: RfpDigest) -> List[TechStackItem]:
+        """Re-request just the malformed tech-stack entries that at least carry a name."""
+        names = list(dict.fromkeys(
+            str(item["name"]).strip() for item in malformed
+            if isinstance(item, dict) and isinstance(item.get("name"), str) and item["name"].strip()
+        ))
+        if not names:
+            return []
+
+        prompt = f"""For each technology below, write a concise, one-sentence description of its role in the project described by this RFP digest.
+
+        **RFP Digest:** ```{format_rfp_digest(rfp_digest)}```
+        **Technologies:** {", ".join(names)}
+
+        Return ONLY a JSON object with a single key "technologies" holding an array of objects with the keys "name" (string) and "description" (string).
+        """
+        tech_data = await self.agenerate_json([{"role": "user", "content": prompt}], task="tech_stack")
+        items = tech_data.get("technologies") if isinstance(tech_data, dict) else tech_data
+        technologies, _ = self._validate_items(items, TechStackItem)
+        wanted = {name.lower() for name in names}
+        return [tech for tech in technologies if tech.name.strip().lower() in wanted]
+
+    async def generate_section(self, section_title: str, rfp_digest: RfpDigest, full_proposal_content: str, db: AsyncSession) -> dict:
         """Generates content, images, and tech logos for a single section."""
+        rfp_context = format_rfp_digest(rfp_digest)
         # 1. Generate content
         # Base prompt for generating section content
         content_prompt = f"""As an expert proposal writer, generate a compelling and professional section for a business proposal titled '{section_title}'.
-        The content should be based on the following RFP: {rfp_text}
+        The content should be based on the following RFP digest:
+        {rfp_context}
 
         **Instructions:**
         - The tone should be professional, confident, and persuasive.
@@ -373,7 +385,8 @@ class ContentWriterAgent(ConversableAgent):
         if "payment milestone" in section_title.lower():
             content_prompt = f"""As an expert proposal writer, generate a detailed HTML table for a section titled '{section_title}'.
 
-            **Based on this RFP:** {rfp_text}
+            **Based on this RFP digest:**
+            {rfp_context}
 
             **Instructions:**
             1.  **Output:** Generate ONLY the HTML `<table>` element. Do not include `<html>` or `<body>` tags.
@@ -384,7 +397,8 @@ class ContentWriterAgent(ConversableAgent):
         elif "cost" in section_title.lower() or "pricing" in section_title.lower():
             content_prompt = f"""As an expert proposal writer, generate a detailed HTML table for a section titled '{section_title}'.
 
-            **Based on this RFP:** {rfp_text}
+            **Based on this RFP digest:**
+            {rfp_context}
 
             **Instructions:**
             1.  **Output:** Generate ONLY the HTML `<table>` element. Do not include `<html>` or `<body>` tags.
@@ -396,7 +410,7 @@ class ContentWriterAgent(ConversableAgent):
         content_html = ""
         for i in range(3): # Retry up to 3 times
             message_history = [{"role": "user", "content": content_prompt}]
-            response = self.generate_response(message_history)
+            response = await self.agenerate_response(message_history, task="section")
             
             if response and len(response) > 100:
                 content_html = response
@@ -411,14 +425,14 @@ class ContentWriterAgent(ConversableAgent):
         # 2. Analyze for tech logos if it's the Technology Stack section
         tech_logos = []
         if "technology stack" in section_title.lower():
-            tech_logos = await self.analyze_tech_stack(rfp_text, full_proposal_content, db)
+            tech_logos = await self.analyze_tech_stack(rfp_digest, full_proposal_content, db)
 
         # 3. Search for images for other sections
         image_urls = []
         if "technology stack" not in section_title.lower() and "about us" not in section_title.lower() and "company" not in section_title.lower() and "logo" not in section_title.lower() and "payment milestone" not in section_title.lower():
             try:
-                rfp_keywords = self.get_image_query_from_text(rfp_text)
-                content_keywords = self.get_image_query_from_text(content_html)
+                rfp_keywords = " ".join(rfp_digest.keywords[:3])
+                content_keywords = await self.aget_image_query_from_text(content_html)
                 image_query = f"{section_title} {rfp_keywords} {content_keywords}".strip()
                 image_query = image_query[:100]
                 logging.info(f"Searching for image with query: {image_query}")
@@ -482,7 +496,7 @@ class ContentWriterAgent(ConversableAgent):
         enhanced_content_html = ""
         for i in range(3):  # Retry up to 3 times
             message_history = [{"role": "user", "content": prompt}]
-            response = self.generate_response(message_history)
+            response = await self.agenerate_response(message_history, task="enhance")
 
             if response and len(response) > 100:  # Basic validation for response length
                 enhanced_content_html = response
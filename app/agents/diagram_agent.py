@@ -1,25 +1,84 @@
+import asyncio
+import html
 import logging
-import os
+import random
 import re
 import time
-from typing import Dict, Any
-from groq import Groq, RateLimitError, APIError
+from datetime import date
+from typing import Dict, Any, List, Optional
+from groq import Groq
+from app.core.chart_classifier import ChartSuggestion, classify_chart
+from app.core.chart_themes import apply_theme, strip_theme
 from app.core.config import settings
+from app.core.html_tables import extract_tables, parse_number
+from app.core.llm_cache import TieredCache, make_cache_key
+from app.core.llm_client import get_sync_client
+from app.core.mermaid_repair import mermaid_repairer
+from app.core.mermaid_validator import validate_mermaid
+from app.schemas import Proposal
 from .base_agent import ConversableAgent
 
 # ---------------------------------------------------------------------
 # GLOBAL CONFIG
 # ---------------------------------------------------------------------
-client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
-RATE_LIMIT_BACKOFF_TIME = 15
+client = get_sync_client()
 MAX_RETRIES = 4
 
+chart_cache = TieredCache(
+    name="chart",
+    max_entries=settings.CHART_CACHE_MAX_ENTRIES,
+    disk_path=settings.CHART_CACHE_DISK_PATH,
+    ttl_seconds=settings.CHART_CACHE_TTL_SECONDS,
+    disk_max_entries=settings.CHART_CACHE_DISK_MAX_ENTRIES,
+)
+
+
+def normalize_chart_description(description: str) -> str:
+    """Description text without HTML tags, entities or layout whitespace."""
+    text = html.unescape(re.sub(r"<[^>]+>", " ", description or ""))
+    return " ".join(text.split())
+
+
+# Share of the project span per phase; development gets the remainder
+GANTT_PHASES = (("Discovery", 0.10), ("Design", 0.15), ("Development", None), ("Launch", 0.15))
+GANTT_MAX_TASKS = 8
+
+
+def _list_items(description: str) -> List[str]:
+    """Text of the <li> items in an HTML description, in order."""
+    items = []
+    for item in re.findall(r"<li[^>]*>(.*?)</li>", description or "", re.DOTALL | re.IGNORECASE):
+        text = normalize_chart_description(item)
+        if text:
+            items.append(text)
+    return items
+
+
+def _gantt_task_name(text: str, limit: int = 40) -> str:
+    # ':' ',' ';' and '#' end or break a gantt task line
+    name = " ".join(re.sub(r"[:;,#]", " ", text).split())
+    return name if len(name) <= limit else name[:limit - 1].rstrip() + "…"
+
+
+# Table rows and columns the pie synthesizer leaves out
+_PIE_TOTAL_ROW = re.compile(r"^(?:grand\s+|sub\s*-?)?totals?\b", re.IGNORECASE)
+_PIE_SKIP_COLUMN = re.compile(r"\b(?:year|date|id|no\.?|qty|quantity|rate|unit price|#)(?:\W|$)", re.IGNORECASE)
+_PIE_SHARE_COLUMN = re.compile(r"%|\b(?:percent(?:age)?|share|allocation|split)\b", re.IGNORECASE)
+PIE_MAX_SLICES = 12
+
+
+def chart_cache_key(chart_type: str, description: str) -> str:
+    return make_cache_key("chart", settings.GROQ_MODEL_DIAGRAM, chart_type.lower(), normalize_chart_description(description))
+
 
 # ---------------------------------------------------------------------
 # EXCEPTIONS
 # ---------------------------------------------------------------------
 class ChartValidationError(Exception):
-    pass
+    def __init__(self, message: str, chart_code: Optional[str] = None):
+        super().__init__(message)
+        # The invalid code after local repair, for an LLM fix on the next attempt
+        self.chart_code = chart_code
 
 
 class ChartGenerationError(Exception):
@@ -39,154 +98,404 @@ class DiagramAgent(ConversableAgent):
             client=client,
         )
         self.valid_keywords = [
-            "graph", "gantt", "pie", "sequence", "mindmap", "journey", "c4", "%%"
+            "graph", "flowchart", "gantt", "pie", "sequence", "mindmap", "journey", "user_journey", "c4", "%%"
         ]
-        self.model = os.environ.get("GROQ_DIAGRAM_MODEL_NAME", settings.GROQ_MODEL_DEFAULT)
+        self.model = settings.GROQ_MODEL_DIAGRAM
 
     # ---------------------------------------------------------------------
     # VALIDATION
     # ---------------------------------------------------------------------
     def _validate_chart_syntax(self, chart_code: str) -> Dict[str, Any]:
-        """Basic static validation of Mermaid syntax structure."""
-        result = {"valid": False, "errors": [], "warnings": []}
-        if not chart_code or not chart_code.strip():
-            result["errors"].append("Empty chart code")
-            return result
-
-        lc = chart_code.lower()
-        if not any(lc.startswith(v) for v in self.valid_keywords) and not lc.startswith("%%"):
-            result["errors"].append("Invalid chart start syntax")
-
-        # basic bracket matching
-        pairs = {"{": "}", "(": ")", "[": "]"}
-        stack = []
-        for i, line in enumerate(chart_code.splitlines(), start=1):
-            for ch in line:
-                if ch in pairs:
-                    stack.append((ch, i))
-                elif ch in pairs.values():
-                    if not stack:
-                        result["errors"].append(f"Unmatched closing '{ch}' at line {i}")
-                    else:
-                        o, ln = stack.pop()
-                        if pairs[o] != ch:
-                            result["errors"].append(f"Mismatched {o}/{ch} between lines {ln} and {i}")
-
-        if stack:
-            result["errors"].append("Unclosed symbols")
-
-        result["valid"] = not result["errors"]
-        return result
+        """Parse the chart locally; errors are line-level ("line 3: ...")."""
+        return validate_mermaid(chart_code).to_dict()
 
     # ---------------------------------------------------------------------
     # LLM CHART GENERATION
     # ---------------------------------------------------------------------
-    def _generate_chart(self, prompt: str, retries: int = MAX_RETRIES) -> str:
-        """Generate a diagram using Groq and extract valid Mermaid code."""
+    def _extract_chart_code(self, response_content: str) -> str:
+        """Pull Mermaid code out of an LLM response, repairing it locally, or raise."""
+        if not response_content:
+            raise ChartGenerationError("Empty LLM response")
+
+        # Extract mermaid code block; without one the whole response has to be the chart
+        match = re.search(r"```mermaid\s*(.*?)```", response_content, re.DOTALL)
+        chart_code = (match.group(1) if match else response_content).strip()
+        repaired = mermaid_repairer.repair(chart_code)
+        if repaired.fixes:
+            logging.info(f"DiagramAgent: repaired chart locally ({', '.join(repaired.fixes)})")
+        if repaired.valid:
+            return repaired.code
+        source = "Extracted mermaid block" if match else "No ```mermaid``` block found and whole response"
+        raise ChartValidationError(
+            f"{source} is invalid after local repair. "
+            f"Content: {repaired.code[:500]}..., Validation errors: {repaired.validation.error_messages()}",
+            chart_code=repaired.code,
+        )
+
+    def _next_prompt(self, prompt: str, error: Exception) -> str:
+        """Ask the LLM to fix code local repair couldn't, instead of generating from scratch again."""
+        if isinstance(error, ChartValidationError) and error.chart_code:
+            return self._fix_chart_prompt(error.chart_code)
+        return prompt
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Exponential backoff with full jitter, so retries of concurrent charts don't line up."""
+        return random.uniform(0, min(settings.CHART_BACKOFF_MAX, settings.CHART_BACKOFF_BASE * 2 ** attempt))
+
+    async def _agenerate_chart(
+        self, prompt: str, retries: int = MAX_RETRIES, deadline: Optional[float] = None, refresh: bool = False
+    ) -> str:
+        """Generate a diagram and extract valid Mermaid code, retrying until `deadline` seconds have passed.
+
+        Backoff sleeps don't hold a thread. The deadline or cancelling the
+        caller cancels the in-flight request, unless an identical request from
+        another caller shares it, and any pending retry. `refresh` skips the
+        LLM response cache on the first attempt too.
+        """
+        loop = asyncio.get_running_loop()
+        give_up_at = loop.time() + (settings.CHART_DEADLINE if deadline is None else deadline)
         last_error = None
+        current_prompt = prompt
+        attempts_made = 0
         for attempt in range(retries):
+            remaining = give_up_at - loop.time()
+            if remaining <= 0:
+                last_error = last_error or ChartGenerationError("Deadline exceeded")
+                break
+            llm_fix = current_prompt is not prompt
+            attempts_made += 1
             try:
                 logging.info(f"DiagramAgent: generating chart (attempt {attempt + 1}/{retries})")
-                response_content = self.generate_response([{"role": "user", "content": prompt}])
-                if not response_content:
-                    raise ChartGenerationError("Empty LLM response")
-
-                # Extract mermaid code block
-                match = re.search(r"```mermaid\s*(.*?)```", response_content, re.DOTALL)
-                if not match:
-                    chart_code = self._sanitize_chart_code(response_content)
-                    validation = self._validate_chart_syntax(chart_code)
-                    if validation["valid"]:
-                        return chart_code
-                    else:
-                        raise ChartValidationError(
-                            f"No ```mermaid``` block found and whole response is invalid. "
-                            f"Validation errors: {validation['errors']}"
-                        )
-
-                chart_code = match.group(1).strip()
-                chart_code = self._sanitize_chart_code(chart_code)
-                validation = self._validate_chart_syntax(chart_code)
-
-                if validation["valid"]:
-                    return chart_code
-                else:
-                    raise ChartValidationError(
-                        f"Extracted mermaid block is invalid. "
-                        f"Content: {chart_code[:500]}..., Validation Result: {validation}"
-                    )
-
-            except RateLimitError as e:
-                last_error = e
-                logging.warning("Rate limit hit; backing off")
-                time.sleep(RATE_LIMIT_BACKOFF_TIME)
-                continue
-            except APIError as e:
+                # Retries skip the cache lookup so a cached invalid answer is not replayed.
+                response_content = await asyncio.wait_for(
+                    self.agenerate_response(
+                        [{"role": "user", "content": current_prompt}], task="chart", refresh_cache=refresh or attempt > 0,
+                        attempt=attempt + 1,
+                    ),
+                    timeout=remaining,
+                )
+                chart_code = self._extract_chart_code(response_content)
+                if llm_fix:
+                    mermaid_repairer.record_llm_fix(True)
+                return chart_code
+            except asyncio.TimeoutError:
+                last_error = ChartGenerationError("Deadline exceeded")
+                break
+            except Exception as e:
                 last_error = e
-                logging.warning(f"API error: {e}; retrying")
-                time.sleep(2 ** attempt)
-                continue
+                logging.warning(f"Generation error: {e}; retrying")
+                if llm_fix:
+                    mermaid_repairer.record_llm_fix(False)
+                current_prompt = self._next_prompt(prompt, e)
+
+            delay = self._backoff_delay(attempt)
+            if attempt + 1 < retries:
+                if loop.time() + delay >= give_up_at:
+                    break
+                await asyncio.sleep(delay)
+
+        raise ChartGenerationError(f"Failed to generate chart after {attempts_made} attempt(s): {last_error}")
+
+    def _candidate_prompt(self, prompt: str, candidate: int) -> str:
+        # Identical concurrent requests would be coalesced into one call, and varied ones explore more layouts
+        if candidate == 0:
+            return prompt
+        return f"{prompt}\n(Variant {candidate + 1}: use your own choice of layout and wording.)"
+
+    async def _acandidate(self, prompt: str, candidate: int, refresh: bool, llm_fix: bool) -> str:
+        response_content = await self.agenerate_response(
+            [{"role": "user", "content": prompt}], task="chart", refresh_cache=refresh or candidate > 0, attempt=candidate + 1
+        )
+        try:
+            chart_code = self._extract_chart_code(response_content)
+        except ChartValidationError:
+            if llm_fix:
+                mermaid_repairer.record_llm_fix(False)
+            raise
+        if llm_fix:
+            mermaid_repairer.record_llm_fix(True)
+        return chart_code
+
+    async def _aspeculate_chart(
+        self, prompt: str, candidates: int, max_calls: int, deadline: Optional[float] = None, refresh: bool = False
+    ) -> str:
+        """Request `candidates` charts at once and return the first valid one, cancelling the rest.
+
+        A failed candidate is replaced (by an LLM fix of its code when it was
+        invalid) until `max_calls` requests were made for this chart, so one
+        interactive chart never costs more than that much quota; the losers'
+        requests are cancelled, not left to finish. There are no backoff
+        sleeps; the deadline still applies.
+        """
+        loop = asyncio.get_running_loop()
+        give_up_at = loop.time() + (settings.CHART_DEADLINE if deadline is None else deadline)
+        calls = 0
+        pending = set()
+        last_error: Optional[Exception] = None
+
+        def launch(candidate_prompt: str, llm_fix: bool = False) -> None:
+            nonlocal calls
+            pending.add(asyncio.create_task(self._acandidate(candidate_prompt, calls, refresh, llm_fix)))
+            calls += 1
+
+        for candidate in range(min(candidates, max_calls)):
+            launch(self._candidate_prompt(prompt, candidate))
+        try:
+            while pending:
+                remaining = give_up_at - loop.time()
+                if remaining <= 0:
+                    last_error = ChartGenerationError("Deadline exceeded")
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        logging.info(f"DiagramAgent: speculative chart ready after {calls} request(s)")
+                        return task.result()
+                    last_error = task.exception()
+                    logging.warning(f"Chart candidate failed: {last_error}")
+                    if calls < max_calls:
+                        retry_prompt = self._candidate_prompt(prompt, calls)
+                        fix_prompt = self._next_prompt(retry_prompt, last_error)
+                        launch(fix_prompt, llm_fix=fix_prompt is not retry_prompt)
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        raise ChartGenerationError(f"Failed to generate chart after {calls} speculative requests: {last_error}")
+
+    def _generate_chart(self, prompt: str, retries: int = MAX_RETRIES, refresh: bool = False) -> str:
+        """Blocking variant of `_agenerate_chart` for callers in worker threads (no deadline)."""
+        last_error = None
+        current_prompt = prompt
+        for attempt in range(retries):
+            llm_fix = current_prompt is not prompt
+            try:
+                logging.info(f"DiagramAgent: generating chart (attempt {attempt + 1}/{retries})")
+                # Retries skip the cache lookup so a cached invalid answer is not replayed.
+                response_content = self.generate_response(
+                    [{"role": "user", "content": current_prompt}], task="chart", refresh_cache=refresh or attempt > 0,
+                    attempt=attempt + 1,
+                )
+                chart_code = self._extract_chart_code(response_content)
+                if llm_fix:
+                    mermaid_repairer.record_llm_fix(True)
+                return chart_code
             except Exception as e:
                 last_error = e
                 logging.warning(f"Generation error: {e}; retrying")
-                time.sleep(2 ** attempt)
-                continue
+                if llm_fix:
+                    mermaid_repairer.record_llm_fix(False)
+                current_prompt = self._next_prompt(prompt, e)
+                if attempt + 1 < retries:
+                    time.sleep(self._backoff_delay(attempt))
 
         raise ChartGenerationError(f"Failed to generate chart after {retries} attempts: {last_error}")
 
     # ---------------------------------------------------------------------
-    # SANITIZER
+    # LOCAL CHART SYNTHESIS
     # ---------------------------------------------------------------------
-    def _sanitize_chart_code(self, chart_code: str) -> str:
-        """Fix invalid Mermaid syntax automatically."""
-        chart_code = re.sub(r"\|>+", "|", chart_code)
-        chart_code = re.sub(r"-{3,}", "--", chart_code)
-
-        # Prevent mixed chart types (graph + gantt, etc.)
-        if "gantt" in chart_code and chart_code.startswith("graph"):
-            logging.warning("⚠️ Mixed syntax detected: graph + gantt. Fixing to 'gantt'.")
-            chart_code = re.sub(r"^graph\s+\w+", "gantt", chart_code)
+    def synthesize_gantt(
+        self, start_date: date, end_date: date, num_deliverables: int, description: str, title: Optional[str] = None
+    ) -> str:
+        """Build the body of a Gantt chart from the project dates instead of asking the LLM.
+
+        The span is split into Discovery, Design, Development and Launch.
+        Development gets one task per deliverable, named after the section's
+        list items where there are any, and the chart ends with a go-live
+        milestone on `end_date` (later only if the span is too short for the
+        tasks).
+        """
+        total_days = max((end_date - start_date).days, len(GANTT_PHASES))
+        items = [_gantt_task_name(item) for item in _list_items(description)]
+        deliverables = min(num_deliverables if num_deliverables and num_deliverables > 0 else len(items) or 3, GANTT_MAX_TASKS)
+
+        fixed = {name: max(1, round(total_days * share)) for name, share in GANTT_PHASES if share is not None}
+        development_days = max(deliverables, total_days - sum(fixed.values()))
+        phase_tasks = {
+            "Discovery": [("Kick-off & Requirements", fixed["Discovery"])],
+            "Design": [("Solution Design", fixed["Design"])],
+            "Development": [
+                (items[n] if n < len(items) else f"Deliverable {n + 1}", days)
+                for n, days in enumerate(self._split_days(development_days, deliverables))
+            ],
+            "Launch": [("Testing & Acceptance", fixed["Launch"])],
+        }
+
+        lines = [
+            "gantt",
+            f"    title 📅 {_gantt_task_name(title, 60) if title else 'Project Timeline'}",
+            "    dateFormat  YYYY-MM-DD",
+            "    axisFormat  %b %d",
+            f"    tickInterval {'1week' if total_days <= 70 else '2week' if total_days <= 180 else '1month'}",
+        ]
+        task_no = 0
+        for phase, _ in GANTT_PHASES:
+            lines.append("")
+            lines.append(f"    section {phase}")
+            for name, days in phase_tasks[phase]:
+                task_no += 1
+                start = start_date.isoformat() if task_no == 1 else f"after t{task_no - 1}"
+                lines.append(f"    {name} :t{task_no}, {start}, {days}d")
+        lines.append(f"    Go-Live :milestone, t{task_no + 1}, after t{task_no}, 0d")
+        return "\n".join(lines)
+
+    def synthesize_pie(self, description: str, title: Optional[str] = None) -> Optional[str]:
+        """Build a pie chart from the first numeric table in an HTML description, or None.
+
+        The label column is the first non-numeric one. The value column is a
+        share/percentage column if there is one, otherwise the last numeric
+        column (where totals usually are). Total rows are skipped and rows with
+        the same label are summed.
+        """
+        for table in extract_tables(description):
+            header = [text for text, _ in table[0]] if all(is_header for _, is_header in table[0]) else []
+            rows = table[1:] if header else table
+            width = max(len(row) for row in rows) if rows else 0
+            if len(rows) < 2 or width < 2:
+                continue
 
-        if "graph" in chart_code and "section " in chart_code:
-            logging.warning("⚠️ Mixed syntax detected: graph with section. Switching to 'gantt'.")
-            chart_code = re.sub(r"^graph\s+\w+", "gantt", chart_code)
+            def numeric(column: int) -> bool:
+                cells = [row[column][0] for row in rows if column < len(row) and not _PIE_TOTAL_ROW.match(row[0][0])]
+                return bool(cells) and all(parse_number(cell) is not None for cell in cells)
 
-        # Enforce correct top-level keywords
-        if not any(chart_code.lower().startswith(k) for k in self.valid_keywords):
-            chart_code = "graph TD\n" + chart_code
+            label_column = next((c for c in range(width) if not numeric(c)), None)
+            value_columns = [
+                c for c in range(width)
+                if c != label_column and numeric(c) and not (c < len(header) and _PIE_SKIP_COLUMN.search(header[c]))
+            ]
+            if label_column is None or not value_columns:
+                continue
+            value_column = next((c for c in value_columns if c < len(header) and _PIE_SHARE_COLUMN.search(header[c])), value_columns[-1])
+
+            slices: Dict[str, List] = {}
+            for row in rows:
+                if max(label_column, value_column) >= len(row):
+                    continue
+                label = " ".join(row[label_column][0].replace('"', "'").split())[:40]
+                value = parse_number(row[value_column][0])
+                if not label or _PIE_TOTAL_ROW.match(label) or value is None or value <= 0:
+                    continue
+                slices.setdefault(label.lower(), [label, 0.0])[1] += value
+            if len(slices) < 2:
+                continue
 
-        return chart_code
+            top = sorted(slices.values(), key=lambda s: -s[1])
+            if len(top) > PIE_MAX_SLICES:
+                top = top[:PIE_MAX_SLICES - 1] + [["Other", sum(value for _, value in top[PIE_MAX_SLICES - 1:])]]
+            chart_title = title or (header[value_column] if value_column < len(header) else None)
+            lines = ["pie showData"] + ([f"    title {' '.join(chart_title.split())}"] if chart_title else [])
+            lines += [f'    "{label}" : {round(value, 2):g}' for label, value in top]
+            return "\n".join(lines)
+        return None
+
+    @staticmethod
+    def _split_days(days: int, parts: int) -> List[int]:
+        """`days` split into `parts` near-equal whole-day durations."""
+        base, extra = divmod(days, parts)
+        return [base + (1 if n < extra else 0) for n in range(parts)]
 
     # ---------------------------------------------------------------------
     # MAIN CHART GENERATION API
     # ---------------------------------------------------------------------
-    def generate_chart(self, chart_type: str, description: str) -> str:
+    def _chart_prompt(self, chart_type: str, description: str) -> str:
         if not description or not description.strip():
             raise ValueError("Empty description")
 
         chart_type_lower = chart_type.lower()
 
         if chart_type_lower == "flowchart":
-            return self.generate_flowchart(description)
+            return self._flowchart_prompt(description)
         elif chart_type_lower == "gantt":
-            return self.generate_gantt_chart(description)
+            return self._gantt_chart_prompt(description)
         elif chart_type_lower == "sequence":
-            return self.generate_sequence_diagram(description)
+            return self._sequence_diagram_prompt(description)
         elif chart_type_lower == "mindmap":
-            return self.generate_mindmap(description)
+            return self._mindmap_prompt(description)
         elif chart_type_lower == "pie":
-            return self.generate_pie_chart(description)
-        elif chart_type_lower == "journey":
-            return self.generate_user_journey(description)
+            return self._pie_chart_prompt(description)
+        elif chart_type_lower in ("journey", "user_journey"):
+            return self._user_journey_prompt(description)
         elif chart_type_lower == "c4":
-            return self.generate_c4_diagram(description)
+            return self._c4_diagram_prompt(description)
         else:
             raise ValueError(f"Unsupported chart type: {chart_type}")
 
+    def _synthesize_chart(self, chart_type: str, description: str, proposal: Optional[Proposal]) -> Optional[str]:
+        """A chart built without the LLM, or None when the chart type or inputs don't allow one."""
+        if chart_type.lower() == "gantt" and proposal is not None and settings.GANTT_SYNTHESIS_ENABLED:
+            return self.synthesize_gantt(
+                proposal.startDate, proposal.endDate, proposal.numDeliverables, description, title=f"{proposal.clientName} Project Timeline"
+            )
+        if chart_type.lower() == "pie" and settings.PIE_SYNTHESIS_ENABLED:
+            return self.synthesize_pie(description)
+        return None
+
+    def _themed(self, chart_code: str) -> str:
+        """Post-processing: the configured theme block in place of any the LLM wrote."""
+        return apply_theme(chart_code) if settings.CHART_THEMES_ENABLED else chart_code
+
+    async def agenerate_chart(
+        self,
+        chart_type: str,
+        description: str,
+        deadline: Optional[float] = None,
+        refresh: bool = False,
+        proposal: Optional[Proposal] = None,
+        speculative: bool = False,
+    ) -> str:
+        """Generate a chart of the given type; gives up after `deadline` seconds (default CHART_DEADLINE).
+
+        Gantt charts for a known `proposal` are built from its dates and pie
+        charts from a numeric table in the description, without the LLM. Other
+        charts are cached by chart type and normalized
+        description; `refresh` skips the local paths to get a different chart
+        from the LLM, which then replaces the cached one. `speculative` races
+        CHART_SPECULATIVE_CANDIDATES requests instead of retrying one at a time.
+        Every chart is returned with the server-side theme for its type.
+        """
+        prompt = self._chart_prompt(chart_type, description)
+        if not refresh:
+            synthesized = self._synthesize_chart(chart_type, description, proposal)
+            if synthesized is not None:
+                return self._themed(synthesized)
+        key = chart_cache_key(chart_type, description)
+        if settings.CHART_CACHE_ENABLED and not refresh:
+            cached = await chart_cache.aget(key)
+            if cached is not None:
+                return self._themed(cached)
+        if speculative:
+            chart_code = await self._aspeculate_chart(
+                prompt, settings.CHART_SPECULATIVE_CANDIDATES, settings.CHART_SPECULATIVE_MAX_CALLS, deadline=deadline, refresh=refresh
+            )
+        else:
+            chart_code = await self._agenerate_chart(prompt, deadline=deadline, refresh=refresh)
+        if settings.CHART_CACHE_ENABLED:
+            await chart_cache.aset(key, chart_code)
+        return self._themed(chart_code)
+
+    def generate_chart(
+        self, chart_type: str, description: str, refresh: bool = False, proposal: Optional[Proposal] = None
+    ) -> str:
+        prompt = self._chart_prompt(chart_type, description)
+        if not refresh:
+            synthesized = self._synthesize_chart(chart_type, description, proposal)
+            if synthesized is not None:
+                return self._themed(synthesized)
+        key = chart_cache_key(chart_type, description)
+        if settings.CHART_CACHE_ENABLED and not refresh:
+            cached = chart_cache.get(key)
+            if cached is not None:
+                return self._themed(cached)
+        chart_code = self._generate_chart(prompt, refresh=refresh)
+        if settings.CHART_CACHE_ENABLED:
+            chart_cache.set(key, chart_code)
+        return self._themed(chart_code)
+
     # ---------------------------------------------------------------------
     # SPECIFIC CHART TYPES
     # ---------------------------------------------------------------------
-    def generate_flowchart(self, description: str) -> str:
+    def _flowchart_prompt(self, description: str) -> str:
         prompt = f"""
             You are an expert in creating **professional, visually clear, and valid Mermaid.js flowcharts**
             that illustrate **product development or business workflows**. 
@@ -229,6 +538,7 @@ class DiagramAgent(ConversableAgent):
             ✅ **OUTPUT REQUIREMENTS**
             - Return **only** valid Mermaid code inside triple backticks with `mermaid`.
             - Do **not** include extra commentary, markdown, or explanations.
+            - Do **not** add `%%{{init: ...}}%%` directives or `style`/`classDef` lines; the theme is applied server-side.
             - Ensure the flowchart can render cleanly in any Mermaid-compatible viewer.
 
             Example of the desired professional style:
@@ -250,10 +560,10 @@ class DiagramAgent(ConversableAgent):
 
             Now generate a **concise, modern, and professional Mermaid.js flowchart** that clearly visualizes the described process.
             """
-        return self._generate_chart(prompt)
+        return prompt
 
 
-    def generate_gantt_chart(self, description: str) -> str:
+    def _gantt_chart_prompt(self, description: str) -> str:
         prompt = f"""
             You are an expert in creating **visually clean, non-overlapping Mermaid.js Gantt charts**.
             Your job is to generate a **beautiful and readable** Mermaid chart for this project:
@@ -262,8 +572,7 @@ class DiagramAgent(ConversableAgent):
             Follow these design and syntax rules carefully:
 
             🧩 **STRUCTURE**
-            - Always start with `%%{{init: ...}}%%` to define theme customization.
-            - Then start the chart with:
+            - Start the chart with:
                 ```
                 gantt
                     title 📅 <Project Title>
@@ -271,21 +580,10 @@ class DiagramAgent(ConversableAgent):
                     axisFormat  %b %d
                     tickInterval 2week
                     excludes weekends
-                    todayMarker stroke-width:3px,stroke:#f59e0b
                 ```
             - Use 3–5 logical `section` groups (e.g., Discovery, Design, Development, Launch).
             - Each section should have 2–3 concise, readable tasks.
 
-            🎨 **STYLE**
-            - Apply a modern, minimal UI using theme variables:
-                - primaryColor: "#2563eb"
-                - secondaryColor: "#93c5fd"
-                - sectionHeaderColor: "#1e3a8a"
-                - fontFamily: "Inter, sans-serif"
-                - barHeight: 26, barGap: 18, barCornerRadius: 10
-                - todayLineColor: "#f59e0b"
-            - Include `.taskText`, `.sectionTitle`, and `.today` custom CSS classes.
-
             🕓 **TASKS**
             - Each task must follow:  
             `Task Name :id, [after <prev_id>|<start_date>], <duration>d`
@@ -297,44 +595,16 @@ class DiagramAgent(ConversableAgent):
             - Return ONLY a **valid, runnable Mermaid code block**.
             - Wrap the code in triple backticks with `mermaid`.
             - Do NOT include explanations, extra text, or markdown outside the code block.
+            - Do NOT add `%%{{init: ...}}%%` directives, colours or CSS; the theme is applied server-side.
 
             Example of desired style:
             ```mermaid
-            %%{{init: {{
-            "theme": "base",
-            "themeVariables": {{
-                "primaryColor": "#2563eb",
-                "secondaryColor": "#93c5fd",
-                "tertiaryColor": "#f9fafb",
-                "fontFamily": "Inter, sans-serif",
-                "fontSize": "14px",
-                "taskTextColor": "#0f172a",
-                "taskBorderColor": "#2563eb",
-                "barHeight": 26,
-                "barGap": 18,
-                "barCornerRadius": 10,
-                "todayLineColor": "#f59e0b",
-                "sectionBkgColor": "#f3f4f6",
-                "sectionBkgColor2": "#e5e7eb",
-                "sectionHeaderColor": "#1e3a8a",
-                "sectionHeaderFontWeight": "700",
-                "sectionHeaderFontSize": "16px",
-                "ganttLeftPadding": 55
-            }},
-            "themeCSS": "
-                .taskText {{ font-weight: 600; fill: #0f172a; }}
-                .sectionTitle {{ font-size: 14px; font-weight: 700; fill: #1e3a8a; }}
-                .today {{ stroke-width: 3px; stroke-dasharray: 3 3; opacity: 0.8; }}
-            "
-            }}}}%%
-
             gantt
                 title 📅 2025 Project Roadmap
                 dateFormat  YYYY-MM-DD
                 axisFormat  %b %d
                 tickInterval 2week
                 excludes weekends
-                todayMarker stroke-width:3px,stroke:#f59e0b
 
                 section Discovery
                 Kick-off & Requirements :active, a1, 2025-01-06, 10d
@@ -354,10 +624,10 @@ class DiagramAgent(ConversableAgent):
                 Go-Live & Training      :milestone, a9, after a8, 0d
             ```
             """
-        return self._generate_chart(prompt)
+        return prompt
 
 
-    def generate_sequence_diagram(self, description: str) -> str:
+    def _sequence_diagram_prompt(self, description: str) -> str:
         prompt = f"""
         You are an expert in Mermaid.js sequence diagrams.
         Create a valid diagram showing interactions for this scenario:
@@ -368,9 +638,9 @@ class DiagramAgent(ConversableAgent):
         - Ensure clear participants and logical flow.
         - Return only valid Mermaid code in ```mermaid ... ``` blocks.
         """
-        return self._generate_chart(prompt)
+        return prompt
 
-    def generate_mindmap(self, description: str) -> str:
+    def _mindmap_prompt(self, description: str) -> str:
         prompt = f"""
         You are an expert in Mermaid.js mindmaps.
         Create a clear mindmap showing hierarchy and relationships:
@@ -381,9 +651,9 @@ class DiagramAgent(ConversableAgent):
         - Keep node names concise.
         - Return valid Mermaid code in ```mermaid ... ``` blocks.
         """
-        return self._generate_chart(prompt)
+        return prompt
 
-    def generate_pie_chart(self, description: str) -> str:
+    def _pie_chart_prompt(self, description: str) -> str:
         prompt = f"""
         You are an expert in Mermaid.js pie charts.
         Create a valid pie chart for the following data:
@@ -399,9 +669,9 @@ class DiagramAgent(ConversableAgent):
         ```
         Return valid Mermaid code in ```mermaid ... ``` blocks.
         """
-        return self._generate_chart(prompt)
+        return prompt
 
-    def generate_user_journey(self, description: str) -> str:
+    def _user_journey_prompt(self, description: str) -> str:
         prompt = f"""
         You are an expert in Mermaid.js user journey diagrams.
         Create a valid user journey for this scenario:
@@ -412,9 +682,9 @@ class DiagramAgent(ConversableAgent):
         - Map emotions, stages, and interactions logically.
         - Return valid Mermaid code in ```mermaid ... ``` blocks.
         """
-        return self._generate_chart(prompt)
+        return prompt
 
-    def generate_c4_diagram(self, description: str) -> str:
+    def _c4_diagram_prompt(self, description: str) -> str:
         prompt = f"""
         You are an expert in creating **C4-style system diagrams** using Mermaid.js.
         Generate a valid Mermaid C4-style diagram for this system:
@@ -425,12 +695,12 @@ class DiagramAgent(ConversableAgent):
         - Avoid unsupported syntax like `rel()` or `SystemContext`.
         - Return valid Mermaid code in ```mermaid ... ``` blocks.
         """
-        return self._generate_chart(prompt)
+        return prompt
 
     # ---------------------------------------------------------------------
     # MODIFY EXISTING CHART
     # ---------------------------------------------------------------------
-    def update_chart(self, modification_prompt: str, current_chart_code: str) -> str:
+    def _update_chart_prompt(self, modification_prompt: str, current_chart_code: str) -> str:
         prompt = f"""
         You are an expert in editing Mermaid.js diagrams.
         Modify the chart below according to this request:
@@ -443,10 +713,9 @@ class DiagramAgent(ConversableAgent):
 
         Return the UPDATED diagram in valid Mermaid syntax inside ```mermaid ... ``` blocks.
         """
-        return self._generate_chart(prompt)
+        return prompt
 
-    def fix_chart(self, broken_mermaid_code: str) -> str:
-        """Fix broken Mermaid syntax using the LLM."""
+    def _fix_chart_prompt(self, broken_mermaid_code: str) -> str:
         prompt = f"""
         The following Mermaid syntax is broken. Please fix it.
 
@@ -456,52 +725,115 @@ class DiagramAgent(ConversableAgent):
 
         Return the corrected diagram in valid Mermaid syntax inside ```mermaid ... ``` blocks.
         """
-        return self._generate_chart(prompt)
+        return prompt
+
+    async def aupdate_chart(self, modification_prompt: str, current_chart_code: str, deadline: Optional[float] = None) -> str:
+        prompt = self._update_chart_prompt(modification_prompt, strip_theme(current_chart_code))
+        return self._themed(await self._agenerate_chart(prompt, deadline=deadline))
+
+    def update_chart(self, modification_prompt: str, current_chart_code: str) -> str:
+        prompt = self._update_chart_prompt(modification_prompt, strip_theme(current_chart_code))
+        return self._themed(self._generate_chart(prompt))
+
+    async def afix_chart(self, broken_mermaid_code: str, deadline: Optional[float] = None) -> str:
+        """Fix broken Mermaid syntax locally, falling back to the LLM."""
+        repaired = mermaid_repairer.repair(strip_theme(broken_mermaid_code))
+        if repaired.valid:
+            return self._themed(repaired.code)
+        try:
+            chart_code = await self._agenerate_chart(self._fix_chart_prompt(repaired.code), deadline=deadline)
+        except ChartGenerationError:
+            mermaid_repairer.record_llm_fix(False)
+            raise
+        mermaid_repairer.record_llm_fix(True)
+        return self._themed(chart_code)
+
+    def fix_chart(self, broken_mermaid_code: str) -> str:
+        """Fix broken Mermaid syntax locally, falling back to the LLM."""
+        repaired = mermaid_repairer.repair(strip_theme(broken_mermaid_code))
+        if repaired.valid:
+            return self._themed(repaired.code)
+        try:
+            chart_code = self._generate_chart(self._fix_chart_prompt(repaired.code))
+        except ChartGenerationError:
+            mermaid_repairer.record_llm_fix(False)
+            raise
+        mermaid_repairer.record_llm_fix(True)
+        return self._themed(chart_code)
 
     # ---------------------------------------------------------------------
     # AUTOMATION + CLASSIFICATION
     # ---------------------------------------------------------------------
-    def suggest_chart_type(self, content: str) -> str:
-        """Suggest best diagram type for given content."""
-        if not client.api_key:
-            return ""
+    def classify_chart_type(self, title: str, content: str) -> ChartSuggestion:
+        """Pick a chart type for a section locally (see app/core/chart_classifier.py)."""
+        return classify_chart(title, content)
+
+    async def asuggest_chart_type(self, content: str, title: str = "") -> str:
+        """Suggest the best diagram type for a section, or "none"."""
+        return self.suggest_chart_type(content, title)
+
+    def suggest_chart_type(self, content: str, title: str = "") -> str:
+        """Suggest the best diagram type for a section, or "none"."""
+        suggestion = self.classify_chart_type(title, content)
+        return suggestion.chart_type if suggestion.chart_type in self.valid_keywords else "none"
+
+    async def aauto_generate_charts_for_proposal(
+        self,
+        sections: list,
+        proposal: Optional[Proposal] = None,
+        concurrency: Optional[int] = None,
+        deadline: Optional[float] = None,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """Classify every section and generate the charts concurrently.
+
+        At most `concurrency` charts (default CHART_AUTO_CONCURRENCY) are
+        generated at once, and whatever hasn't finished after `deadline`
+        seconds (default CHART_AUTO_DEADLINE) is cancelled. Returns the charts
+        that succeeded and a failure reason for every other classified section.
+        """
+        loop = asyncio.get_running_loop()
+        give_up_at = loop.time() + (settings.CHART_AUTO_DEADLINE if deadline is None else deadline)
+        semaphore = asyncio.Semaphore(concurrency or settings.CHART_AUTO_CONCURRENCY)
 
-        try:
-            chat_completion = client.chat.completions.create(
-                model=self.model,
-                messages=[{
-                    "role": "user",
-                    "content": f"""
-                    You are a diagram classifier.
-                    Based on the following content, suggest the most suitable Mermaid.js diagram type.
-                    Content: {content}
-                    Choose one: flowchart, gantt, sequence, mindmap, pie, user_journey, c4.
-                    Reply ONLY with the type name.
-                    """
-                }],
-                temperature=0,
-            )
-            suggestion = chat_completion.choices[0].message.content.strip().lower()
-            return suggestion if suggestion in self.valid_keywords else "none"
-        except Exception as e:
-            logging.error(f"Error suggesting chart type: {e}")
-            return "none"
-
-    def auto_generate_charts_for_proposal(self, sections: list) -> list:
-        """Automatically generate diagrams for proposal sections."""
-        generated_charts = []
+        planned = []
         for section in sections:
-            content = getattr(section, "contentHtml", "")
-            chart_type = self.suggest_chart_type(content)
-            if not chart_type or chart_type == "none":
-                continue
-
-            chart_code = self.generate_chart(chart_type, content)
-            if chart_code:
-                generated_charts.append({
-                    "section_id": getattr(section, "id", None),
-                    "chart_type": chart_type,
-                    "chart_code": chart_code
-                })
-
-        return generated_charts
+            title = getattr(section, "title", "") or ""
+            content = getattr(section, "contentHtml", "") or ""
+            suggestion = self.classify_chart_type(title, content)
+            if suggestion.chart_type != "none":
+                planned.append((section, content, suggestion))
+
+        async def generate(content: str, chart_type: str) -> str:
+            async with semaphore:
+                remaining = give_up_at - loop.time()
+                if remaining <= 0:
+                    raise ChartGenerationError("Deadline exceeded")
+                return await self.agenerate_chart(chart_type, content, deadline=remaining, proposal=proposal)
+
+        tasks = [asyncio.create_task(generate(content, suggestion.chart_type)) for _, content, suggestion in planned]
+        try:
+            if tasks:
+                await asyncio.wait(tasks, timeout=max(0.0, give_up_at - loop.time()))
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        charts, failures = [], []
+        for (section, _, suggestion), task in zip(planned, tasks):
+            entry = {
+                "section_id": getattr(section, "id", None),
+                "title": getattr(section, "title", None),
+                "chart_type": suggestion.chart_type,
+                "confidence": round(suggestion.confidence, 3),
+            }
+            if task.cancelled():
+                failures.append({**entry, "reason": "Deadline exceeded"})
+            elif task.exception() is not None:
+                failures.append({**entry, "reason": str(task.exception())})
+            else:
+                charts.append({**entry, "chart_code": task.result()})
+        return {"charts": charts, "failures": failures}
+
+
+diagram_agent = DiagramAgent(client=client)
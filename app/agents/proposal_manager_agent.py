@@ -3,20 +3,23 @@ import logging
 import random
 import re
 import json
+import difflib
 from json_repair import repair_json
 import asyncio
-from typing import List, Dict
-from groq import Groq
+from typing import List, Dict, Optional, Callable, AsyncIterator, Awaitable, Union
 from app.core.config import settings
-from .diagram_agent import DiagramAgent
+from app.core.llm_client import get_sync_client
+from .diagram_agent import diagram_agent
 from .content_writer_agent import content_writer_agent
-from app.schemas import Proposal
+from .rfp_digest_agent import rfp_digest_agent, format_rfp_digest
+from app.schemas import DraftSection, Proposal, RfpDigest
 from sqlalchemy.ext.asyncio import AsyncSession
 from .base_agent import ConversableAgent
+from app.core.json_stream import JsonArrayStreamParser
 from app import crud, schemas
 
-# Initialize Groq client
-client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
+# Shared Groq client
+client = get_sync_client()
 
 class ProposalManagerAgent(ConversableAgent):
     """AI-powered agent for managing the proposal generation process."""
@@ -42,16 +45,18 @@ class ProposalManagerAgent(ConversableAgent):
                 logging.error(f"Proposal {section.proposal_id} not found for section {section_id}.")
                 return
 
+            rfp_digest = await rfp_digest_agent.get_digest(proposal.get('id'), proposal.get('rfpText'))
             prompt = f"""
             Generate the content for the section titled '{section.title}' within the context of this proposal:
             **Client:** {proposal.get('clientName')}
             **Company:** {proposal.get('companyName')}
-            **RFP:** ```{proposal.get('rfpText')}```
+            **RFP Digest:**
+            {format_rfp_digest(rfp_digest)}
             The content should be detailed, professional, and formatted in HTML (`<p>`, `<ul>`, `<strong>`, etc.).
             """
 
             message_history = [{"role": "user", "content": prompt}]
-            generated_content = await asyncio.to_thread(self.generate_response, message_history)
+            generated_content = await self.agenerate_response(message_history, task="section")
 
             # Update the section with the generated content
             section_update = schemas.SectionUpdate(contentHtml=generated_content)
@@ -65,10 +70,42 @@ class ProposalManagerAgent(ConversableAgent):
             section_update = schemas.SectionUpdate(contentHtml=error_message)
             await crud.update_section(db, section_id, section_update)
 
-    async def generate_proposal_draft(self, proposal: Proposal, db: AsyncSession, sections: List[str] = None) -> Dict:
-        logging.info("--- Starting Proposal Generation (Optimized Flow) ---")
+    async def generate_proposal_draft(self, proposal: Proposal, db: AsyncSession, sections: List[str] = None, strategy: Optional[str] = None, on_event: Optional[Callable[[Dict], Awaitable[None]]] = None) -> Dict:
+        """Generate a full draft and return all processed sections in order.
+
+        `on_event` is awaited with every progress event of `stream_proposal_draft`.
+        """
+        processed_sections = {}
+        async for event in self.stream_proposal_draft(proposal, db, sections=sections, strategy=strategy):
+            if on_event:
+                await on_event(event)
+            if event["event"] == "section_ready":
+                processed_sections[event["data"]["index"]] = event["data"]["section"]
+
+        return {"sections": [processed_sections[i] for i in sorted(processed_sections)]}
+
+    async def stream_proposal_draft(self, proposal: Proposal, db: AsyncSession, sections: List[str] = None, strategy: Optional[str] = None) -> AsyncIterator[Dict]:
+        """Generate a draft, yielding progress events as each stage finishes.
+
+        Events are dicts of the form {"event": <name>, "data": <payload>}:
+        "section_parsed" as each section arrives in the streamed LLM output,
+        "content_parsed" once the whole response is in, then per section
+        "chart_ready", "logos_ready" and "images_ready" for the steps that
+        apply, and finally "section_ready" with the processed section.
+        Post-processing of early sections overlaps with generation of later ones.
+        Sections that come back malformed or not at all (e.g. a truncated
+        response) are re-requested one by one and appended after the others.
+
+        `strategy` (default `DRAFT_STRATEGY`) picks how section content is
+        produced: "one_shot" streams every section from a single call,
+        "fan_out" writes each section with its own call (see
+        `_fan_out_sections`). Post-processing is the same for both.
+        """
+        strategy = strategy or settings.DRAFT_STRATEGY
+        if strategy not in ("one_shot", "fan_out"):
+            raise ValueError(f"Unknown draft strategy '{strategy}'")
+        logging.info(f"--- Starting Proposal Generation ({strategy}) ---")
 
-        # 1. Create the single, powerful prompt to generate all sections at once
         if not sections:
             sections = [
                 "Executive Summary",
@@ -84,14 +121,107 @@ class ProposalManagerAgent(ConversableAgent):
                 "Path to Partnership"
             ]
 
-        section_list = "\n".join([f"- {section}" for section in sections])
+        rfp_digest = await rfp_digest_agent.get_digest(proposal.id, proposal.rfpText)
+
+        # Sections are post-processed concurrently; their step events funnel through one queue.
+        events: asyncio.Queue = asyncio.Queue()
+        post_processing_tasks: List[asyncio.Task] = []
+        generated_sections_data: List[Dict] = []
+        # Tech-stack analysis needs every section, so it waits on this until the stream ends
+        full_proposal_content: asyncio.Future = asyncio.get_running_loop().create_future()
+        # Image queries come from one batched call once the stream ends; sections wait on their future
+        image_query_futures: Dict[int, asyncio.Future] = {}
+        image_query_task: Optional[asyncio.Task] = None
 
+        def emit(event: str, data: Dict):
+            events.put_nowait({"event": event, "data": data})
+
+        async def run_section(i: int, section_data: Dict):
+            try:
+                section_obj = await self.process_single_section(
+                    i, section_data, proposal, full_proposal_content, db, emit=emit, content_keywords=image_query_futures.get(i)
+                )
+            except Exception as e:
+                events.put_nowait(e)
+                return
+            emit("section_ready", {"index": i, "section": section_obj})
+
+        def start_section(section_data: Dict):
+            i = len(generated_sections_data)
+            generated_sections_data.append(section_data)
+            if self._wants_images(section_data.get("title", f"Section {i+1}")):
+                image_query_futures[i] = asyncio.get_running_loop().create_future()
+            emit("section_parsed", {"index": i, "title": section_data.get("title", "")})
+            post_processing_tasks.append(asyncio.create_task(run_section(i, section_data)))
+
+        if strategy == "fan_out":
+            section_batches = self._fan_out_sections(sections, proposal, rfp_digest)
+        else:
+            section_batches = self._one_shot_sections(sections, proposal, rfp_digest)
+
+        sections_ready = 0
+        try:
+            try:
+                async for batch in section_batches:
+                    for section_data in batch:
+                        start_section(section_data)
+                    while not events.empty():
+                        event = events.get_nowait()
+                        if isinstance(event, Exception):
+                            raise event
+                        if event["event"] == "section_ready":
+                            sections_ready += 1
+                        yield event
+            finally:
+                await section_batches.aclose()
+
+            if not generated_sections_data:
+                raise ValueError("Failed to generate proposal content. The AI model returned an invalid format.")
+            logging.info(f"Successfully generated {len(generated_sections_data)} sections ({strategy}).")
+
+            yield {
+                "event": "content_parsed",
+                "data": {"count": len(generated_sections_data), "titles": [s.get("title", "") for s in generated_sections_data]},
+            }
+
+            # Let the context-dependent tasks (tech stack, image queries) run and drain remaining post-processing
+            full_proposal_content.set_result("".join(
+                f"\n\n## {section_data.get('title', '')}\n\n{section_data.get('contentHtml', '')}"
+                for section_data in generated_sections_data
+            ))
+            if image_query_futures:
+                image_query_task = asyncio.create_task(self._resolve_image_queries(generated_sections_data, image_query_futures))
+
+            while sections_ready < len(post_processing_tasks):
+                event = await events.get()
+                if isinstance(event, Exception):
+                    raise event
+                if event["event"] == "section_ready":
+                    sections_ready += 1
+                yield event
+        finally:
+            # Stops outstanding work if the consumer goes away (e.g. client disconnect)
+            for task in post_processing_tasks:
+                task.cancel()
+            if image_query_task:
+                image_query_task.cancel()
+
+        logging.info(f"--- Proposal Generation Complete ({strategy}) ---")
+
+    async def _one_shot_sections(self, sections: List[str], proposal: Proposal, rfp_digest: RfpDigest) -> AsyncIterator[List[Dict]]:
+        """Stream every section from a single LLM call, yielding sections as soon as they're parsed.
+
+        Yields once per streamed chunk (often an empty list) so the caller can
+        forward post-processing events while the response is still arriving.
+        """
+        section_list = "\n".join([f"- {section}" for section in sections])
         one_shot_prompt = f"""
         As an expert business proposal strategist, generate a complete, professional business proposal based on the following details.
 
         **Client:** {proposal.clientName}
         **Company:** {proposal.companyName}
-        **RFP:** ```{proposal.rfpText}```
+        **RFP Digest:**
+        {format_rfp_digest(rfp_digest)}
 
         **Instructions:**
         1.  **Generate All Sections:** Create content for all of the following mandatory sections:
@@ -102,12 +232,135 @@ class ProposalManagerAgent(ConversableAgent):
         5.  **Content Quality:** The content must be detailed, well-written, and directly address the RFP.
         """
 
-        # 2. Call the LLM once to get all section content
-        logging.info("--- Generating all section content in a single pass ---")
+        # Stream the single LLM call; the caller post-processes each section as soon as it is complete
+        logging.info("--- Generating all section content in a single pass (streamed) ---")
         message_history = [{"role": "user", "content": one_shot_prompt}]
-        response_text = await asyncio.to_thread(self.generate_response, message_history)
 
-        # 3. Parse the JSON response
+        parser = JsonArrayStreamParser()
+        response_text = ""
+        received: List[str] = []
+        stream = self.astream_response(message_history, task="draft")
+        try:
+            while True:
+                try:
+                    delta = await stream.__anext__()
+                except StopAsyncIteration:
+                    break
+                except Exception as e:
+                    # Keep whatever arrived before the failure; an empty response is handled below
+                    logging.error(f"Draft stream from agent '{self.name}' failed after {parser.count} sections: {e}")
+                    break
+
+                response_text += delta
+                batch = self._valid_draft_sections(parser.feed(delta))
+                received.extend(section["title"] for section in batch)
+                yield batch
+        finally:
+            await stream.aclose()
+        batch = self._valid_draft_sections(parser.close())
+
+        # Fall back to parsing the whole response if nothing could be parsed incrementally
+        if not received and not batch and response_text:
+            try:
+                batch = self._valid_draft_sections(self._parse_draft_response(response_text))
+            except ValueError:
+                logging.warning("Draft response could not be parsed; re-requesting every section individually")
+        received.extend(section["title"] for section in batch)
+        yield batch
+
+        # Re-request only the sections that are missing or were malformed, not the whole draft
+        missing = self._missing_sections(sections, received)
+        if missing:
+            logging.warning(f"Re-requesting {len(missing)} missing or malformed sections: {missing}")
+            regenerated = await asyncio.gather(*(self._generate_draft_section(title, proposal, rfp_digest) for title in missing))
+            yield [section_data for section_data in regenerated if section_data]
+
+    async def _fan_out_sections(self, sections: List[str], proposal: Proposal, rfp_digest: RfpDigest) -> AsyncIterator[List[Dict]]:
+        """Write each section with its own call, at most `DRAFT_FAN_OUT_CONCURRENCY` at a time.
+
+        Every call shares the same digest-based context. A section is retried
+        on its own (`DRAFT_SECTION_ATTEMPTS`) and dropped if it still fails, so
+        one bad section doesn't cost the whole draft. Sections are yielded in
+        the requested order as soon as they and everything before them are done.
+        """
+        semaphore = asyncio.Semaphore(max(1, settings.DRAFT_FAN_OUT_CONCURRENCY))
+
+        async def write(title: str) -> Optional[Dict]:
+            async with semaphore:
+                try:
+                    return await self._generate_draft_section(title, proposal, rfp_digest, attempts=settings.DRAFT_SECTION_ATTEMPTS)
+                except Exception as e:
+                    logging.error(f"Error generating section '{title}': {e}")
+                    return None
+
+        tasks = [asyncio.create_task(write(title)) for title in sections]
+        try:
+            for title, task in zip(sections, tasks):
+                section_data = await task
+                if not section_data:
+                    logging.error(f"Dropping section '{title}' after {settings.DRAFT_SECTION_ATTEMPTS} failed attempts")
+                yield [section_data] if section_data else []
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _valid_draft_sections(self, sections_data: List[Dict]) -> List[Dict]:
+        valid, _ = self._validate_items(sections_data, DraftSection)
+        return [section.model_dump() for section in valid]
+
+    def _missing_sections(self, requested: List[str], received: List[str]) -> List[str]:
+        """Requested titles with no close match among the received ones (the LLM may reword titles)."""
+        remaining = [title.strip().lower() for title in received]
+        missing = []
+        for title in requested:
+            match = difflib.get_close_matches(title.strip().lower(), remaining, n=1, cutoff=0.6)
+            if match:
+                remaining.remove(match[0])
+            else:
+                missing.append(title)
+        return missing
+
+    async def _generate_draft_section(self, title: str, proposal: Proposal, rfp_digest: RfpDigest, attempts: int = 2) -> Optional[Dict]:
+        """Generate one draft section as a schema-validated JSON object."""
+        prompt = f"""
+        As an expert business proposal strategist, write the section titled '{title}' of a professional business proposal.
+
+        **Client:** {proposal.clientName}
+        **Company:** {proposal.companyName}
+        **RFP Digest:**
+        {format_rfp_digest(rfp_digest)}
+
+        **Instructions:**
+        1.  **Content & Formatting:** The `contentHtml` must be well-structured, using paragraphs (`<p>`), lists (`<ul>`, `<ol>`), and bold text (`<strong>`) to improve readability. For sections requiring tables (like "Payment Milestones" or "Product Cost"), the content MUST be a detailed HTML `<table>`.
+        2.  **Output Format:** Return ONLY a JSON object with the keys "title" (string) and "contentHtml" (string).
+        3.  **Tone:** The tone must be professional, confident, and persuasive.
+        """
+        for attempt in range(attempts):
+            data = await self.agenerate_json([{"role": "user", "content": prompt}], task="draft_section")
+            if isinstance(data, dict):
+                data = {**data, "title": title}
+            valid, _ = self._validate_items([data], DraftSection)
+            if valid:
+                return valid[0].model_dump()
+            logging.warning(f"Section '{title}' came back malformed (attempt {attempt + 1}/{attempts})")
+        return None
+
+    async def _resolve_image_queries(self, sections_data: List[Dict], futures: Dict[int, asyncio.Future]) -> None:
+        """Extract the image queries of every waiting section in one call and hand each its result."""
+        indexes = sorted(futures)
+        try:
+            queries = await self.aget_image_queries([
+                (sections_data[i].get("title", ""), sections_data[i].get("contentHtml", "")) for i in indexes
+            ])
+        except Exception as e:
+            queries = [""] * len(indexes)
+            logging.error(f"Error extracting image queries for the draft: {e}")
+        for i, query in zip(indexes, queries):
+            if not futures[i].done():
+                futures[i].set_result(query)
+
+    def _parse_draft_response(self, response_text: str) -> List[Dict]:
+        """Parse a complete one-shot response (```json block or bare JSON) into section dicts."""
         try:
             json_match = re.search(r"```json\s*(.*?)\s*```", response_text, re.DOTALL)
             if not json_match:
@@ -116,37 +369,29 @@ class ProposalManagerAgent(ConversableAgent):
                 repaired_json_str = repair_json(response_text)
             else:
                 repaired_json_str = repair_json(json_match.group(1))
-            
+
             generated_sections_data = json.loads(repaired_json_str)
-            logging.info(f"Successfully parsed {len(generated_sections_data)} sections from single-pass generation.")
         except (json.JSONDecodeError, IndexError) as e:
             logging.error(f"Failed to parse JSON response from LLM: {e}")
             logging.error(f"LLM Response Text: {response_text}")
             raise ValueError("Failed to generate proposal content. The AI model returned an invalid format.")
 
-        # 4. Post-processing
-        processed_sections = []
-        full_proposal_content = ""
-
-        # First, build the full content string for context-dependent tasks
-        for section_data in generated_sections_data:
-            full_proposal_content += f"\n\n## {section_data.get('title', '')}\n\n{section_data.get('contentHtml', '')}"
+        if not isinstance(generated_sections_data, list) or not generated_sections_data:
+            logging.error(f"LLM Response Text: {response_text}")
+            raise ValueError("Failed to generate proposal content. The AI model returned an invalid format.")
+        return [section for section in generated_sections_data if isinstance(section, dict)]
 
-        logging.info("--- Starting post-processing (Diagrams, Images, Tech Logos) ---")
-        
-        # Create async tasks for post-processing each section
-        post_processing_tasks = []
-        for i, section_data in enumerate(generated_sections_data):
-            post_processing_tasks.append(
-                self.process_single_section(i, section_data, proposal, full_proposal_content, db)
-            )
-        
-        processed_sections = await asyncio.gather(*post_processing_tasks)
+    def _wants_images(self, section_title: str) -> bool:
+        """Sections that carry a stock image (diagram-, logo- and table-heavy sections don't)."""
+        title_lower = section_title.lower()
+        return not any(keyword in title_lower for keyword in ["user journey", "workflow", "technology stack", "about us", "company", "logo", "payment milestone", "cost", "pricing", "development plan"])
 
-        logging.info("--- Proposal Generation Complete (Optimized Flow) ---")
-        return {"sections": processed_sections}
+    async def process_single_section(self, i: int, section_data: Dict, proposal: Proposal, full_proposal_content: Union[str, Awaitable[str]], db: AsyncSession, emit: Optional[Callable[[str, Dict], None]] = None, content_keywords: Optional[Union[str, Awaitable[str]]] = None) -> Dict:
+        """Attach a chart, tech logos and a stock image to one generated section.
 
-    async def process_single_section(self, i: int, section_data: Dict, proposal: Proposal, full_proposal_content: str, db: AsyncSession) -> Dict:
+        `content_keywords` is the section's image query when it was extracted
+        in a batch (or a future for it); without it the query is extracted here.
+        """
         section_title = section_data.get("title", f"Section {i+1}")
         content_html = section_data.get("contentHtml", "<p>Error: Content not generated.</p>")
 
@@ -164,36 +409,19 @@ class ProposalManagerAgent(ConversableAgent):
 
         # A. Generate Diagram with smart chart type detection
         try:
-            chart_type = None
-            if any(term in title_lower for term in ["user journey", "workflow", "process", "architecture"]):
-                chart_type = "flowchart"
-            elif any(term in title_lower for term in ["development plan", "schedule"]):
-                chart_type = "gantt"
-            elif any(term in title_lower for term in ["system", "integration", "api"]):
-                chart_type = "sequence"
-            elif any(term in title_lower for term in ["structure", "organization", "hierarchy"]):
-                chart_type = "mindmap"
-            if "distribution" in title_lower or "breakdown" in title_lower:
-                chart_type = "pie"
-            
-            # Prevent pie chart generation for cost/pricing sections which already generate HTML tables
-            if chart_type == "pie" and any(term in title_lower for term in ["cost", "pricing"]):
-                logging.info(f"Skipping pie chart generation for '{section_title}' as it's a cost/pricing section.")
-                chart_type = None
+            suggestion = diagram_agent.classify_chart_type(section_title, content_html)
+            chart_type = suggestion.chart_type if suggestion.chart_type != "none" else None
+            logging.info(f"Chart type for '{section_title}': {suggestion.chart_type} (confidence {suggestion.confidence:.2f})")
 
             if chart_type:
                 logging.info(f"Generating {chart_type} chart for section: {section_title}")
-                # Instantiate DiagramAgent locally
-                local_diagram_agent = DiagramAgent(client=client)
-                chart_code = await asyncio.to_thread(
-                    local_diagram_agent.generate_chart,
-                    chart_type,
-                    content_html
-                )
+                chart_code = await diagram_agent.agenerate_chart(chart_type, content_html, proposal=proposal)
                 if chart_code:
                     section_obj["mermaid_chart"] = chart_code
                     section_obj["chart_type"] = chart_type
                     logging.info(f"Successfully generated {chart_type} chart for {section_title}")
+                    if emit:
+                        emit("chart_ready", {"index": i, "chart_type": chart_type, "mermaid_chart": chart_code})
                 else:
                     logging.warning(f"Failed to generate {chart_type} chart for {section_title}")
         except Exception as e:
@@ -201,19 +429,30 @@ class ProposalManagerAgent(ConversableAgent):
 
         # B. Analyze for Tech Logos
         if "technology stack" in title_lower:
-            section_obj["tech_logos"] = await content_writer_agent.analyze_tech_stack(proposal.rfpText, full_proposal_content, db)
+            if not isinstance(full_proposal_content, str):
+                full_proposal_content = await full_proposal_content
+            rfp_digest = await rfp_digest_agent.get_digest(proposal.id, proposal.rfpText)
+            section_obj["tech_logos"] = await content_writer_agent.analyze_tech_stack(rfp_digest, full_proposal_content, db)
+            if emit:
+                emit("logos_ready", {"index": i, "tech_logos": section_obj["tech_logos"]})
 
         # C. Search for Images
-        if not any(keyword in title_lower for keyword in ["user journey", "workflow", "technology stack", "about us", "company", "logo", "payment milestone", "cost", "pricing", "development plan"]):
+        if self._wants_images(section_title):
             try:
-                content_keywords = await asyncio.to_thread(self.get_image_query_from_text, content_html)
-                image_query = f"{section_title}{content_keywords}{proposal.rfpText}".strip()[:100]
+                if content_keywords is None:
+                    content_keywords = await self.aget_image_query_from_text(content_html)
+                elif not isinstance(content_keywords, str):
+                    content_keywords = await content_keywords
+                rfp_digest = await rfp_digest_agent.get_digest(proposal.id, proposal.rfpText)
+                image_query = f"{section_title} {content_keywords} {' '.join(rfp_digest.keywords)}".strip()[:100]
                 if image_query:
                     logging.info(f"Searching for image with query: {image_query}")
                     images = await content_writer_agent.search_images(image_query)
                     if images:
                         section_obj["image_urls"] = [images[0]["url"]]
                         section_obj["image_placement"] = "full-width-top"
+                        if emit:
+                            emit("images_ready", {"index": i, "image_urls": section_obj["image_urls"]})
             except Exception as e:
                 logging.error(f"Error searching for image for section {section_title}: {e}")
 
@@ -236,7 +475,7 @@ class ProposalManagerAgent(ConversableAgent):
         """
 
         message_history = [{"role": "user", "content": prompt}]
-        enhanced_content = await asyncio.to_thread(self.generate_response, message_history)
+        enhanced_content = await self.agenerate_response(message_history, task="enhance")
         
         logging.info("--- Section content enhancement complete ---")
         return enhanced_content
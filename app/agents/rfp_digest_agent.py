@@ -0,0 +1,129 @@
+import hashlib
+import logging
+import re
+from collections import Counter, OrderedDict
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.llm_client import get_sync_client
+from app.core.singleflight import SingleFlight
+from app.schemas import RfpDigest
+from .base_agent import ConversableAgent
+
+# Shared Groq client
+client = get_sync_client()
+
+_STOPWORDS = {
+    "the", "and", "for", "with", "that", "this", "from", "will", "shall", "must", "should", "have",
+    "are", "our", "your", "their", "which", "into", "such", "also", "able", "been", "being", "each",
+    "all", "any", "can", "may", "not", "but", "has", "its", "they", "them", "who", "what", "when",
+    "where", "would", "could", "than", "then", "there", "these", "those", "about", "over", "more",
+    "other", "including", "provide", "required", "requirements", "project", "proposal", "rfp",
+}
+
+
+def _hash_rfp(rfp_text: str) -> str:
+    return hashlib.sha256((rfp_text or "").encode("utf-8")).hexdigest()
+
+
+class RfpDigestAgent(ConversableAgent):
+    """Condenses an RFP once per proposal into a bounded digest reused by every prompt."""
+
+    def __init__(self, client):
+        super().__init__(
+            name="RfpDigest",
+            system_message="You are a requirements analyst. You condense requests for proposals into compact, factual digests.",
+            client=client,
+        )
+        # proposal_id (or content hash when there is no id) -> (rfp hash, digest)
+        self._digests: "OrderedDict[object, Tuple[str, RfpDigest]]" = OrderedDict()
+        self._inflight = SingleFlight("rfp_digest")
+
+    async def get_digest(self, proposal_id: Optional[int], rfp_text: str) -> RfpDigest:
+        """Return the cached digest for a proposal, building it if the RFP is new or changed."""
+        rfp_hash = _hash_rfp(rfp_text)
+        cache_key = proposal_id if proposal_id is not None else rfp_hash
+
+        cached = self._digests.get(cache_key)
+        if cached and cached[0] == rfp_hash:
+            self._digests.move_to_end(cache_key)
+            return cached[1]
+
+        digest, complete = await self._inflight.do(rfp_hash, lambda: self._build_digest(rfp_text))
+        if not complete:
+            # Don't pin a local fallback; the next call retries the LLM
+            return digest
+        self._digests[cache_key] = (rfp_hash, digest)
+        self._digests.move_to_end(cache_key)
+        while len(self._digests) > settings.RFP_DIGEST_CACHE_SIZE:
+            self._digests.popitem(last=False)
+        return digest
+
+    def invalidate(self, proposal_id: int) -> None:
+        """Drop the cached digest for a proposal (called when its rfpText changes)."""
+        self._digests.pop(proposal_id, None)
+
+    async def _build_digest(self, rfp_text: str) -> Tuple[RfpDigest, bool]:
+        """Returns the digest and whether it came from the LLM (False for the local fallback)."""
+        rfp_text = (rfp_text or "").strip()
+        if not rfp_text:
+            return RfpDigest(summary=""), True
+
+        prompt = f"""Condense the following request for proposal (RFP) into a compact digest.
+
+        **RFP:**
+        ```{rfp_text[:settings.RFP_DIGEST_INPUT_MAX_CHARS]}```
+
+        **Instructions:**
+        1.  **summary:** A factual summary of the client's goals, scope, constraints, budget and timeline, at most {settings.RFP_DIGEST_SUMMARY_MAX_CHARS} characters.
+        2.  **key_requirements:** Up to {settings.RFP_DIGEST_MAX_ITEMS} short requirement statements.
+        3.  **tech_mentions:** Every technology, platform, language or tool the RFP names.
+        4.  **keywords:** Up to {settings.RFP_DIGEST_MAX_ITEMS} concrete, visual keywords describing the domain.
+        5.  **Output Format:** Return ONLY a JSON object with the keys "summary", "key_requirements", "tech_mentions" and "keywords".
+        """
+        data = await self.agenerate_json([{"role": "user", "content": prompt}], task="rfp_digest")
+        if not isinstance(data, dict) or not data.get("summary"):
+            logging.warning("RFP digest extraction failed, falling back to a local digest: the response has no summary")
+            return self._bounded(summary=rfp_text, keywords=self._local_keywords(rfp_text)), False
+
+        return self._bounded(
+            summary=str(data.get("summary", "")),
+            key_requirements=data.get("key_requirements") or [],
+            tech_mentions=data.get("tech_mentions") or [],
+            keywords=data.get("keywords") or [],
+        ), True
+
+    def _bounded(self, summary: str, key_requirements: List = (), tech_mentions: List = (), keywords: List = ()) -> RfpDigest:
+        """Clamp every field so prompts built from the digest stay small."""
+        max_items = settings.RFP_DIGEST_MAX_ITEMS
+
+        def clean(items) -> List[str]:
+            values = [str(item).strip()[:200] for item in items if isinstance(item, (str, int, float)) and str(item).strip()]
+            return list(dict.fromkeys(values))[:max_items]
+
+        return RfpDigest(
+            summary=summary.strip()[:settings.RFP_DIGEST_SUMMARY_MAX_CHARS],
+            key_requirements=clean(key_requirements),
+            tech_mentions=clean(tech_mentions),
+            keywords=clean(keywords),
+        )
+
+    def _local_keywords(self, text: str) -> List[str]:
+        words = re.findall(r"[a-zA-Z][a-zA-Z\-]{3,}", text.lower())
+        counts = Counter(word for word in words if word not in _STOPWORDS)
+        return [word for word, _ in counts.most_common(settings.RFP_DIGEST_MAX_ITEMS)]
+
+
+def format_rfp_digest(digest: RfpDigest) -> str:
+    """Render a digest as a compact prompt block."""
+    lines = [f"Summary: {digest.summary}"]
+    if digest.key_requirements:
+        lines.append("Key requirements:\n" + "\n".join(f"- {item}" for item in digest.key_requirements))
+    if digest.tech_mentions:
+        lines.append(f"Technologies mentioned: {', '.join(digest.tech_mentions)}")
+    if digest.keywords:
+        lines.append(f"Keywords: {', '.join(digest.keywords)}")
+    return "\n".join(lines)
+
+
+rfp_digest_agent = RfpDigestAgent(client=client)
@@ -1,6 +1,6 @@
 
 from fastapi import APIRouter
-from .endpoints import proposals, images, sections, ai_content, diagrams, user_images
+from .endpoints import proposals, images, sections, ai_content, diagrams, user_images, monitoring, jobs
 
 api_router = APIRouter()
 api_router.include_router(proposals.router, prefix="/proposals", tags=["proposals"])
@@ -9,3 +9,5 @@ api_router.include_router(ai_content.router, prefix="/ai", tags=["ai-content"])
 api_router.include_router(diagrams.router, prefix="/diagrams", tags=["diagrams"])
 api_router.include_router(images.router, prefix="/images", tags=["images"])
 api_router.include_router(user_images.router, prefix="/user-images", tags=["user-images"])
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+api_router.include_router(monitoring.router, prefix="/monitoring", tags=["monitoring"])
@@ -1,9 +1,11 @@
+from typing import Optional
+
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import crud, schemas
 from app.database import get_db
-from app.agents.diagram_agent import DiagramAgent
+from app.agents.diagram_agent import diagram_agent
 
 router = APIRouter()
 
@@ -16,12 +18,36 @@ async def generate_chart_for_section_endpoint(
     if not db_section:
         raise HTTPException(status_code=404, detail="Section not found")
 
-    from groq import Groq
-    import os
-    client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
-    diagram_agent = DiagramAgent(client=client)
-    mermaid_code = diagram_agent.generate_chart(request.chart_type, request.description)
+    # Gantt charts are built from the proposal's dates unless a different one is asked for
+    proposal = None
+    if request.chart_type.lower() == "gantt" and not request.regenerate:
+        proposal = await crud.get_proposal(db, db_section.proposal_id)
+    mermaid_code = await diagram_agent.agenerate_chart(
+        request.chart_type,
+        request.description,
+        refresh=request.regenerate,
+        proposal=schemas.Proposal(**proposal) if proposal else None,
+        speculative=request.speculative,
+    )
 
     update_data = schemas.SectionUpdate(mermaid_chart=mermaid_code, chart_type=request.chart_type)
     updated_section = await crud.update_section(db, section_id=request.section_id, section=update_data)
     return updated_section
+
+@router.post("/proposals/{proposal_id}/auto_generate", response_model=schemas.AutoChartsResponse)
+async def auto_generate_charts_endpoint(
+    proposal_id: int,
+    deadline: Optional[float] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Pick a chart type for every section, generate the charts concurrently and save the ones that succeed."""
+    proposal = await crud.get_proposal(db, proposal_id)
+    if not proposal:
+        raise HTTPException(status_code=404, detail="Proposal not found")
+    proposal = schemas.Proposal(**proposal)
+
+    result = await diagram_agent.aauto_generate_charts_for_proposal(proposal.sections, proposal=proposal, deadline=deadline)
+    for chart in result["charts"]:
+        update_data = schemas.SectionUpdate(mermaid_chart=chart["chart_code"], chart_type=chart["chart_type"])
+        await crud.update_section(db, section_id=chart["section_id"], section=update_data)
+    return result
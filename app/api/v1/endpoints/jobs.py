@@ -0,0 +1,18 @@
+from fastapi import APIRouter, HTTPException
+from typing import Any
+
+from app import crud, schemas
+from app.database import JobSessionLocal
+
+router = APIRouter()
+
+@router.get("/{job_id}", response_model=schemas.GenerationJob, summary="Get a generation job", description="Returns the status, current stage, section progress, per-stage timings (seconds since the job started) and last error of a background draft generation job.")
+async def get_generation_job(job_id: int) -> Any:
+    """
+    Get a background generation job by its ID.
+    """
+    async with JobSessionLocal() as jobs_db:
+        job = await crud.get_generation_job(jobs_db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -0,0 +1,35 @@
+from fastapi import APIRouter
+from typing import Dict, Any
+
+from app.agents.diagram_agent import chart_cache
+from app.core.hedging import llm_hedger
+from app.core.llm_cache import llm_cache
+from app.core.mermaid_repair import mermaid_repairer
+from app.core.rate_limiter import rate_limiter_stats
+from app.core.singleflight import llm_singleflight, image_search_singleflight
+
+router = APIRouter()
+
+@router.get("/llm-cache", response_model=Dict[str, Any], summary="LLM cache statistics", description="Returns hit/miss counters and occupancy of the LLM response cache.")
+async def get_llm_cache_stats() -> Any:
+    return llm_cache.stats()
+
+@router.get("/chart-cache", response_model=Dict[str, Any], summary="Chart cache statistics", description="Returns hit/miss counters and occupancy of the cache of validated charts.")
+async def get_chart_cache_stats() -> Any:
+    return chart_cache.stats()
+
+@router.get("/rate-limiter", response_model=Dict[str, Any], summary="LLM rate limiter statistics", description="Returns each model's Groq rate limiter counters and currently available request/token budget.")
+async def get_rate_limiter_stats() -> Any:
+    return rate_limiter_stats()
+
+@router.get("/singleflight", response_model=Dict[str, Any], summary="Request coalescing statistics", description="Returns how many LLM and image-search calls were deduplicated because an identical call was already in flight.")
+async def get_singleflight_stats() -> Any:
+    return {"llm": llm_singleflight.stats(), "image_search": image_search_singleflight.stats()}
+
+@router.get("/hedging", response_model=Dict[str, Any], summary="Hedged request statistics", description="Returns how many LLM requests were hedged, how often the hedge won, and recent latency percentiles per task and model.")
+async def get_hedging_stats() -> Any:
+    return llm_hedger.stats()
+
+@router.get("/chart-repair", response_model=Dict[str, Any], summary="Chart repair statistics", description="Returns how many invalid generated charts were repaired locally, how many needed an LLM fix and how often that worked, and which repairs were applied.")
+async def get_chart_repair_stats() -> Any:
+    return mermaid_repairer.stats()
@@ -1,13 +1,47 @@
+import asyncio
+import json
+import logging
 from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Any
+from typing import List, Any, AsyncIterator, Dict
 
 from app import crud, schemas
-from app.database import get_db
+from app.core.config import settings
+from app.database import get_db, AsyncSessionLocal
 from app.agents.proposal_manager_agent import proposal_manager_agent
+from app.services.generation_jobs import enqueue_generation_job
 
 router = APIRouter()
 
+
+def _sse(event: str, data: Dict) -> str:
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
+async def _with_heartbeat(events: AsyncIterator[str], interval: float) -> AsyncIterator[str]:
+    """Interleave SSE comments into a quiet stream so proxies keep the connection open."""
+    iterator = events.__aiter__()
+    next_event = asyncio.ensure_future(iterator.__anext__())
+    try:
+        while True:
+            done, _ = await asyncio.wait({next_event}, timeout=interval)
+            if not done:
+                yield ": keep-alive\n\n"
+                continue
+            try:
+                yield next_event.result()
+            except StopAsyncIteration:
+                return
+            next_event = asyncio.ensure_future(iterator.__anext__())
+    finally:
+        # aclose() fails while a __anext__ is still running, so let the cancellation land first
+        next_event.cancel()
+        await asyncio.gather(next_event, return_exceptions=True)
+        await iterator.aclose()
+
 @router.post("/", response_model=schemas.Proposal, summary="Create a new proposal", description="Creates a new proposal with the given data.")
 async def create_proposal(
     proposal: schemas.ProposalCreate,
@@ -18,10 +52,11 @@ async def create_proposal(
     """
     return await crud.create_proposal(db=db, proposal=proposal)
 
-@router.post("/{proposal_id}/generate", response_model=schemas.Proposal, summary="Generate a proposal draft", description="Generates a proposal draft with AI-generated content.")
+@router.post("/{proposal_id}/generate", response_model=schemas.Proposal, responses={202: {"model": schemas.GenerationJob}}, summary="Generate a proposal draft", description="Generates a proposal draft with AI-generated content. With `background=true` the draft is queued as a job and the job is returned with 202; poll `/jobs/{job_id}` for progress.")
 async def generate_proposal_draft(
     proposal_id: int,
     request: schemas.GenerateProposalDraftRequest,
+    background: bool = False,
     db: AsyncSession = Depends(get_db),
 ) -> Any:
     """
@@ -31,21 +66,73 @@ async def generate_proposal_draft(
     if not proposal:
         raise HTTPException(status_code=404, detail="Proposal not found")
 
+    if background:
+        job = await enqueue_generation_job(proposal_id, request.sections, request.strategy)
+        return JSONResponse(status_code=202, content=jsonable_encoder(schemas.GenerationJob.model_validate(job)))
+
     # The proposal from crud.get_proposal is a dict, so we need to convert it to a Pydantic model
     proposal_model = schemas.Proposal(**proposal)
 
-    generated_data = await proposal_manager_agent.generate_proposal_draft(proposal_model, db, sections=request.sections)
+    generated_data = await proposal_manager_agent.generate_proposal_draft(proposal_model, db, sections=request.sections, strategy=request.strategy)
 
-    # Update the proposal with the generated sections
-    for section_data in generated_data.get("sections", []):
+    # Update the proposal with the generated sections, in draft order like the streaming endpoint and background jobs
+    for index, section_data in enumerate(generated_data.get("sections", [])):
         # Ensure contentHtml is not None
         if section_data.get("contentHtml") is None:
             section_data["contentHtml"] = ""
         section_create = schemas.SectionCreate(**section_data)
-        await crud.create_section(db, proposal_id, section_create, section_data.get("order", 0))
+        await crud.create_section(db, proposal_id, section_create, index)
 
     return await crud.get_proposal(db, proposal_id)
 
+@router.post("/{proposal_id}/generate/stream", summary="Generate a proposal draft (streaming)", description="Generates a proposal draft and streams progress as Server-Sent Events: content_parsed, per-section chart_ready/logos_ready/images_ready/section_ready, section_persisted, then done (or error).")
+async def stream_proposal_draft(
+    proposal_id: int,
+    request: schemas.GenerateProposalDraftRequest,
+    db: AsyncSession = Depends(get_db),
+) -> StreamingResponse:
+    """
+    Generate a proposal draft, streaming each stage as it completes.
+    """
+    proposal = await crud.get_proposal(db, proposal_id)
+    if not proposal:
+        raise HTTPException(status_code=404, detail="Proposal not found")
+    proposal_model = schemas.Proposal(**proposal)
+
+    async def event_stream() -> AsyncIterator[str]:
+        # The request-scoped session may be released before the body is streamed, so use our own.
+        async with AsyncSessionLocal() as session:
+            ready: Dict[int, Dict] = {}
+            next_index = 0
+            try:
+                async for event in proposal_manager_agent.stream_proposal_draft(proposal_model, session, sections=request.sections, strategy=request.strategy):
+                    yield _sse(event["event"], event["data"])
+                    if event["event"] != "section_ready":
+                        continue
+
+                    # Persist in draft order, as /generate and background jobs do
+                    ready[event["data"]["index"]] = event["data"]["section"]
+                    while next_index in ready:
+                        section_data = ready.pop(next_index)
+                        if section_data.get("contentHtml") is None:
+                            section_data["contentHtml"] = ""
+                        db_section = await crud.create_section(session, proposal_id, schemas.SectionCreate(**section_data), next_index)
+                        yield _sse("section_persisted", {"index": next_index, "section_id": db_section.id})
+                        next_index += 1
+
+                yield _sse("done", {"proposal_id": proposal_id, "sections": next_index})
+            except ValueError as e:
+                yield _sse("error", {"message": str(e)})
+            except Exception as e:
+                logging.exception(f"Streaming draft generation failed for proposal {proposal_id}")
+                yield _sse("error", {"message": "Draft generation failed."})
+
+    return StreamingResponse(
+        _with_heartbeat(event_stream(), settings.SSE_HEARTBEAT_INTERVAL),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.get("/{proposal_id}", response_model=schemas.Proposal, summary="Get a single proposal", description="Returns a single proposal by its ID, including all of its sections and their content.")
 async def get_proposal(
     proposal_id: int,
@@ -0,0 +1,56 @@
+"""Check the chart-type classifier against the labelled corpus and time it.
+
+Usage:
+    python -m app.benchmarks.chart_classifier [--iterations 2000]
+
+Prints every section whose suggested chart type differs from its label (exit
+status 1 if any do), the accuracy, then the mean and p99 classification time
+per section. The labels are also checked by tests/test_chart_classifier.py.
+"""
+import argparse
+import sys
+import time
+from typing import List
+
+from app.benchmarks.chart_type_corpus import CORPUS
+from app.core.chart_classifier import classify_chart
+
+
+def check_corpus() -> List[str]:
+    """Descriptions of the corpus entries the classifier gets wrong."""
+    mismatches = []
+    for title, content, expected in CORPUS:
+        suggestion = classify_chart(title, content)
+        if suggestion.chart_type != expected:
+            mismatches.append(f"{title}: expected {expected}, got {suggestion.chart_type} ({suggestion.to_dict()})")
+    return mismatches
+
+
+def time_corpus(iterations: int) -> List[float]:
+    """Per-section classification times in microseconds."""
+    samples = []
+    for _ in range(iterations):
+        for title, content, _ in CORPUS:
+            started = time.perf_counter()
+            classify_chart(title, content)
+            samples.append((time.perf_counter() - started) * 1e6)
+    return samples
+
+
+def main(iterations: int) -> int:
+    mismatches = check_corpus()
+    for mismatch in mismatches:
+        print(f"MISMATCH {mismatch}")
+    print(f"{len(CORPUS) - len(mismatches)}/{len(CORPUS)} sections classified as labelled")
+
+    samples = sorted(time_corpus(iterations))
+    mean = sum(samples) / len(samples)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(f"{len(samples)} classifications: mean {mean:.1f} µs, p99 {p99:.1f} µs")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    sys.exit(main(parser.parse_args().iterations))
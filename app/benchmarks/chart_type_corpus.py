@@ -0,0 +1,54 @@
+"""Labelled proposal sections for checking and timing the chart-type classifier.
+
+Each entry is (section title, section HTML, expected chart type or "none").
+The standard draft sections come first with the chart they get today; the
+rest are titles and content seen in generated and user-written proposals.
+"""
+from typing import List, Tuple
+
+CORPUS: List[Tuple[str, str, str]] = [
+    # --- standard draft sections -------------------------------------------
+    ("Executive Summary", "<p>Acme needs a modern booking platform. We propose a cloud-native web and mobile solution that cuts booking time in half and gives staff a single view of every customer.</p>", "none"),
+    ("Product Vision and Overview", "<p>The platform becomes the one place customers plan, book and pay for services.</p><ul><li>Self-service booking</li><li>Real-time availability</li></ul>", "none"),
+    ("Core Functionality and Key Features", "<ul><li><b>Booking engine</b> with real-time availability</li><li><b>Payments</b> via Stripe</li><li><b>Admin dashboard</b> with reports</li></ul>", "none"),
+    ("User Journey / Workflow", "<ol><li>The customer searches for a service</li><li>Then picks a slot</li><li>Next they pay and receive a confirmation</li><li>Staff approval for special requests</li></ol>", "flowchart"),
+    ("Technology Stack", "<p>React, Node.js, PostgreSQL and AWS. The API layer is built with NestJS and documented with OpenAPI.</p>", "none"),
+    ("Development Plan", "<p>Work runs in two-week sprints.</p><ul><li>Discovery workshops</li><li>MVP build</li><li>Beta release</li></ul>", "gantt"),
+    ("Payment Milestones", "<table><tr><th>Milestone</th><th>Amount</th></tr><tr><td>Kick-off</td><td>$10,000</td></tr><tr><td>MVP</td><td>$20,000</td></tr><tr><td>Launch</td><td>$10,000</td></tr></table>", "none"),
+    ("Product Cost & Pricing Breakdown", "<table><tr><th>Item</th><th>Cost</th></tr><tr><td>Design</td><td>$12,000</td></tr><tr><td>Development</td><td>$40,000</td></tr><tr><td>QA</td><td>$8,000</td></tr></table>", "none"),
+    ("Timeline & Roadmap", "<p>Phase 1 starts in March 2025; the beta ships by June 30 and general availability follows in week 20.</p>", "gantt"),
+    ("About Us", "<p>We are a 40-person product studio with offices in Berlin and Lisbon, founded in 2012.</p>", "none"),
+    ("Path to Partnership", "<p>Sign the proposal, schedule a kick-off call and meet your dedicated team.</p>", "none"),
+    # --- flowchart ------------------------------------------------------------
+    ("Our Delivery Process", "<p>Every feature goes through design, build, review and release.</p>", "flowchart"),
+    ("Solution Architecture", "<p>The web app talks to an API gateway, which routes to booking, payment and notification services.</p>", "flowchart"),
+    ("Approval Workflow", "<p>Requests are submitted, then reviewed by a manager. The decision triggers either fulfilment or a revision step.</p>", "flowchart"),
+    ("Implementation Approach", "<ol><li>Step 1: audit</li><li>Step 2: migrate</li><li>Step 3: verify</li></ol>", "flowchart"),
+    # --- gantt ----------------------------------------------------------------
+    ("Project Schedule", "<ul><li>Week 1-2: discovery</li><li>Week 3-8: build</li><li>Week 9: launch</li></ul>", "gantt"),
+    ("Implementation Plan and Milestones", "<p>Milestone 1 on 2025-04-01, milestone 2 on 2025-06-01, go-live before the deadline in September.</p>", "gantt"),
+    ("Product Roadmap", "<p>Q1: MVP. Q2: integrations. Q3: analytics.</p>", "gantt"),
+    # --- sequence -------------------------------------------------------------
+    ("Third-Party Integrations", "<p>The app calls the Salesforce API; webhooks push responses back and tokens are refreshed on every request.</p>", "sequence"),
+    ("API Design", "<p>Clients authenticate with OAuth tokens; each request to an endpoint returns a JSON response.</p>", "sequence"),
+    ("System Interactions", "<p>The POS system sends a request to the inventory service, which replies with stock levels.</p>", "sequence"),
+    # --- mindmap --------------------------------------------------------------
+    ("Team Structure", "<ul><li>Product: PM, designer</li><li>Engineering: 4 developers</li><li>QA: 1 tester</li></ul>", "mindmap"),
+    ("Project Scope", "<p>The scope covers three modules: booking, payments and reporting, across all departments.</p>", "mindmap"),
+    ("Organization Hierarchy", "<p>Board, then executive team, then department leads.</p>", "mindmap"),
+    # --- pie ------------------------------------------------------------------
+    ("Budget Allocation", "<p>Development takes 55%, design 20%, QA 15% and project management 10% of the budget.</p>", "pie"),
+    ("Effort Distribution", "<table><tr><th>Area</th><th>Share</th></tr><tr><td>Backend</td><td>45%</td></tr><tr><td>Frontend</td><td>35%</td></tr><tr><td>DevOps</td><td>20%</td></tr></table>", "pie"),
+    ("Resource Breakdown", "<table><tr><th>Role</th><th>Hours</th></tr><tr><td>Developer</td><td>800</td></tr><tr><td>Designer</td><td>200</td></tr><tr><td>PM</td><td>150</td></tr></table>", "pie"),
+    ("Market Overview", "<p>Mobile accounts for 62% of bookings, desktop for 30% and kiosks for 8%; the share of mobile grows every year.</p>", "pie"),
+    # --- journey --------------------------------------------------------------
+    ("Customer Journey", "<p>From sign-up to first booking: we map each touchpoint and the customer's satisfaction along the way.</p>", "journey"),
+    ("Onboarding Experience", "<p>New users sign up, verify email and complete their profile; pain points today are slow verification and long forms.</p>", "journey"),
+    # --- c4 -------------------------------------------------------------------
+    ("C4 Context Diagram", "<p>Customers and staff use the booking system, which depends on Stripe and SendGrid.</p>", "c4"),
+    # --- no chart -------------------------------------------------------------
+    ("Why Choose Us", "<p>Fifteen years of delivery, 200+ launched products and a 98% client retention rate.</p>", "none"),
+    ("Terms and Conditions", "<p>This proposal is valid for 30 days. Intellectual property transfers on final payment.</p>", "none"),
+    ("Case Studies", "<p>For RetailCo we rebuilt checkout, increasing conversion by 18%.</p>", "none"),
+    ("Support & Maintenance", "<p>We offer 12 months of support with a 4-hour response time for critical issues.</p>", "none"),
+]
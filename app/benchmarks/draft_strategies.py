@@ -0,0 +1,81 @@
+"""Compare the one-shot and fan-out draft strategies on a real proposal.
+
+Usage:
+    python -m app.benchmarks.draft_strategies --proposal-id 1 [--runs 3] [--concurrency 4]
+
+Each run generates a full draft (nothing is persisted) and reports the wall
+time until every section's content was written, the total wall time including
+post-processing, the number of sections and the LLM tokens the run consumed.
+The RFP digest is built once up front so both strategies start from the same
+cached context.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Dict, List
+
+from app import crud, schemas
+from app.agents.proposal_manager_agent import proposal_manager_agent
+from app.agents.rfp_digest_agent import rfp_digest_agent
+from app.core.config import settings
+from app.core.metrics import llm_tokens
+from app.database import AsyncSessionLocal
+
+STRATEGIES = ("one_shot", "fan_out")
+
+
+async def _run_once(proposal: schemas.Proposal, db, strategy: str, sections: List[str]) -> Dict[str, float]:
+    tokens_before = {kind: llm_tokens.total(kind=kind) for kind in ("prompt", "completion")}
+    started = time.perf_counter()
+    content_done = None
+    count = 0
+    async for event in proposal_manager_agent.stream_proposal_draft(proposal, db, sections=sections or None, strategy=strategy):
+        if event["event"] == "content_parsed":
+            content_done = time.perf_counter() - started
+            count = event["data"]["count"]
+    total = time.perf_counter() - started
+    return {
+        "content_seconds": content_done if content_done is not None else total,
+        "total_seconds": total,
+        "sections": count,
+        **{f"{kind}_tokens": llm_tokens.total(kind=kind) - before for kind, before in tokens_before.items()},
+    }
+
+
+def _summary(results: List[Dict[str, float]]) -> Dict[str, float]:
+    return {key: statistics.median(result[key] for result in results) for key in results[0]}
+
+
+async def main(proposal_id: int, runs: int, sections: List[str]) -> None:
+    async with AsyncSessionLocal() as db:
+        proposal = await crud.get_proposal(db, proposal_id)
+        if not proposal:
+            raise SystemExit(f"Proposal {proposal_id} not found")
+        proposal = schemas.Proposal(**proposal)
+        await rfp_digest_agent.get_digest(proposal.id, proposal.rfpText)
+
+        results: Dict[str, List[Dict[str, float]]] = {strategy: [] for strategy in STRATEGIES}
+        for run in range(runs):
+            # Alternate the order so neither strategy always runs against a fresher rate limit window
+            for strategy in STRATEGIES if run % 2 == 0 else reversed(STRATEGIES):
+                result = await _run_once(proposal, db, strategy, sections)
+                results[strategy].append(result)
+                print(f"run {run + 1} {strategy:>8}: " + ", ".join(f"{key}={value:.1f}" for key, value in result.items()))
+
+    print(f"\nmedian of {runs} run(s), fan-out concurrency {settings.DRAFT_FAN_OUT_CONCURRENCY}:")
+    for strategy in STRATEGIES:
+        summary = _summary(results[strategy])
+        print(f"{strategy:>8}: " + ", ".join(f"{key}={value:.1f}" for key, value in summary.items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--proposal-id", type=int, required=True)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, help="override DRAFT_FAN_OUT_CONCURRENCY")
+    parser.add_argument("--section", action="append", default=[], help="section title (repeatable); defaults to the standard sections")
+    args = parser.parse_args()
+    if args.concurrency:
+        settings.DRAFT_FAN_OUT_CONCURRENCY = args.concurrency
+    asyncio.run(main(args.proposal_id, args.runs, args.section))
@@ -0,0 +1,182 @@
+"""Labelled Mermaid charts for checking and timing the local validator.
+
+Each entry is (name, chart code, whether Mermaid renders it). The invalid
+ones are the failure modes seen in generated charts; the valid ones include
+the prompt examples and syntax the old prefix check rejected.
+"""
+from typing import Dict, List, Tuple
+
+CORPUS: List[Tuple[str, str, bool]] = [
+    # --- flowchart -------------------------------------------------------
+    ("flowchart prompt example", """graph TD
+    A[💡 Start: Idea Proposal] --> B[📋 Requirement Analysis]
+    B --> C[🧩 Design Prototype]
+    C --> D{Design Approved?}
+    D -->|Yes| E[⚙️ Development Sprint]
+    D -->|No| F[🔁 Revise Design]
+    E --> G[🧪 QA & Testing]
+    G --> H{All Tests Passed?}
+    H -->|Yes| I[🚀 Deployment]
+    H -->|No| J[🐞 Bug Fix Cycle]
+    J --> E
+    I --> K[✅ Project Sign-off]""", True),
+    ("flowchart keyword", "flowchart LR\n    A --> B", True),
+    ("indented header", "   graph TD\n      A --> B", True),
+    ("shapes and link styles", """flowchart TD
+    A([Start]) --> B[[Subroutine]]
+    B -.-> C[(Database)]
+    C ==> D((Circle))
+    D --- E>Flag]
+    E -- label text --> F{{Hexagon}}
+    F -. dotted text .-> G[/Input/]
+    G --o H[\\Output\\]
+    H --x I(Rounded)""", True),
+    ("subgraphs and styling", """flowchart TB
+    subgraph Design Phase
+        direction LR
+        A[Wireframes] --> B[Mockups]
+    end
+    subgraph dev [Development Phase]
+        C[Build] --> D[Test]
+    end
+    B --> C
+    classDef phase fill:#eef,stroke:#33f
+    class A,B phase
+    style D fill:#f9f
+    linkStyle 0 stroke:#f00""", True),
+    ("chained and grouped nodes", "graph LR\n    A & B --> C --> D & E;\n    E --> F; F --> A", True),
+    ("quoted labels", 'graph TD\n    A["Discovery (2 weeks)"] --> B["Build [MVP]"]', True),
+    ("init directive and comments", '%%{init: {"theme": "base"}}%%\n%% comment\ngraph TD\n    A --> B', True),
+    ("class shorthand", "graph TD\n    A:::highlight --> B\n    classDef highlight fill:#ff0", True),
+    ("node reused with the same label", "graph TD\n    A[Start] --> B[Plan]\n    B --> A[Start]", True),
+    ("node id reused for another step", "graph TD\n    A[Start] --> B[Plan]\n    B --> C[Build]\n    C --> A[Launch]", False),
+    ("unquoted parentheses in label", "graph TD\n    A[Discovery (2 weeks)] --> B[Build]", False),
+    ("invalid => arrow", "graph TD\n    A => B", False),
+    ("invalid |> arrow", "graph TD\n    A -->|> B", False),
+    ("unclosed bracket", "graph TD\n    A[Start --> B[End]", False),
+    ("unclosed subgraph", "graph TD\n    subgraph One\n    A --> B", False),
+    ("stray end", "graph TD\n    A --> B\n    end", False),
+    ("dangling link", "graph TD\n    A -->", False),
+    ("end as node id", "graph TD\n    start --> end", False),
+    ("bad direction", "graph XY\n    A --> B", False),
+    ("empty flowchart", "graph TD", False),
+    ("prose instead of code", "Here is your diagram: it shows the flow from A to B.", False),
+    # --- gantt ------------------------------------------------------------
+    ("gantt prompt example", """%%{init: {
+"theme": "base",
+"themeCSS": "
+    .taskText { font-weight: 600; fill: #0f172a; }
+"
+}}%%
+gantt
+    title 📅 2025 Project Roadmap
+    dateFormat  YYYY-MM-DD
+    axisFormat  %b %d
+    tickInterval 2week
+    excludes weekends
+    todayMarker stroke-width:3px,stroke:#f59e0b
+    section Discovery
+    Kick-off & Requirements :active, a1, 2025-01-06, 10d
+    Approval & Sign-off     :a2, after a1, 5d
+    section Launch
+    UAT & Final Review      :active, a8, after a2, 7d
+    Go-Live & Training      :milestone, a9, after a8, 0d""", True),
+    ("gantt durations only", "gantt\n    dateFormat YYYY-MM-DD\n    section A\n    First :2025-02-01, 3w\n    Second :12d", True),
+    ("gantt custom date format", "gantt\n    dateFormat DD/MM/YYYY\n    Task :t1, 01/02/2025, 5d\n    Next :until t1", True),
+    ("gantt without dateFormat", "gantt\n    title Plan\n    Task :t1, 2025-01-01, 5d", True),
+    ("gantt date format mismatch", "gantt\n    dateFormat YYYY-MM-DD\n    Task :t1, 01/02/2025, 5d", False),
+    ("gantt missing dateFormat for its dates", "gantt\n    title Plan\n    Task :t1, 15/01/2025, 5d", False),
+    ("gantt unknown after id", "gantt\n    dateFormat YYYY-MM-DD\n    Task :t1, 2025-01-01, 5d\n    Next :t2, after t9, 5d", False),
+    ("gantt bad duration", "gantt\n    dateFormat YYYY-MM-DD\n    Task :t1, 2025-01-01, five days", False),
+    ("gantt missing colon", "gantt\n    dateFormat YYYY-MM-DD\n    section Build\n    Task t1 2025-01-01 5d", False),
+    ("gantt too many fields", "gantt\n    dateFormat YYYY-MM-DD\n    Task :t1, t0, 2025-01-01, 5d", False),
+    ("gantt no tasks", "gantt\n    title Empty\n    dateFormat YYYY-MM-DD", False),
+    ("gantt mixed with graph", "graph TD\n    section Build\n    Task :t1, 2025-01-01, 5d", False),
+    # --- sequenceDiagram ----------------------------------------------------
+    ("sequence basic", """sequenceDiagram
+    participant U as User
+    actor A as Admin
+    U->>API: Request
+    API-->>U: Response
+    U-)API: Async
+    API-xU: Failure""", True),
+    ("sequence blocks", """sequenceDiagram
+    autonumber
+    loop Every minute
+        Client->>+Server: Poll
+        Server-->>-Client: Status
+    end
+    alt success
+        Server->>DB: Write
+    else failure
+        Server->>Log: Error
+    end
+    Note over Client,Server: Handshake done
+    rect rgb(240, 240, 255)
+        par Notify
+            Server->>Mail: Email
+        and
+            Server->>SMS: Text
+        end
+    end""", True),
+    ("sequence missing message text", "sequenceDiagram\n    A->>B", False),
+    ("sequence unknown arrow", "sequenceDiagram\n    A=>B: Hello", False),
+    ("sequence thick arrow", "sequenceDiagram\n    A==>B: Hello\n    B->A: Hi", False),
+    ("sequence unclosed loop", "sequenceDiagram\n    loop Retry\n    A->>B: Try", False),
+    ("sequence else outside alt", "sequenceDiagram\n    A->>B: Hi\n    else nope", False),
+    ("sequence bad note", "sequenceDiagram\n    A->>B: Hi\n    Note A: text", False),
+    # --- pie --------------------------------------------------------------
+    ("pie prompt example", 'pie\n    title Resource Allocation\n    "Design" : 40\n    "Development" : 35\n    "Testing" : 25', True),
+    ("pie inline title", 'pie showData title Budget\n    "Dev" : 60.5\n    "QA" : 39.5', True),
+    ("pie unquoted label", "pie\n    title Budget\n    Dev : 60\n    QA : 40", False),
+    ("pie percent value", 'pie\n    "Dev" : 60%\n    "QA" : 40%', False),
+    ("pie no slices", "pie\n    title Nothing", False),
+    # --- mindmap ----------------------------------------------------------
+    ("mindmap", """mindmap
+  root((Proposal))
+    Goals
+      Growth
+      Retention
+    Scope[In scope]
+      Web app
+      ::icon(fa fa-book)
+    Risks)Risks(""", True),
+    ("mindmap two roots", "mindmap\n  Root\n    Child\n  Other root", False),
+    ("mindmap unclosed shape", "mindmap\n  root((Proposal\n    Child", False),
+    # --- journey ----------------------------------------------------------
+    ("journey", """journey
+    title Onboarding
+    section Sign up
+      Visit site: 5: User
+      Fill form: 3: User, System
+    section Activate
+      Confirm email: 2: User""", True),
+    ("journey missing score", "journey\n    title Onboarding\n    section Sign up\n      Visit site: User", False),
+    ("journey no tasks", "journey\n    title Onboarding", False),
+    # --- other types ------------------------------------------------------
+    ("class diagram passes through", "classDiagram\n    class Proposal", True),
+]
+
+# Invalid charts that local repair must fix, with the fixes it applies
+REPAIRS: Dict[str, Tuple[str, ...]] = {
+    "node id reused for another step": ("flow_duplicate_ids",),
+    "unquoted parentheses in label": ("flow_labels",),
+    "invalid => arrow": ("flow_arrows",),
+    "invalid |> arrow": ("flow_arrows",),
+    "unclosed bracket": ("flow_labels",),
+    "unclosed subgraph": ("flow_blocks",),
+    "stray end": ("flow_blocks",),
+    "dangling link": ("flow_links",),
+    "end as node id": ("flow_links",),
+    "bad direction": ("header",),
+    "gantt date format mismatch": ("gantt_date_format",),
+    "gantt missing dateFormat for its dates": ("gantt_date_format",),
+    "gantt unknown after id": ("gantt_tasks",),
+    "gantt mixed with graph": ("header",),
+    "sequence unknown arrow": ("sequence_arrows",),
+    "sequence thick arrow": ("sequence_arrows",),
+    "sequence unclosed loop": ("sequence_blocks",),
+    "pie unquoted label": ("pie_slices",),
+    "pie percent value": ("pie_slices",),
+    "mindmap unclosed shape": ("mindmap_shapes",),
+}
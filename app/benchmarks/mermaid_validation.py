@@ -0,0 +1,78 @@
+"""Check the Mermaid validator against the labelled corpus and time it.
+
+Usage:
+    python -m app.benchmarks.mermaid_validation [--iterations 2000]
+
+Prints every chart whose verdict disagrees with its label (exit status 1 if
+any do), the mean and p99 validation time per chart, and how many of the
+invalid charts the local repair pass fixes. The verdicts and repairs are
+also checked by tests/test_mermaid_validation.py.
+"""
+import argparse
+import sys
+import time
+from typing import List
+
+from app.benchmarks.mermaid_corpus import CORPUS
+from app.core.mermaid_repair import MermaidRepairer
+from app.core.mermaid_validator import validate_mermaid
+
+
+def check_corpus() -> List[str]:
+    """Names of the corpus entries the validator gets wrong."""
+    mismatches = []
+    for name, code, expected in CORPUS:
+        result = validate_mermaid(code)
+        if result.valid != expected:
+            detail = "; ".join(result.error_messages()) or "no errors"
+            mismatches.append(f"{name}: expected {'valid' if expected else 'invalid'} ({detail})")
+    return mismatches
+
+
+def time_corpus(iterations: int) -> List[float]:
+    """Per-chart validation times in microseconds."""
+    samples = []
+    for _ in range(iterations):
+        for _, code, _ in CORPUS:
+            started = time.perf_counter()
+            validate_mermaid(code)
+            samples.append((time.perf_counter() - started) * 1e6)
+    return samples
+
+
+def repair_corpus() -> List[str]:
+    """Repair every invalid corpus chart; prints each outcome and returns the names still invalid."""
+    repairer = MermaidRepairer()
+    unrepaired = []
+    for name, code, expected in CORPUS:
+        if expected:
+            continue
+        result = repairer.repair(code)
+        outcome = "repaired" if result.valid else "invalid "
+        print(f"{outcome} {name}: {', '.join(result.fixes) or 'no fix applies'}")
+        if not result.valid:
+            unrepaired.append(name)
+    stats = repairer.stats()
+    print(f"{stats['repaired']}/{stats['attempts']} invalid charts repaired locally")
+    return unrepaired
+
+
+def main(iterations: int) -> int:
+    mismatches = check_corpus()
+    for mismatch in mismatches:
+        print(f"MISMATCH {mismatch}")
+    print(f"{len(CORPUS) - len(mismatches)}/{len(CORPUS)} verdicts match the corpus labels")
+
+    samples = sorted(time_corpus(iterations))
+    mean = sum(samples) / len(samples)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(f"{len(samples)} validations: mean {mean:.1f} µs, p99 {p99:.1f} µs\n")
+
+    repair_corpus()
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    sys.exit(main(parser.parse_args().iterations))
@@ -0,0 +1,328 @@
+"""Local stand-in for Groq, Pixabay, Pexels and the devicon CDN.
+
+Serves recorded or synthetic responses with configurable latency, error and
+429 rates so the pipeline can be load-tested and benchmarked offline and
+reproducibly. Run it with
+
+    uvicorn app.benchmarks.standin:app --port 8900
+
+and point the app at it:
+
+    GROQ_BASE_URL=http://localhost:8900
+    PIXABAY_API_URL=http://localhost:8900/pixabay/api/
+    PEXELS_API_URL=http://localhost:8900/pexels/v1/search
+    DEVICON_CDN_URL=http://localhost:8900/devicon
+
+Every upstream ("groq", "pixabay", "pexels", "devicon") has its own
+`FaultProfile`. Defaults come from STANDIN_* environment variables and can be
+changed at runtime with `PUT /_control/{upstream}`; `GET /_stats` reports
+request and fault counts, `POST /_reset` clears them and reseeds the RNG.
+
+Chat completions are answered from STANDIN_RECORDINGS (a JSONL file of
+{"match": "<prompt substring>", "response": "<content>"} lines, first match
+wins) and otherwise synthesized from the prompt, in the shape each agent
+expects.
+"""
+import asyncio
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from pydantic_settings import BaseSettings
+
+UPSTREAMS = ("groq", "pixabay", "pexels", "devicon")
+
+
+class FaultProfile(BaseModel):
+    """Latency and failure behaviour of one upstream."""
+    latency_ms: float = 50.0  # median time to first byte
+    latency_sigma: float = 0.5  # log-normal spread; 0 gives a fixed latency
+    error_rate: float = 0.0  # share of requests answered with a 500
+    rate_limit_rate: float = 0.0  # share of requests answered with a 429
+    retry_after: float = 1.0  # Retry-After seconds sent with a 429
+    tokens_per_second: float = 0.0  # streamed completion pace; 0 streams as fast as possible
+
+
+class StandinSettings(BaseSettings):
+    LATENCY_MS: float = 50.0
+    LATENCY_SIGMA: float = 0.5
+    ERROR_RATE: float = 0.0
+    RATE_LIMIT_RATE: float = 0.0
+    RETRY_AFTER: float = 1.0
+    TOKENS_PER_SECOND: float = 0.0
+    SEED: int = 0
+    RECORDINGS: Optional[str] = None
+
+    class Config:
+        env_prefix = "STANDIN_"
+        case_sensitive = True
+
+
+standin_settings = StandinSettings()
+
+
+def _default_profile() -> FaultProfile:
+    return FaultProfile(
+        latency_ms=standin_settings.LATENCY_MS,
+        latency_sigma=standin_settings.LATENCY_SIGMA,
+        error_rate=standin_settings.ERROR_RATE,
+        rate_limit_rate=standin_settings.RATE_LIMIT_RATE,
+        retry_after=standin_settings.RETRY_AFTER,
+        tokens_per_second=standin_settings.TOKENS_PER_SECOND,
+    )
+
+
+def _load_recordings(path: Optional[str]) -> List[Tuple[str, str]]:
+    if not path:
+        return []
+    recordings = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                recordings.append((entry["match"], entry["response"]))
+    return recordings
+
+
+class Standin:
+    """Fault injection state shared by every route."""
+
+    def __init__(self):
+        self.profiles: Dict[str, FaultProfile] = {name: _default_profile() for name in UPSTREAMS}
+        self.recordings = _load_recordings(standin_settings.RECORDINGS)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._rng = random.Random(standin_settings.SEED)
+            self.stats = {name: {"requests": 0, "errors": 0, "rate_limited": 0} for name in UPSTREAMS}
+
+    def _draw(self, upstream: str) -> Tuple[float, Optional[int]]:
+        """Latency (seconds) and the fault status code, if any, for the next request."""
+        profile = self.profiles[upstream]
+        with self._lock:
+            self.stats[upstream]["requests"] += 1
+            latency = profile.latency_ms / 1000.0
+            if profile.latency_sigma > 0:
+                latency *= math.exp(self._rng.gauss(0.0, profile.latency_sigma))
+            roll = self._rng.random()
+            status = None
+            if roll < profile.rate_limit_rate:
+                status = 429
+                self.stats[upstream]["rate_limited"] += 1
+            elif roll < profile.rate_limit_rate + profile.error_rate:
+                status = 500
+                self.stats[upstream]["errors"] += 1
+        return latency, status
+
+    async def fault(self, upstream: str) -> Optional[Response]:
+        """Sleep for the drawn latency; a 429/500 response when a fault was drawn."""
+        latency, status = self._draw(upstream)
+        await asyncio.sleep(latency)
+        if status == 429:
+            return JSONResponse(
+                status_code=429,
+                headers={"retry-after": f"{self.profiles[upstream].retry_after:g}"},
+                content={"error": {"message": "Rate limit reached (stand-in)", "type": "requests", "code": "rate_limit_exceeded"}},
+            )
+        if status == 500:
+            return JSONResponse(status_code=500, content={"error": {"message": "Internal server error (stand-in)", "type": "internal_server_error"}})
+        return None
+
+
+standin = Standin()
+app = FastAPI(title="Upstream stand-in")
+
+
+# ---------------------------------------------------------------------------
+# Synthetic LLM responses
+# ---------------------------------------------------------------------------
+_PARAGRAPH = (
+    "Our team will deliver a secure, scalable platform tailored to the goals described in the request for proposal. "
+    "We combine proven engineering practices with close collaboration so every milestone is transparent, "
+    "measurable and aligned with your budget and timeline."
+)
+
+
+def _section_html(title: str) -> str:
+    title_lower = title.lower()
+    if "payment" in title_lower or "cost" in title_lower or "pricing" in title_lower:
+        rows = "".join(f"<tr><td>Item {i}</td><td>{_PARAGRAPH[:60]}</td><td>${i * 5000}</td></tr>" for i in range(1, 4))
+        return f"<table><tr><th>Item</th><th>Description</th><th>Amount</th></tr>{rows}</table>"
+    return f"<p><strong>{title}.</strong> {_PARAGRAPH}</p><ul><li>Discovery and planning</li><li>Iterative delivery</li><li>Support and handover</li></ul>"
+
+
+def _requested_titles(prompt: str) -> List[str]:
+    return re.findall(r"^\s*-\s+(.+?)\s*$", prompt.split("mandatory sections:", 1)[-1].split("2.", 1)[0], re.MULTILINE)
+
+
+def synthesize(prompt: str) -> str:
+    """A plausible response for the prompts the agents send."""
+    for match, response in standin.recordings:
+        if match in prompt:
+            return response
+
+    if "mandatory sections:" in prompt:
+        sections = [{"title": title, "contentHtml": _section_html(title)} for title in _requested_titles(prompt)]
+        return "```json\n" + json.dumps(sections) + "\n```"
+    titled = re.search(r"write the section titled '(.+?)'", prompt)
+    if titled:
+        return json.dumps({"title": titled.group(1), "contentHtml": _section_html(titled.group(1))})
+    if '"queries"' in prompt:
+        count = len(re.findall(r"^\s*\d+\. Title:", prompt, re.MULTILINE))
+        return json.dumps({"queries": [{"index": i, "query": "team collaborating modern office"} for i in range(1, count + 1)]})
+    if '"technologies"' in prompt:
+        listed = re.search(r"\*\*Technologies:\*\* (.+)", prompt)
+        names = [name.strip() for name in listed.group(1).split(",")] if listed else ["Python", "React", "PostgreSQL"]
+        return json.dumps({"technologies": [{"name": name, "description": f"{name} powers part of the solution."} for name in names]})
+    if '"summary"' in prompt and '"key_requirements"' in prompt:
+        return json.dumps({
+            "summary": "The client needs a web platform with reporting, integrations and a phased rollout.",
+            "key_requirements": ["Web application", "Reporting dashboard", "Third-party integrations"],
+            "tech_mentions": ["Python", "React"],
+            "keywords": ["dashboard", "analytics", "workflow"],
+        })
+    if "image search query" in prompt:
+        return "team collaborating modern office"
+    if "mermaid" in prompt.lower():
+        if "gantt" in prompt.lower():
+            return "```mermaid\ngantt\n    title Delivery Plan\n    dateFormat YYYY-MM-DD\n    section Build\n    Discovery :a1, 2025-01-01, 14d\n    Development :a2, after a1, 45d\n```"
+        if "pie" in prompt.lower():
+            return '```mermaid\npie title Budget\n    "Development" : 60\n    "Design" : 25\n    "QA" : 15\n```'
+        return "```mermaid\ngraph TD\n    A[Start] --> B[Design]\n    B --> C{Approved?}\n    C -->|Yes| D[Build]\n    C -->|No| B\n    D --> E[Launch]\n```"
+    return " ".join([_PARAGRAPH] * 2)
+
+
+def _usage(prompt: str, content: str) -> Dict[str, int]:
+    prompt_tokens, completion_tokens = max(1, len(prompt) // 4), max(1, len(content) // 4)
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+
+def _chunks(content: str, size: int = 24) -> Iterator[str]:
+    for start in range(0, len(content), size):
+        yield content[start:start + size]
+
+
+# ---------------------------------------------------------------------------
+# Groq
+# ---------------------------------------------------------------------------
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request) -> Response:
+    fault = await standin.fault("groq")
+    if fault:
+        return fault
+    body = await request.json()
+    prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+    content = synthesize(prompt)
+    usage = _usage(prompt, content)
+    model = body.get("model", "standin")
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+
+    if not body.get("stream"):
+        return JSONResponse({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage,
+        })
+
+    pace = standin.profiles["groq"].tokens_per_second
+
+    async def events():
+        for piece in _chunks(content):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+            if pace > 0:
+                await asyncio.sleep(max(1, len(piece) // 4) / pace)
+        final = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                 "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "x_groq": {"usage": usage}}
+        yield f"data: {json.dumps(final)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+# ---------------------------------------------------------------------------
+# Image providers and the devicon CDN
+# ---------------------------------------------------------------------------
+def _image_url(provider: str, query: str, i: int) -> str:
+    return f"https://images.example.com/{provider}/{re.sub(r'[^a-z0-9]+', '-', query.lower()).strip('-')}-{i}.jpg"
+
+
+@app.get("/pixabay/api/")
+async def pixabay(request: Request) -> Response:
+    fault = await standin.fault("pixabay")
+    if fault:
+        return fault
+    query = request.query_params.get("q", "")
+    per_page = int(request.query_params.get("per_page", 9))
+    return JSONResponse({
+        "total": per_page,
+        "totalHits": per_page,
+        "hits": [{"id": i, "webformatURL": _image_url("pixabay", query, i), "tags": query.replace(" ", ", ")} for i in range(per_page)],
+    })
+
+
+@app.get("/pexels/v1/search")
+async def pexels(request: Request) -> Response:
+    fault = await standin.fault("pexels")
+    if fault:
+        return fault
+    query = request.query_params.get("query", "")
+    per_page = int(request.query_params.get("per_page", 9))
+    return JSONResponse({
+        "total_results": per_page,
+        "photos": [{"id": i, "alt": query, "src": {"original": _image_url("pexels", query, i)}} for i in range(per_page)],
+    })
+
+
+@app.api_route("/devicon/{slug}/{filename}", methods=["GET", "HEAD"])
+async def devicon(slug: str, filename: str) -> Response:
+    fault = await standin.fault("devicon")
+    if fault:
+        return fault
+    # Every slug has "original" and base icons, like most devicons do
+    if filename not in (f"{slug}-original.svg", f"{slug}.svg"):
+        return Response(status_code=404)
+    svg = f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 128 128"><title>{slug}</title><rect width="128" height="128"/></svg>'
+    return Response(svg, media_type="image/svg+xml")
+
+
+# ---------------------------------------------------------------------------
+# Control
+# ---------------------------------------------------------------------------
+@app.get("/_control")
+async def get_profiles() -> Dict[str, FaultProfile]:
+    return standin.profiles
+
+
+@app.put("/_control/{upstream}")
+async def set_profile(upstream: str, profile: FaultProfile) -> FaultProfile:
+    if upstream not in UPSTREAMS:
+        raise HTTPException(status_code=404, detail=f"Unknown upstream '{upstream}'")
+    standin.profiles[upstream] = profile
+    return profile
+
+
+@app.get("/_stats")
+async def get_stats() -> Dict[str, Dict[str, int]]:
+    return standin.stats
+
+
+@app.post("/_reset")
+async def reset() -> Dict[str, Dict[str, int]]:
+    standin.reset()
+    return standin.stats
@@ -0,0 +1,108 @@
+"""Local chart-type classifier for proposal sections.
+
+A small weighted rule engine: title phrases are strong signals, content
+phrases weak ones (capped per chart type so a long section can't outvote
+its title), plus a few structural cues such as a numeric table, percentages
+that add up to a whole or an ordered list. The best-scoring type wins if its score and its share of all
+scores clear the thresholds; otherwise the section gets no chart.
+"""
+import re
+from typing import Dict, List, Tuple
+
+from app.core.html_tables import extract_tables, parse_number
+
+# Types `DiagramAgent.generate_chart` accepts, in tie-break order
+CHART_TYPES = ("flowchart", "gantt", "sequence", "mindmap", "pie", "journey", "c4")
+NO_CHART = "none"
+
+MIN_SCORE = 2.5
+MIN_CONFIDENCE = 0.5
+CONTENT_WEIGHT_CAP = 1.5
+
+# (chart type, pattern, weight) matched against the section title
+_TITLE_RULES: List[Tuple[str, str, float]] = [
+    ("flowchart", r"work\s?flows?|process(?:es)?|architecture|methodology|approach|pipeline", 4.0),
+    ("gantt", r"development plan|project plan|schedule|timeline|roadmap|phases|implementation plan", 4.0),
+    ("sequence", r"integrations?|apis?|interactions?|data flow|system", 3.0),
+    ("mindmap", r"structure|organi[sz]ation|hierarchy|team|scope|ecosystem", 3.0),
+    ("pie", r"distribution|breakdown|allocation|split|share", 4.5),
+    ("journey", r"(?:user|customer|client) journey|user experience|onboarding", 3.0),
+    ("c4", r"c4|context diagram|container diagram", 4.5),
+]
+# (chart type, pattern, weight per match) matched against the stripped content
+_CONTENT_RULES: List[Tuple[str, str, float]] = [
+    ("flowchart", r"step \d|then|next|approval|decision|workflow|process", 0.25),
+    ("gantt", r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.? \d|week \d+|weeks? \d|sprint|milestone|phase \d|deadline|\d{4}-\d{2}-\d{2}", 0.4),
+    ("sequence", r"requests?|responses?|endpoints?|webhooks?|calls|authenticat\w*|tokens?|api|callback", 0.3),
+    ("mindmap", r"components?|modules?|categor(?:y|ies)|pillars?|departments?|areas", 0.25),
+    ("pie", r"\d+(?:\.\d+)?\s?%|percent(?:age)?|share of", 0.4),
+    ("journey", r"personas?|touchpoints?|satisfaction|pain points?|sign[ -]?up|user experience", 0.4),
+]
+# Sections whose content is already a priced table; a chart would only repeat it
+_NO_CHART_TITLE = re.compile(r"\b(?:cost|pricing|price|payment|invoice|fees?)\b", re.IGNORECASE)
+
+_TITLE_PATTERNS = [(chart_type, re.compile(rf"(?<!\w)(?:{pattern})(?!\w)", re.IGNORECASE), weight) for chart_type, pattern, weight in _TITLE_RULES]
+_CONTENT_PATTERNS = [(chart_type, re.compile(rf"(?<!\w)(?:{pattern})(?!\w)", re.IGNORECASE), weight) for chart_type, pattern, weight in _CONTENT_RULES]
+_TAG = re.compile(r"<[^>]+>")
+_PERCENT = re.compile(r"(\d+(?:\.\d+)?)\s?%")
+
+
+class ChartSuggestion:
+    """Chart type for a section ("none" for no chart) with its confidence and the per-type scores."""
+
+    __slots__ = ("chart_type", "confidence", "scores")
+
+    def __init__(self, chart_type: str, confidence: float, scores: Dict[str, float]):
+        self.chart_type = chart_type
+        self.confidence = confidence
+        self.scores = scores
+
+    def to_dict(self) -> Dict:
+        return {"chart_type": self.chart_type, "confidence": round(self.confidence, 3), "scores": self.scores}
+
+
+def _has_numeric_table(content_html: str) -> bool:
+    for table in extract_tables(content_html):
+        numbers = sum(1 for row in table for text, _ in row if parse_number(text) is not None)
+        if len(table) >= 3 and numbers >= 2:
+            return True
+    return False
+
+
+def classify_chart(title: str, content_html: str = "") -> ChartSuggestion:
+    """Score each chart type for a section.
+
+    The confidence of a suggested type is its share of all scores; for
+    "none" it is how far the best type fell short of that share (1.0 when
+    nothing matched or the title rules charts out).
+    """
+    title = title or ""
+    content_html = content_html or ""
+    scores = {chart_type: 0.0 for chart_type in CHART_TYPES}
+
+    for chart_type, pattern, weight in _TITLE_PATTERNS:
+        if pattern.search(title):
+            scores[chart_type] += weight
+
+    text = " ".join(_TAG.sub(" ", content_html).split())
+    for chart_type, pattern, weight in _CONTENT_PATTERNS:
+        scores[chart_type] += min(CONTENT_WEIGHT_CAP, weight * len(pattern.findall(text)))
+    if "<table" in content_html.lower() and _has_numeric_table(content_html):
+        scores["pie"] += 2.0
+    percents = [float(value) for value in _PERCENT.findall(text)]
+    if len(percents) >= 3 and 90 <= sum(percents) <= 110:
+        # Shares of one whole
+        scores["pie"] += 2.0
+    if "<ol" in content_html.lower():
+        scores["flowchart"] += 0.5
+
+    total = sum(scores.values())
+    best = max(scores, key=lambda chart_type: scores[chart_type])
+    confidence = scores[best] / total if total else 0.0
+    rounded = {chart_type: round(score, 2) for chart_type, score in scores.items() if score}
+
+    if _NO_CHART_TITLE.search(title) or not total:
+        return ChartSuggestion(NO_CHART, 1.0, rounded)
+    if scores[best] < MIN_SCORE or confidence < MIN_CONFIDENCE:
+        return ChartSuggestion(NO_CHART, 1.0 - confidence, rounded)
+    return ChartSuggestion(best, confidence, rounded)
@@ -0,0 +1,109 @@
+"""Server-side Mermaid themes, one per diagram type.
+
+The LLM only writes the diagram body; `apply_theme` drops any init
+directive it added anyway and prepends the configured one, so every chart of
+a type looks the same and no output tokens are spent on styling.
+"""
+import json
+import re
+from typing import Any, Dict, Optional
+
+from app.core.mermaid_validator import detect_chart_type
+
+_FONT = "Inter, sans-serif"
+
+# Mermaid init configuration per `detect_chart_type` keyword
+CHART_THEMES: Dict[str, Dict[str, Any]] = {
+    "flowchart": {
+        "theme": "base",
+        "themeVariables": {
+            "primaryColor": "#eff6ff",
+            "primaryBorderColor": "#2563eb",
+            "primaryTextColor": "#0f172a",
+            "secondaryColor": "#f1f5f9",
+            "tertiaryColor": "#f9fafb",
+            "lineColor": "#64748b",
+            "clusterBkg": "#f8fafc",
+            "clusterBorder": "#cbd5e1",
+            "fontFamily": _FONT,
+            "fontSize": "14px",
+        },
+        "flowchart": {"curve": "basis", "nodeSpacing": 40, "rankSpacing": 50},
+    },
+    "gantt": {
+        "theme": "base",
+        "themeVariables": {
+            "primaryColor": "#2563eb",
+            "secondaryColor": "#93c5fd",
+            "tertiaryColor": "#f9fafb",
+            "fontFamily": _FONT,
+            "fontSize": "14px",
+            "taskTextColor": "#0f172a",
+            "taskBorderColor": "#2563eb",
+            "todayLineColor": "#f59e0b",
+            "sectionBkgColor": "#f3f4f6",
+            "sectionBkgColor2": "#e5e7eb",
+        },
+        "gantt": {"barHeight": 26, "barGap": 18, "leftPadding": 55},
+        "themeCSS": (
+            ".taskText { font-weight: 600; fill: #0f172a; } "
+            ".sectionTitle { font-size: 14px; font-weight: 700; fill: #1e3a8a; } "
+            ".today { stroke-width: 3px; stroke-dasharray: 3 3; opacity: 0.8; }"
+        ),
+    },
+    "sequenceDiagram": {
+        "theme": "base",
+        "themeVariables": {
+            "actorBkg": "#eff6ff",
+            "actorBorder": "#2563eb",
+            "actorTextColor": "#0f172a",
+            "signalColor": "#334155",
+            "signalTextColor": "#0f172a",
+            "noteBkgColor": "#fef3c7",
+            "noteBorderColor": "#f59e0b",
+            "fontFamily": _FONT,
+        },
+    },
+    "pie": {
+        "theme": "base",
+        "themeVariables": {
+            "pie1": "#2563eb", "pie2": "#93c5fd", "pie3": "#1e3a8a", "pie4": "#f59e0b",
+            "pie5": "#10b981", "pie6": "#64748b", "pie7": "#ef4444", "pie8": "#a855f7",
+            "pieStrokeColor": "#ffffff",
+            "pieTitleTextSize": "18px",
+            "pieSectionTextColor": "#ffffff",
+            "fontFamily": _FONT,
+        },
+    },
+    "mindmap": {
+        "theme": "base",
+        "themeVariables": {"primaryColor": "#2563eb", "primaryTextColor": "#ffffff", "fontFamily": _FONT},
+    },
+    "journey": {
+        "theme": "base",
+        "themeVariables": {"primaryColor": "#eff6ff", "primaryBorderColor": "#2563eb", "fontFamily": _FONT},
+    },
+}
+
+_INIT_DIRECTIVE = re.compile(r"^[ \t]*%%\{\s*init\s*:.*?\}%%[ \t]*\n?", re.DOTALL | re.MULTILINE)
+
+
+def theme_block(chart_type: Optional[str]) -> Optional[str]:
+    """The `%%{init: ...}%%` line for a diagram type, or None if it has no theme."""
+    config = CHART_THEMES.get(chart_type or "")
+    return f"%%{{init: {json.dumps(config, ensure_ascii=False)}}}%%" if config else None
+
+
+def strip_theme(code: str) -> str:
+    """Chart code without init directives."""
+    return _INIT_DIRECTIVE.sub("", code or "").strip()
+
+
+def apply_theme(code: str) -> str:
+    """Replace the chart's init directive with the server-side theme for its type.
+
+    Charts of a type without a theme are returned as they are.
+    """
+    body = strip_theme(code)
+    block = theme_block(detect_chart_type(body))
+    return f"{block}\n{body}" if block else (code or "").strip()
@@ -1,7 +1,27 @@
 
+from pydantic import BaseModel, model_validator
 from pydantic_settings import BaseSettings
 
-from typing import List, Optional
+from typing import Dict, List, Optional
+
+# Tasks served by GROQ_MODEL_SMALL unless their route names a model
+SMALL_MODEL_TASKS = ("image_query", "image_query_batch", "tech_stack", "rfp_digest")
+DIAGRAM_MODEL_TASKS = ("chart",)
+
+
+class LLMRoute(BaseModel):
+    """Model and request parameters for one task type.
+
+    `model` / `fallback_model` left unset are resolved from the GROQ_MODEL_*
+    settings; a route without a model uses the calling agent's own model.
+    """
+    model: Optional[str] = None
+    fallback_model: Optional[str] = None
+    max_tokens: Optional[int] = None
+    temperature: float = 0.7
+    timeout: Optional[float] = None
+    json_mode: bool = False  # request a JSON object response (response_format=json_object)
+
 
 class Settings(BaseSettings):
     PROJECT_NAME: str
@@ -10,8 +30,118 @@ class Settings(BaseSettings):
     GROQ_API_KEY: str
     PIXABAY_API_KEY: str
     PEXELS_API_KEY: Optional[str] = None
-    GROQ_MODEL_DIAGRAM: str = "mixtral-8x7b-32768"
+    GROQ_MODEL_DIAGRAM: str = "llama-3.3-70b-versatile"
     GROQ_MODEL_DEFAULT: str = "llama-3.1-8b-instant"
+    GROQ_MODEL_SMALL: str = "llama-3.1-8b-instant"
+    GROQ_MODEL_FALLBACK: Optional[str] = "llama-3.3-70b-versatile"
+
+    # Upstream endpoints; point them at the stand-in app (app/benchmarks/standin.py) to run offline
+    GROQ_BASE_URL: Optional[str] = None  # None uses the Groq SDK default
+    PIXABAY_API_URL: str = "https://pixabay.com/api/"
+    PEXELS_API_URL: str = "https://api.pexels.com/v1/search"
+    DEVICON_CDN_URL: str = "https://cdn.jsdelivr.net/gh/devicons/devicon/icons"
+
+    # Per-task routing; tasks not listed here use the "default" route
+    LLM_ROUTES: Dict[str, LLMRoute] = {
+        "default": LLMRoute(temperature=0.7),
+        "draft": LLMRoute(temperature=0.7, timeout=180.0),
+        "section": LLMRoute(temperature=0.7, max_tokens=2048, timeout=60.0),
+        "enhance": LLMRoute(temperature=0.7, max_tokens=2048, timeout=60.0),
+        "draft_section": LLMRoute(temperature=0.7, max_tokens=2048, timeout=60.0, json_mode=True),
+        "tech_stack": LLMRoute(temperature=0.2, max_tokens=1024, timeout=30.0, json_mode=True),
+        "rfp_digest": LLMRoute(temperature=0.2, max_tokens=1024, timeout=30.0, json_mode=True),
+        "chart": LLMRoute(temperature=0.4, max_tokens=1500, timeout=45.0),
+        "image_query": LLMRoute(temperature=0.2, max_tokens=24, timeout=10.0),
+        "image_query_batch": LLMRoute(temperature=0.2, max_tokens=1024, timeout=20.0, json_mode=True),
+    }
+
+    # LLM client settings
+    GROQ_TIMEOUT: float = 60.0
+    GROQ_MAX_RETRIES: int = 2
+    GROQ_MAX_CONNECTIONS: int = 20
+    GROQ_MAX_KEEPALIVE_CONNECTIONS: int = 10
+
+    # Rate limiting (one limiter per model, shared by every agent in the process)
+    GROQ_REQUESTS_PER_MINUTE: int = 30
+    GROQ_TOKENS_PER_MINUTE: int = 6000
+    GROQ_COMPLETION_TOKEN_ESTIMATE: int = 512
+    GROQ_RATE_LIMIT_RETRIES: int = 2
+    GROQ_RATE_LIMIT_DEFAULT_BACKOFF: float = 5.0
+    LLM_FALLBACK_MAX_WAIT: float = 2.0  # switch to the fallback model rather than wait longer than this
+
+    # LLM response cache settings
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_TASKS: List[str] = ["image_query", "chart"]
+    LLM_CACHE_MAX_ENTRIES: int = 512
+    LLM_CACHE_DISK_PATH: Optional[str] = None  # e.g. "./temp/llm_cache.sqlite3"
+    LLM_CACHE_TTL_SECONDS: Optional[int] = 7 * 24 * 3600
+    LLM_CACHE_DISK_MAX_ENTRIES: int = 10000
+
+    # Set to False for backends without response_format=json_object support
+    LLM_JSON_MODE_ENABLED: bool = True
+
+    # Hedged requests: short, idempotent tasks get a backup request once they
+    # outlive the LLM_HEDGE_PERCENTILE of recent latencies
+    LLM_HEDGE_ENABLED: bool = True
+    LLM_HEDGE_TASKS: List[str] = ["image_query", "chart"]
+    LLM_HEDGE_PERCENTILE: float = 95.0
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    LLM_HEDGE_MAX_RATE: float = 0.1  # at most this share of requests is hedged
+    LLM_HEDGE_WINDOW: int = 200
+
+    # Chart generation: retries back off exponentially with jitter and stop at the deadline
+    CHART_DEADLINE: float = 90.0
+    CHART_BACKOFF_BASE: float = 1.0
+    CHART_BACKOFF_MAX: float = 8.0
+
+    # Speculative charts (interactive requests): candidates raced at once, and the
+    # most requests one chart may cost including replacements of failed candidates
+    CHART_SPECULATIVE_CANDIDATES: int = 3
+    CHART_SPECULATIVE_MAX_CALLS: int = 5
+
+    # Automatic charts for a whole proposal: parallel generations and overall deadline
+    CHART_AUTO_CONCURRENCY: int = 4
+    CHART_AUTO_DEADLINE: float = 180.0
+
+    # Build gantt charts from the proposal's dates and deliverables instead of the LLM
+    GANTT_SYNTHESIS_ENABLED: bool = True
+    # Build pie charts from the first numeric <table> in the section instead of the LLM
+    PIE_SYNTHESIS_ENABLED: bool = True
+    # Prepend the theme from app/core/chart_themes.py to every returned chart; the
+    # prompts ask the LLM for the diagram body only
+    CHART_THEMES_ENABLED: bool = True
+
+    # Validated charts keyed by chart type and normalized description, so an
+    # unchanged section doesn't regenerate its chart
+    CHART_CACHE_ENABLED: bool = True
+    CHART_CACHE_MAX_ENTRIES: int = 256
+    CHART_CACHE_DISK_PATH: Optional[str] = None  # e.g. "./temp/chart_cache.sqlite3"
+    CHART_CACHE_TTL_SECONDS: Optional[int] = 30 * 24 * 3600
+    CHART_CACHE_DISK_MAX_ENTRIES: int = 5000
+
+    # RFP digest settings
+    RFP_DIGEST_INPUT_MAX_CHARS: int = 24000
+    RFP_DIGEST_SUMMARY_MAX_CHARS: int = 1500
+    RFP_DIGEST_MAX_ITEMS: int = 12
+    RFP_DIGEST_CACHE_SIZE: int = 256
+
+    # Background generation jobs
+    JOB_QUEUE_DATABASE_URL: Optional[str] = None  # defaults to the app DB; e.g. "sqlite+aiosqlite:///./temp/jobs.sqlite3"
+    JOB_WORKERS: int = 2  # 0 only enqueues; another process runs the jobs
+    JOB_POLL_INTERVAL: float = 2.0
+    JOB_MAX_ATTEMPTS: int = 3
+    # A running job belongs to its worker while the worker renews this lease (every
+    # third of it); jobs whose lease ran out are requeued by any process with workers
+    JOB_LEASE_SECONDS: float = 60.0
+
+    # Draft generation: "one_shot" writes every section in one streamed call,
+    # "fan_out" makes one call per section, at most DRAFT_FAN_OUT_CONCURRENCY at a time
+    DRAFT_STRATEGY: str = "one_shot"
+    DRAFT_FAN_OUT_CONCURRENCY: int = 4
+    DRAFT_SECTION_ATTEMPTS: int = 2
+
+    # Streaming settings
+    SSE_HEARTBEAT_INTERVAL: float = 15.0
 
     # Database settings
     DB_HOST: str = "localhost"
@@ -24,6 +154,25 @@ class Settings(BaseSettings):
     def DATABASE_URL(self) -> str:
         return f"mysql+asyncmy://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
+    @model_validator(mode="after")
+    def _resolve_llm_routes(self) -> "Settings":
+        routes = {}
+        for task, route in self.LLM_ROUTES.items():
+            model = route.model
+            if model is None and task in DIAGRAM_MODEL_TASKS:
+                model = self.GROQ_MODEL_DIAGRAM
+            elif model is None and task in SMALL_MODEL_TASKS:
+                model = self.GROQ_MODEL_SMALL
+            fallback = route.fallback_model or self.GROQ_MODEL_FALLBACK
+            if fallback == model and model != self.GROQ_MODEL_DEFAULT:
+                fallback = self.GROQ_MODEL_DEFAULT
+            routes[task] = route.model_copy(update={"model": model, "fallback_model": fallback})
+        self.LLM_ROUTES = routes
+        return self
+
+    def llm_route(self, task: Optional[str]) -> LLMRoute:
+        """Route for a task, falling back to the "default" route."""
+        return self.LLM_ROUTES.get(task or "default") or self.LLM_ROUTES.get("default") or LLMRoute()
 
     class Config:
         case_sensitive = True
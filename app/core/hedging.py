@@ -0,0 +1,193 @@
+import asyncio
+import concurrent.futures
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """Sliding window of recent call latencies per key."""
+
+    def __init__(self, window: int):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def percentile(self, key: str, pct: float, min_samples: int = 1) -> Optional[float]:
+        """The `pct` percentile of the window, or None until `min_samples` were seen."""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if not samples or len(samples) < min_samples:
+            return None
+        index = min(len(samples) - 1, max(0, math.ceil(pct / 100.0 * len(samples)) - 1))
+        return samples[index]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            keys = list(self._samples)
+        return {
+            key: {
+                "samples": len(self._samples[key]),
+                "p50": self.percentile(key, 50),
+                "p95": self.percentile(key, 95),
+            }
+            for key in keys
+        }
+
+
+class Hedger:
+    """Fire a backup request when the first one is slower than usual.
+
+    The hedge delay is a percentile of the latencies observed for the key, so
+    only the tail gets a second request; the first attempt to succeed wins and
+    the other is cancelled (both are if the caller is). Hedges are capped at
+    `max_rate` of all requests so a slow provider isn't hit with double the
+    traffic.
+    """
+
+    def __init__(self, name: str, percentile: float, min_samples: int, max_rate: float, window: int):
+        self.name = name
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.max_rate = max_rate
+        self.latencies = LatencyTracker(window)
+        self._lock = threading.Lock()
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._counters = {"requests": 0, "hedged": 0, "hedge_wins": 0, "over_budget": 0}
+
+    def _hedge_delay(self, key: str) -> Optional[float]:
+        with self._lock:
+            self._counters["requests"] += 1
+        return self.latencies.percentile(key, self.percentile, self.min_samples)
+
+    def _take_hedge(self, key: str) -> bool:
+        with self._lock:
+            if self._counters["hedged"] + 1 > self.max_rate * self._counters["requests"]:
+                self._counters["over_budget"] += 1
+                return False
+            self._counters["hedged"] += 1
+        logging.info(f"Hedger '{self.name}': '{key}' is slower than p{self.percentile:g}; sending a hedge request")
+        return True
+
+    def _observed(self, key: str, started: float) -> None:
+        """Record an attempt's latency. Every attempt counts, failed or lost, so the
+        window keeps the slow tail the hedge delay is derived from."""
+        self.latencies.record(key, time.monotonic() - started)
+
+    def _hedge_won(self) -> None:
+        with self._lock:
+            self._counters["hedge_wins"] += 1
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await `fn()`, hedging it with a second `fn()` if it outlives the hedge delay."""
+        delay = self._hedge_delay(key)
+        started = time.monotonic()
+        primary = asyncio.ensure_future(fn())
+        done = set()
+        if delay is not None:
+            try:
+                done, _ = await asyncio.wait({primary}, timeout=delay)
+            except asyncio.CancelledError:
+                # asyncio.wait doesn't cancel what it waits on
+                self._observed(key, started)
+                primary.cancel()
+                raise
+        if delay is None or done or not self._take_hedge(key):
+            try:
+                return await primary
+            finally:
+                self._observed(key, started)
+
+        hedge = asyncio.ensure_future(fn())
+        attempts = {primary: started, hedge: time.monotonic()}
+        pending = set(attempts)
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    self._observed(key, attempts[task])
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    if task is hedge:
+                        self._hedge_won()
+                    return task.result()
+            raise error
+        finally:
+            for task in pending:
+                # Still running: the time so far is a lower bound of its latency
+                self._observed(key, attempts[task])
+                task.cancel()
+
+    def run_blocking(self, key: str, fn: Callable[[], T]) -> T:
+        """Blocking variant; a losing attempt can't be interrupted, its result is discarded."""
+        delay = self._hedge_delay(key)
+        started = time.monotonic()
+        if delay is None:
+            try:
+                return fn()
+            finally:
+                self._observed(key, started)
+
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(thread_name_prefix=f"hedge-{self.name}")
+
+        def submit() -> concurrent.futures.Future:
+            submitted = time.monotonic()
+            future = self._executor.submit(fn)
+            # Losers keep running in their thread; record them when they finish
+            future.add_done_callback(lambda _: self._observed(key, submitted))
+            return future
+
+        primary = submit()
+        done, _ = concurrent.futures.wait({primary}, timeout=delay)
+        if done or not self._take_hedge(key):
+            return primary.result()
+
+        hedge = submit()
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                if future is hedge:
+                    self._hedge_won()
+                return future.result()
+        raise error
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+        return {"name": self.name, **counters, "latency": self.latencies.stats()}
+
+
+def is_hedged_task(task: Optional[str]) -> bool:
+    return settings.LLM_HEDGE_ENABLED and task is not None and task in settings.LLM_HEDGE_TASKS
+
+
+llm_hedger = Hedger(
+    "llm",
+    percentile=settings.LLM_HEDGE_PERCENTILE,
+    min_samples=settings.LLM_HEDGE_MIN_SAMPLES,
+    max_rate=settings.LLM_HEDGE_MAX_RATE,
+    window=settings.LLM_HEDGE_WINDOW,
+)
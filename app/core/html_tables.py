@@ -0,0 +1,79 @@
+"""Tables and numbers out of generated section HTML.
+
+Section content comes from the LLM as loose HTML, so the parser is the
+stdlib's tolerant `HTMLParser`: unclosed cells and rows are closed by the
+next one, and nested markup inside a cell only contributes its text.
+"""
+import re
+from html.parser import HTMLParser
+from typing import List, Optional
+
+# A table is a list of rows; a row is a list of (cell text, is header cell)
+Table = List[List[tuple]]
+
+# Optional short prefix (currency, "USD "), the number, an optional short unit suffix
+_NUMBER_CELL = re.compile(r"^([^\d\s-]{0,3}\s?)(-?\d[\d,]*(?:\.\d+)?)\s*(%|[A-Za-z$€£]{0,5})\.?$")
+_MULTIPLIERS = {"k": 1e3, "K": 1e3, "m": 1e6, "M": 1e6, "mm": 1e6, "bn": 1e9, "B": 1e9}
+
+
+class _TableParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.tables: List[Table] = []
+        self._stack: List[Table] = []
+        self._cell: Optional[List[str]] = None
+        self._header = False
+
+    def _close_cell(self) -> None:
+        if self._cell is not None and self._stack:
+            if not self._stack[-1]:
+                self._stack[-1].append([])
+            self._stack[-1][-1].append((" ".join("".join(self._cell).split()), self._header))
+        self._cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            self._close_cell()
+            self._stack.append([])
+        elif tag == "tr" and self._stack:
+            self._close_cell()
+            self._stack[-1].append([])
+        elif tag in ("td", "th") and self._stack:
+            self._close_cell()
+            self._cell = []
+            self._header = tag == "th"
+        elif tag == "br" and self._cell is not None:
+            self._cell.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in ("td", "th", "tr"):
+            self._close_cell()
+        elif tag == "table" and self._stack:
+            self._close_cell()
+            table = [row for row in self._stack.pop() if row]
+            if table:
+                self.tables.append(table)
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+
+def extract_tables(html: str) -> List[Table]:
+    """Every table in `html` in document order (nested tables before their parent)."""
+    parser = _TableParser()
+    parser.feed(html or "")
+    parser.close()
+    while parser._stack:
+        # Unclosed <table> at the end of the content
+        parser.handle_endtag("table")
+    return parser.tables
+
+
+def parse_number(text: str) -> Optional[float]:
+    """The number in a table cell like "$12,500", "40%", "1.5k" or "120 hrs", or None."""
+    match = _NUMBER_CELL.match((text or "").strip())
+    if not match:
+        return None
+    value = float(match.group(2).replace(",", ""))
+    return value * _MULTIPLIERS.get(match.group(3), 1)
@@ -0,0 +1,125 @@
+import json
+import logging
+from typing import Any, List, Optional
+
+from json_repair import repair_json
+
+
+class JsonArrayStreamParser:
+    """Incrementally extract the elements of a JSON array from streamed text.
+
+    Feed it chunks as they arrive; each call returns the array elements whose
+    closing brace has been seen so far. Text before the array (prose, a
+    ```json fence) is skipped, and the first array found is used even if it
+    is nested in an object, e.g. {"sections": [...]}. Only object elements
+    are emitted.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._array_depth: Optional[int] = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._element_start: Optional[int] = None
+        self.done = False
+        self.count = 0
+
+    def _find_array_start(self) -> bool:
+        while True:
+            fence = self._buffer.find("```", self._pos)
+            bracket = self._buffer.find("[", self._pos)
+            if fence != -1 and (bracket == -1 or fence < bracket):
+                # Skip the fence line (```json) before looking for the array
+                newline = self._buffer.find("\n", fence)
+                if newline == -1:
+                    return False
+                self._pos = newline + 1
+                continue
+            if bracket == -1:
+                self._pos = max(self._pos, len(self._buffer) - 2)  # a fence may be split across chunks
+                return False
+
+            # An array of objects must open with "{" (or be empty); skip brackets in prose like "[Client]"
+            rest = self._buffer[bracket + 1:].lstrip()
+            if not rest:
+                self._pos = bracket
+                return False
+            if rest[0] not in "{]":
+                self._pos = bracket + 1
+                continue
+
+            # Depth is tracked relative to the array, so enclosing objects don't matter
+            self._depth = self._array_depth = 1
+            self._pos = bracket + 1
+            return True
+
+    def _decode(self, text: str) -> Any:
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            try:
+                return json.loads(repair_json(text))
+            except (json.JSONDecodeError, ValueError) as e:
+                logging.warning(f"Could not decode streamed JSON element: {e}")
+                return None
+
+    def feed(self, chunk: str) -> List[Any]:
+        if self.done or not chunk:
+            return []
+        self._buffer += chunk
+        elements: List[Any] = []
+
+        if self._array_depth is None and not self._find_array_start():
+            return elements
+
+        buffer = self._buffer
+        i = self._pos
+        while i < len(buffer):
+            ch = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if self._depth == self._array_depth and ch == "{":
+                    self._element_start = i
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == self._array_depth and ch == "}" and self._element_start is not None:
+                    element = self._decode(buffer[self._element_start:i + 1])
+                    self._element_start = None
+                    if isinstance(element, dict):
+                        self.count += 1
+                        elements.append(element)
+                elif self._depth < self._array_depth:
+                    self.done = True
+                    break
+            i += 1
+
+        # Drop consumed text so the buffer only holds the element in progress
+        keep_from = self._element_start if self._element_start is not None else i
+        self._buffer = buffer[keep_from:]
+        self._pos = i - keep_from
+        if self._element_start is not None:
+            self._element_start = 0
+        return elements
+
+    def close(self) -> List[Any]:
+        """Best-effort recovery of a trailing element cut off by a truncated response."""
+        if self.done or self._element_start is None:
+            return []
+        element = self._decode(self._buffer[self._element_start:])
+        self._element_start = None
+        self.done = True
+        if isinstance(element, dict):
+            self.count += 1
+            return [element]
+        return []
@@ -0,0 +1,221 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from app.core.config import LLMRoute, settings
+
+
+def make_cache_key(*parts: Any) -> str:
+    """Hash arbitrary JSON-serialisable parts into a stable content address."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def llm_cache_key(task: Optional[str], route: LLMRoute, system_message: Optional[str], messages: List[Dict]) -> str:
+    """Cache key for a chat completion request under its resolved route.
+
+    Routes with the same messages but a different output contract (JSON mode,
+    max_tokens) or task get different keys.
+    """
+    json_mode = route.json_mode and settings.LLM_JSON_MODE_ENABLED
+    return make_cache_key(task, route.model, route.temperature, route.max_tokens, json_mode, system_message, messages)
+
+
+class TieredCache:
+    """Bounded in-process LRU with an optional SQLite tier behind it.
+
+    The memory tier is consulted first; disk hits are promoted into memory.
+    Both tiers honour the same TTL, and the disk tier evicts the least
+    recently accessed rows once it grows past `disk_max_entries`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int = 512,
+        disk_path: Optional[str] = None,
+        ttl_seconds: Optional[int] = None,
+        disk_max_entries: int = 10000,
+    ):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_max_entries = disk_max_entries
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "memory_evictions": 0, "disk_evictions": 0}
+
+        self._disk: Optional[sqlite3.Connection] = None
+        self._disk_lock = threading.Lock()
+        if disk_path:
+            try:
+                os.makedirs(os.path.dirname(disk_path) or ".", exist_ok=True)
+                self._disk = sqlite3.connect(disk_path, check_same_thread=False)
+                self._disk.execute(
+                    "CREATE TABLE IF NOT EXISTS cache_entries ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                    "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+                )
+                self._disk.execute("CREATE INDEX IF NOT EXISTS ix_cache_accessed ON cache_entries (accessed_at)")
+                self._disk.commit()
+            except (sqlite3.Error, OSError) as e:
+                logging.error(f"Cache '{name}': could not open disk tier at {disk_path}: {e}")
+                self._disk = None
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return bool(self.ttl_seconds) and now - created_at > self.ttl_seconds
+
+    def _incr(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[counter] += amount
+
+    # ---------------------------------------------------------------------
+    # MEMORY TIER
+    # ---------------------------------------------------------------------
+    def _memory_get(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            value, created_at = entry
+            if self._expired(created_at, now):
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return value
+
+    def _memory_set(self, key: str, value: str, created_at: float) -> None:
+        with self._lock:
+            self._memory[key] = (value, created_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self._counters["memory_evictions"] += 1
+
+    # ---------------------------------------------------------------------
+    # DISK TIER
+    # ---------------------------------------------------------------------
+    def _disk_get(self, key: str, now: float) -> Optional[tuple]:
+        if self._disk is None:
+            return None
+        try:
+            with self._disk_lock:
+                row = self._disk.execute(
+                    "SELECT value, created_at FROM cache_entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                if self._expired(row[1], now):
+                    self._disk.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+                    self._disk.commit()
+                    return None
+                self._disk.execute("UPDATE cache_entries SET accessed_at = ? WHERE key = ?", (now, key))
+                self._disk.commit()
+                return row
+        except sqlite3.Error as e:
+            logging.warning(f"Cache '{self.name}': disk read failed: {e}")
+            return None
+
+    def _disk_set(self, key: str, value: str, now: float) -> None:
+        if self._disk is None:
+            return
+        try:
+            with self._disk_lock:
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO cache_entries (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now),
+                )
+                if self.ttl_seconds:
+                    self._disk.execute("DELETE FROM cache_entries WHERE created_at < ?", (now - self.ttl_seconds,))
+                (count,) = self._disk.execute("SELECT COUNT(*) FROM cache_entries").fetchone()
+                excess = count - self.disk_max_entries
+                if excess > 0:
+                    self._disk.execute(
+                        "DELETE FROM cache_entries WHERE key IN "
+                        "(SELECT key FROM cache_entries ORDER BY accessed_at ASC LIMIT ?)",
+                        (excess,),
+                    )
+                    self._incr("disk_evictions", excess)
+                self._disk.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"Cache '{self.name}': disk write failed: {e}")
+
+    # ---------------------------------------------------------------------
+    # PUBLIC API
+    # ---------------------------------------------------------------------
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is not None:
+            self._incr("memory_hits")
+            return value
+
+        row = self._disk_get(key, now)
+        if row is not None:
+            self._incr("disk_hits")
+            self._memory_set(key, row[0], row[1])
+            return row[0]
+
+        self._incr("misses")
+        return None
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        self._memory_set(key, value, now)
+        self._disk_set(key, value, now)
+        self._incr("sets")
+
+    async def aget(self, key: str) -> Optional[str]:
+        """Like `get`, but keeps SQLite I/O off the event loop."""
+        if self._disk is None:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: str) -> None:
+        if self._disk is None:
+            self.set(key, value)
+        else:
+            await asyncio.to_thread(self.set, key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self._disk is not None:
+            with self._disk_lock:
+                self._disk.execute("DELETE FROM cache_entries")
+                self._disk.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            memory_entries = len(self._memory)
+        lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        return {
+            "name": self.name,
+            **counters,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": memory_entries,
+            "disk_enabled": self._disk is not None,
+        }
+
+
+llm_cache = TieredCache(
+    name="llm",
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+    disk_path=settings.LLM_CACHE_DISK_PATH,
+    ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+    disk_max_entries=settings.LLM_CACHE_DISK_MAX_ENTRIES,
+)
+
+
+def is_cacheable_task(task: Optional[str]) -> bool:
+    """Caching is opt-in per task type via `LLM_CACHE_TASKS`."""
+    return settings.LLM_CACHE_ENABLED and task is not None and task in settings.LLM_CACHE_TASKS
@@ -0,0 +1,67 @@
+import logging
+from typing import Optional
+
+import httpx
+from groq import AsyncGroq, Groq
+
+from app.core.config import settings
+from app.core.metrics import timed_async_transport, timed_transport
+
+# Process-wide LLM clients. The sync client is kept for code paths that still
+# run in worker threads; everything on the event loop should use the async one.
+_sync_client: Optional[Groq] = None
+_async_client: Optional[AsyncGroq] = None
+
+
+def get_sync_client() -> Groq:
+    """Return the shared synchronous Groq client."""
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = Groq(
+            api_key=settings.GROQ_API_KEY,
+            base_url=settings.GROQ_BASE_URL,
+            timeout=settings.GROQ_TIMEOUT,
+            max_retries=settings.GROQ_MAX_RETRIES,
+            http_client=httpx.Client(timeout=settings.GROQ_TIMEOUT, transport=timed_transport()),
+        )
+    return _sync_client
+
+
+def get_async_client() -> AsyncGroq:
+    """Return the shared AsyncGroq client, creating it on first use.
+
+    The client owns a single httpx connection pool sized from settings, so all
+    agents share keep-alive connections instead of opening their own.
+    """
+    global _async_client
+    if _async_client is None:
+        http_client = httpx.AsyncClient(
+            # The pool limits belong to the transport once one is passed in
+            transport=timed_async_transport(
+                limits=httpx.Limits(
+                    max_connections=settings.GROQ_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.GROQ_MAX_KEEPALIVE_CONNECTIONS,
+                ),
+            ),
+            timeout=settings.GROQ_TIMEOUT,
+        )
+        _async_client = AsyncGroq(
+            api_key=settings.GROQ_API_KEY,
+            base_url=settings.GROQ_BASE_URL,
+            timeout=settings.GROQ_TIMEOUT,
+            max_retries=settings.GROQ_MAX_RETRIES,
+            http_client=http_client,
+        )
+        logging.info(
+            f"Initialized shared AsyncGroq client (max_connections={settings.GROQ_MAX_CONNECTIONS}, "
+            f"max_keepalive={settings.GROQ_MAX_KEEPALIVE_CONNECTIONS})"
+        )
+    return _async_client
+
+
+async def close_async_client() -> None:
+    """Close the shared async client and its connection pool."""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
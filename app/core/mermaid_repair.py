@@ -0,0 +1,497 @@
+"""Deterministic repairs for generated Mermaid.
+
+Most charts the LLM gets wrong fail for mechanical reasons the validator can
+point at: unquoted labels with brackets, made-up arrows, a graph header on a
+gantt body, a missing dateFormat, a node id reused for a different step.
+`MermaidRepairer.repair` applies a fixed catalogue of rewrites for those,
+re-validating after every fix that changed something, and stops as soon as
+the chart is valid. Fixes only touch statement lines (comments, directives
+and front matter are left alone), so a repaired chart keeps its styling.
+"""
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.mermaid_validator import (
+    FLOW_LINK,
+    GANTT_DURATION,
+    GANTT_TAGS,
+    LABEL_FORBIDDEN,
+    MINDMAP_SHAPES,
+    NODE_ID,
+    NODE_SHAPES,
+    SEQ_BLOCKS,
+    MermaidValidation,
+    date_pattern,
+    detect_chart_type,
+    flow_nodes,
+    significant_lines,
+    validate_mermaid,
+)
+
+# A fix rewrites `lines` in place; `indexes` are the 0-based positions of the
+# significant lines, header first.
+Fix = Callable[[List[str], List[int]], None]
+
+_HEADER_ALIASES = {
+    "graph": "graph", "flowchart": "flowchart", "gantt": "gantt", "pie": "pie", "mindmap": "mindmap",
+    "journey": "journey", "user_journey": "journey", "userjourney": "journey",
+    "sequence": "sequenceDiagram", "sequencediagram": "sequenceDiagram", "sequence_diagram": "sequenceDiagram",
+    "piechart": "pie", "pie_chart": "pie", "ganttchart": "gantt", "gantt_chart": "gantt",
+}
+_HEADER_WORD = re.compile(r"^(\s*)(\S+)")
+_FLOW_DIRECTION = re.compile(r"^(\s*(?:graph|flowchart))(?:[ \t]+(\S+))?")
+_GANTT_TASK = re.compile(r"^[^:]+:\s*(?:(?:active|done|crit|milestone|after\s|[\w-]+\s*,|\d)[^:]*)$")
+_PIE_LINE = re.compile(r'^\s*("?)([^":]+)\1\s*:\s*([^:]+?)\s*$')
+_DATE_LIKE = re.compile(r"^\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}$")
+_DATE_FORMATS = ("YYYY-MM-DD", "DD/MM/YYYY", "MM/DD/YYYY", "DD-MM-YYYY", "YYYY/MM/DD", "DD.MM.YYYY")
+_DURATION_WORDS = re.compile(r"^(\d+(?:\.\d+)?)\s*(days?|weeks?|hours?|minutes?|months?|years?|hrs?|wks?)$", re.I)
+_DURATION_UNITS = {"d": "d", "w": "w", "h": "h", "m": "m", "y": "y"}
+_FLOW_ARROWS = (
+    (re.compile(r"-->\|>\s*"), "--> "),              # A -->|> B
+    (re.compile(r"(?<![-=<])=>(?!>)"), "-->"),       # A => B
+    (re.compile(r"(?<![-.=<])->(?![>-])"), "-->"),   # A -> B
+    (re.compile(r"-->>"), "-->"),                    # A -->> B (sequence arrow)
+)
+_DANGLING_LINK = re.compile(r"\s*(?:" + FLOW_LINK.pattern + r")(?:[ \t]*\|[^|]*\|)?\s*;?\s*$")
+_END_NODE = re.compile(r"(?<![\w-])end(?![\w-])")
+_SEQ_ARROWS = (
+    (re.compile(r"={1,2}>>?"), "->>"),               # A => B, A ==> B
+    (re.compile(r"(?<![-<])->(?![>x)])"), "->>"),    # A -> B without a head Mermaid knows
+)
+
+
+def _pie_slice(line: str) -> bool:
+    match = _PIE_LINE.match(line)
+    return bool(match and re.search(r"\d", match.group(3)))
+
+
+def _header(lines: List[str], indexes: List[int]) -> Tuple[int, str]:
+    return indexes[0], lines[indexes[0]]
+
+
+def _indent_of(lines: List[str], indexes: List[int]) -> str:
+    if len(indexes) > 1:
+        line = lines[indexes[1]]
+        return line[:len(line) - len(line.lstrip())] or "    "
+    return "    "
+
+
+# ---------------------------------------------------------------------------
+# any chart type
+# ---------------------------------------------------------------------------
+def _fix_fences(lines: List[str], indexes: List[int]) -> None:
+    """Drop leftover ``` fences and a bare "mermaid" language line."""
+    for i in indexes:
+        stripped = lines[i].strip()
+        if stripped.startswith("```") or stripped == "mermaid":
+            lines[i] = ""
+
+
+def _fix_header(lines: List[str], indexes: List[int]) -> None:
+    """Canonical header keyword, a known flowchart direction, or a header inferred from the body."""
+    i, header = _header(lines, indexes)
+    match = _HEADER_WORD.match(header)
+    word = match.group(2)
+    body = [lines[j].strip() for j in indexes[1:]]
+
+    alias = _HEADER_ALIASES.get(word.lower().rstrip(":;"))
+    if alias and alias != word:
+        lines[i] = header[:match.start(2)] + alias + header[match.end(2):]
+        return
+
+    if alias in ("graph", "flowchart"):
+        links = any(FLOW_LINK.search(line) for line in body)
+        gantt_like = any(line.startswith(("section ", "dateFormat")) or _GANTT_TASK.match(line) for line in body)
+        if gantt_like and not links:
+            # A gantt body under a graph header: the flowchart parser can't read it at all
+            lines[i] = match.group(1) + "gantt"
+            return
+        direction = _FLOW_DIRECTION.match(header)
+        if direction.group(2) and direction.group(2).upper().rstrip(";") in ("TD", "TB", "BT", "RL", "LR"):
+            lines[i] = direction.group(1) + " " + direction.group(2).upper().rstrip(";") + header[direction.end():]
+        elif direction.group(2):
+            lines[i] = direction.group(1) + " TD" + header[direction.end():]
+        return
+
+    if alias is None and detect_chart_type(header) is None:
+        candidates = [lines[j].strip() for j in indexes]
+        if any(FLOW_LINK.search(line) for line in candidates):
+            new_header = "graph TD"
+        elif any(_GANTT_TASK.match(line) for line in candidates):
+            new_header = "gantt"
+        elif candidates and all(line.startswith("title ") or _pie_slice(line) for line in candidates):
+            new_header = "pie"
+        else:
+            return
+        lines[i] = new_header + "\n" + header
+
+
+# ---------------------------------------------------------------------------
+# graph / flowchart
+# ---------------------------------------------------------------------------
+def _fix_flow_arrows(lines: List[str], indexes: List[int]) -> None:
+    """Rewrite arrows Mermaid doesn't know (=>, ->, -->|>, -->>) to -->."""
+    for i in indexes[1:]:
+        if flow_nodes(lines[i].strip()) is not None:
+            continue
+        for pattern, replacement in _FLOW_ARROWS:
+            lines[i] = pattern.sub(replacement, lines[i])
+
+
+def _fix_flow_links(lines: List[str], indexes: List[int]) -> None:
+    """Drop links that end the line without a target and rename nodes called `end`."""
+    for i in indexes[1:]:
+        line = lines[i]
+        if flow_nodes(line.strip()) is not None or not FLOW_LINK.search(line):
+            continue
+        line = _DANGLING_LINK.sub("", line)
+        lines[i] = _END_NODE.sub("End", line)
+
+
+def _quote_shape(segment: str) -> str:
+    """Quote the label of one `id[label]` node if it contains brackets or quotes."""
+    stripped = segment.strip()
+    match = NODE_ID.match(stripped)
+    if not match:
+        return segment
+    rest = stripped[match.end():]
+    suffix = ""
+    class_match = re.search(r":::\w+;?$|;$", rest)
+    if class_match:
+        suffix, rest = rest[class_match.start():], rest[:class_match.start()]
+    for opener, closers in NODE_SHAPES:
+        if not rest.startswith(opener):
+            continue
+        closer = next((c for c in closers if rest.endswith(c) and len(rest) >= len(opener) + len(c)), None)
+        if closer is None:
+            # Unclosed shape: close it with the opener's own delimiter
+            closer, label = closers[0], rest[len(opener):]
+        else:
+            label = rest[len(opener):len(rest) - len(closer)]
+        label = label.strip()
+        if label.startswith('"') and label.endswith('"') and len(label) > 1 and '"' not in label[1:-1]:
+            return segment
+        if closer == closers[0] and not LABEL_FORBIDDEN.intersection(label) and rest.endswith(closer):
+            return segment
+        if len(label) > 1 and label[0] == label[-1] == '"':
+            label = label[1:-1]
+        label = label.replace('"', "#quot;")
+        leading = segment[:len(segment) - len(segment.lstrip())]
+        trailing = segment[len(segment.rstrip()):]
+        return f'{leading}{match.group(0)}{opener}"{label}"{closer}{suffix}{trailing}'
+    return segment
+
+
+def _split_statement(line: str) -> List[str]:
+    """Split a statement line into node groups and the link tokens (with |labels|) between them."""
+    parts = []
+    pos = 0
+    for link in re.finditer(FLOW_LINK.pattern + r"(?:[ \t]*\|[^|]*\|)?", line):
+        parts.append(line[pos:link.start()])
+        parts.append(line[link.start():link.end()])
+        pos = link.end()
+    parts.append(line[pos:])
+    return parts
+
+
+def _fix_flow_labels(lines: List[str], indexes: List[int]) -> None:
+    """Wrap labels that contain brackets or quotes in double quotes."""
+    for i in indexes[1:]:
+        line = lines[i]
+        stripped = line.strip()
+        word = stripped.split(None, 1)[0] if stripped else ""
+        if word in ("subgraph", "end", "classDef", "class", "style", "linkStyle", "click", "direction"):
+            continue
+        if flow_nodes(stripped) is not None:
+            continue
+        parts = _split_statement(line)
+        for n in range(0, len(parts), 2):
+            parts[n] = "&".join(_quote_shape(group) for group in parts[n].split("&"))
+        lines[i] = "".join(parts)
+
+
+def _fix_flow_duplicate_ids(lines: List[str], indexes: List[int]) -> None:
+    """Give a node id that is redefined with a different label a fresh id.
+
+    Bare references after the redefinition point at the newest node, which is
+    what the author of a linear step list meant.
+    """
+    labels: Dict[str, str] = {}
+    current: Dict[str, str] = {}
+    used = set()
+    parsed = {i: flow_nodes(lines[i].strip()) for i in indexes[1:]}
+    for nodes in parsed.values():
+        used.update(node[0] for node in nodes or ())
+
+    for i in indexes[1:]:
+        nodes = parsed[i]
+        if not nodes:
+            continue
+        line = lines[i]
+        offset = len(line) - len(line.lstrip())
+        renames: List[Tuple[int, int, str]] = []
+        for node_id, start, end, shape in nodes:
+            key = " ".join(shape.replace('"', " ").split())
+            if shape and node_id in labels and labels[node_id] != key:
+                n = 2
+                while f"{node_id}_{n}" in used:
+                    n += 1
+                new_id = f"{node_id}_{n}"
+                used.add(new_id)
+                labels[new_id] = key
+                current[node_id] = new_id
+                renames.append((start, end, new_id))
+                continue
+            if shape:
+                labels.setdefault(node_id, key)
+            if current.get(node_id, node_id) != node_id:
+                renames.append((start, end, current[node_id]))
+        for start, end, new_id in reversed(renames):
+            line = line[:offset + start] + new_id + line[offset + end:]
+        lines[i] = line
+
+
+def _close_blocks(lines: List[str], indexes: List[int], openers: Tuple[str, ...]) -> None:
+    depth = 0
+    for i in indexes[1:]:
+        stripped = lines[i].strip()
+        word = stripped.split(None, 1)[0] if stripped else ""
+        if word in openers:
+            depth += 1
+        elif stripped.rstrip(";") == "end":
+            if depth:
+                depth -= 1
+            else:
+                lines[i] = ""
+    if depth:
+        lines.extend([_indent_of(lines, indexes) + "end"] * depth)
+
+
+def _fix_flow_blocks(lines: List[str], indexes: List[int]) -> None:
+    """Drop stray `end`s and close unclosed subgraphs at the end of the chart."""
+    _close_blocks(lines, indexes, ("subgraph",))
+
+
+# ---------------------------------------------------------------------------
+# gantt
+# ---------------------------------------------------------------------------
+def _gantt_tasks(lines: List[str], indexes: List[int]) -> List[int]:
+    tasks = []
+    for i in indexes[1:]:
+        stripped = lines[i].strip()
+        word = stripped.split(None, 1)[0] if stripped else ""
+        if ":" in stripped and word not in ("title", "section", "dateFormat", "axisFormat", "todayMarker"):
+            tasks.append(i)
+    return tasks
+
+
+def _task_fields(line: str) -> Tuple[str, List[str]]:
+    name, metadata = line.split(":", 1)
+    return name, [item.strip() for item in metadata.split(",")]
+
+
+def _fix_gantt_date_format(lines: List[str], indexes: List[int]) -> None:
+    """Add or correct `dateFormat` so it matches the dates the tasks use."""
+    dates = []
+    for i in _gantt_tasks(lines, indexes):
+        dates.extend(item for item in _task_fields(lines[i])[1] if _DATE_LIKE.match(item))
+    format_line = next((i for i in indexes[1:] if lines[i].strip().startswith("dateFormat")), None)
+    current = lines[format_line].strip()[len("dateFormat"):].strip() if format_line is not None else ""
+    if not dates or (current and all(date_pattern(current).match(date) for date in dates)):
+        return
+    fitting = next((fmt for fmt in _DATE_FORMATS if all(date_pattern(fmt).match(date) for date in dates)), None)
+    if fitting is None:
+        return
+    if format_line is not None:
+        line = lines[format_line]
+        lines[format_line] = line[:len(line) - len(line.lstrip())] + "dateFormat " + fitting
+    else:
+        i, header = _header(lines, indexes)
+        lines[i] = header + "\n" + _indent_of(lines, indexes) + "dateFormat " + fitting
+
+
+def _fix_gantt_tasks(lines: List[str], indexes: List[int]) -> None:
+    """Tags first, spelled-out durations as Mermaid units, and `after` only on known ids."""
+    tasks = _gantt_tasks(lines, indexes)
+    known = set()
+    for i in tasks:
+        fields = [item for item in _task_fields(lines[i])[1] if item not in GANTT_TAGS]
+        if len(fields) == 3:
+            known.add(fields[0])
+
+    previous = None
+    for i in tasks:
+        name, items = _task_fields(lines[i])
+        tags = [item for item in items if item in GANTT_TAGS]
+        fields = [item for item in items if item not in GANTT_TAGS and item]
+        if fields:
+            spelled = _DURATION_WORDS.match(fields[-1])
+            if spelled and not GANTT_DURATION.match(fields[-1]):
+                fields[-1] = spelled.group(1) + _DURATION_UNITS.get(spelled.group(2)[0].lower(), "d")
+        if len(fields) >= 2 and fields[-2].startswith("after "):
+            refs = [ref for ref in fields[-2].split()[1:] if ref in known]
+            if refs:
+                fields[-2] = "after " + " ".join(refs)
+            elif previous:
+                fields[-2] = "after " + previous
+            else:
+                del fields[-2]
+        if len(fields) == 3:
+            previous = fields[0]
+        lines[i] = name + ":" + ", ".join(tags + fields)
+
+
+# ---------------------------------------------------------------------------
+# sequenceDiagram
+# ---------------------------------------------------------------------------
+def _fix_sequence_arrows(lines: List[str], indexes: List[int]) -> None:
+    """Rewrite =>, ==> and headless -> messages to ->>."""
+    for i in indexes[1:]:
+        line = lines[i]
+        head, sep, text = line.partition(":")
+        for pattern, replacement in _SEQ_ARROWS:
+            head = pattern.sub(replacement, head)
+        lines[i] = head + sep + text
+
+
+def _fix_sequence_blocks(lines: List[str], indexes: List[int]) -> None:
+    """Drop stray `end`s and close unclosed loop/alt/opt/... blocks."""
+    _close_blocks(lines, indexes, tuple(SEQ_BLOCKS))
+
+
+# ---------------------------------------------------------------------------
+# pie
+# ---------------------------------------------------------------------------
+def _fix_pie_slices(lines: List[str], indexes: List[int]) -> None:
+    """Quote slice labels and strip units (%, currency, thousands separators) from values."""
+    for i in indexes[1:]:
+        line = lines[i]
+        stripped = line.strip()
+        if stripped.startswith("title ") or stripped == "showData":
+            continue
+        match = _PIE_LINE.match(line)
+        if not match:
+            continue
+        value = re.sub(r"[^\d.]", "", match.group(3))
+        if not value:
+            continue
+        indent = line[:len(line) - len(line.lstrip())]
+        lines[i] = f'{indent}"{match.group(2).strip()}" : {value}'
+
+
+# ---------------------------------------------------------------------------
+# mindmap
+# ---------------------------------------------------------------------------
+def _fix_mindmap_shapes(lines: List[str], indexes: List[int]) -> None:
+    """Close node shapes the line opens but never closes."""
+    for i in indexes[1:]:
+        line = lines[i].rstrip()
+        stripped = line.strip()
+        match = NODE_ID.match(stripped)
+        start = match.end() if match else 0
+        for opener, closer in MINDMAP_SHAPES:
+            if stripped.startswith(opener, start):
+                if stripped.rfind(closer) <= start or not stripped.endswith(closer):
+                    lines[i] = line + closer
+                break
+
+
+# (name, chart types it applies to or None for all, fix); applied in order
+CATALOGUE: Tuple[Tuple[str, Optional[Tuple[str, ...]], Fix], ...] = (
+    ("strip_fences", None, _fix_fences),
+    ("header", None, _fix_header),
+    ("flow_arrows", ("flowchart",), _fix_flow_arrows),
+    ("flow_links", ("flowchart",), _fix_flow_links),
+    ("flow_labels", ("flowchart",), _fix_flow_labels),
+    ("flow_duplicate_ids", ("flowchart",), _fix_flow_duplicate_ids),
+    ("flow_blocks", ("flowchart",), _fix_flow_blocks),
+    ("gantt_date_format", ("gantt",), _fix_gantt_date_format),
+    ("gantt_tasks", ("gantt",), _fix_gantt_tasks),
+    ("sequence_arrows", ("sequenceDiagram",), _fix_sequence_arrows),
+    ("sequence_blocks", ("sequenceDiagram",), _fix_sequence_blocks),
+    ("pie_slices", ("pie",), _fix_pie_slices),
+    ("mindmap_shapes", ("mindmap",), _fix_mindmap_shapes),
+)
+
+
+class RepairResult:
+    """The chart after repair, the fixes that changed it and its final validation."""
+
+    __slots__ = ("code", "fixes", "validation")
+
+    def __init__(self, code: str, fixes: List[str], validation: MermaidValidation):
+        self.code = code
+        self.fixes = fixes
+        self.validation = validation
+
+    @property
+    def valid(self) -> bool:
+        return self.validation.valid
+
+
+def _apply(code: str, fix: Fix) -> str:
+    lines = code.split("\n")
+    indexes = [line_no - 1 for line_no, _ in significant_lines(code)]
+    if not indexes:
+        return code
+    fix(lines, indexes)
+    # Fixes blank out removed lines; drop them rather than leave gaps
+    return "\n".join(line for n, line in enumerate(lines) if line or n not in indexes)
+
+
+class MermaidRepairer:
+    """Run the fix catalogue over invalid charts and count how often it works."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {"attempts": 0, "repaired": 0, "failed": 0, "llm_fixes": 0, "llm_fixed": 0}
+        self._fixes: Dict[str, int] = {}
+
+    def repair(self, code: str) -> RepairResult:
+        """Repair `code` locally; valid input is returned unchanged and not counted."""
+        validation = validate_mermaid(code)
+        if validation.valid:
+            return RepairResult(code, [], validation)
+
+        applied = []
+        for name, chart_types, fix in CATALOGUE:
+            if chart_types is not None and detect_chart_type(code) not in chart_types:
+                continue
+            fixed = _apply(code, fix)
+            if fixed == code:
+                continue
+            code = fixed
+            applied.append(name)
+            validation = validate_mermaid(code)
+            if validation.valid:
+                break
+
+        with self._lock:
+            self._counters["attempts"] += 1
+            self._counters["repaired" if validation.valid else "failed"] += 1
+            if validation.valid:
+                for name in applied:
+                    self._fixes[name] = self._fixes.get(name, 0) + 1
+        return RepairResult(code, applied, validation)
+
+    def record_llm_fix(self, fixed: bool) -> None:
+        """Count a chart that local repair couldn't fix and was sent back to the LLM."""
+        with self._lock:
+            self._counters["llm_fixes"] += 1
+            if fixed:
+                self._counters["llm_fixed"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            fixes = dict(self._fixes)
+        return {
+            **counters,
+            "local_success_rate": counters["repaired"] / counters["attempts"] if counters["attempts"] else None,
+            "llm_success_rate": counters["llm_fixed"] / counters["llm_fixes"] if counters["llm_fixes"] else None,
+            "fixes": fixes,
+        }
+
+
+mermaid_repairer = MermaidRepairer()
@@ -0,0 +1,542 @@
+"""Local validator for the Mermaid subsets the DiagramAgent generates.
+
+Covers graph/flowchart, gantt, sequenceDiagram, pie, mindmap and journey
+with a line-oriented parser for each. It is strict where Mermaid's own
+parser fails (unquoted labels with brackets, unknown arrows, unclosed
+blocks, bad task metadata) and lenient elsewhere, because every false
+"invalid" verdict costs an LLM retry. Other diagram types Mermaid knows are
+accepted with a warning. Errors are (line number, message) pairs, 1-based
+against the original text.
+"""
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+Issue = Tuple[int, str]
+
+# Diagram types that are recognized but not parsed
+UNVALIDATED_TYPES = (
+    "classDiagram", "stateDiagram-v2", "stateDiagram", "erDiagram", "C4Context", "C4Container",
+    "C4Component", "C4Dynamic", "C4Deployment", "gitGraph", "timeline", "quadrantChart",
+    "requirementDiagram", "xychart-beta", "sankey-beta", "block-beta",
+)
+
+_HEADER = re.compile(r"^(graph|flowchart|gantt|sequenceDiagram|pie|mindmap|journey)\b")
+_ACCESSIBILITY = re.compile(r"^acc(Title|Descr)\s*[:{]")
+
+
+class MermaidValidation:
+    """Verdict for one chart."""
+
+    __slots__ = ("chart_type", "errors", "warnings")
+
+    def __init__(self, chart_type: Optional[str]):
+        self.chart_type = chart_type
+        self.errors: List[Issue] = []
+        self.warnings: List[Issue] = []
+
+    @property
+    def valid(self) -> bool:
+        return not self.errors
+
+    def error_messages(self) -> List[str]:
+        return [f"line {line}: {message}" for line, message in self.errors]
+
+    def to_dict(self) -> Dict:
+        return {
+            "valid": self.valid,
+            "chart_type": self.chart_type,
+            "errors": self.error_messages(),
+            "warnings": [f"line {line}: {message}" for line, message in self.warnings],
+        }
+
+
+def significant_lines(code: str) -> List[Tuple[int, str]]:
+    """(line number, raw line) pairs without blanks, %% comments, %%{init}%% directives and front matter."""
+    lines = code.splitlines()
+    result = []
+    i = 0
+    # YAML front matter (---\n...\n---) may precede the header
+    first = next((n for n, line in enumerate(lines) if line.strip()), None)
+    if first is not None and lines[first].strip() == "---":
+        for n in range(first + 1, len(lines)):
+            if lines[n].strip() == "---":
+                i = n + 1
+                break
+    in_directive = False
+    for n in range(i, len(lines)):
+        stripped = lines[n].strip()
+        if in_directive:
+            in_directive = "}%%" not in stripped
+            continue
+        if stripped.startswith("%%{"):
+            in_directive = "}%%" not in stripped
+            continue
+        if not stripped or stripped.startswith("%%"):
+            continue
+        result.append((n + 1, lines[n].rstrip()))
+    return result
+
+
+def detect_chart_type(code: str) -> Optional[str]:
+    """The diagram keyword of the chart's header line (e.g. "flowchart", "gantt"), or None."""
+    lines = significant_lines(code or "")
+    if not lines:
+        return None
+    header = lines[0][1].strip()
+    match = _HEADER.match(header)
+    if match:
+        return "flowchart" if match.group(1) == "graph" else match.group(1)
+    for chart_type in UNVALIDATED_TYPES:
+        if header.startswith(chart_type):
+            return chart_type
+    return None
+
+
+def validate_mermaid(code: str) -> MermaidValidation:
+    """Parse a chart and report line-level errors."""
+    lines = significant_lines(code or "")
+    if not lines:
+        result = MermaidValidation(None)
+        result.errors.append((1, "Empty chart code"))
+        return result
+
+    chart_type = detect_chart_type(code)
+    result = MermaidValidation(chart_type)
+    if chart_type is None:
+        line_no, header = lines[0]
+        result.errors.append((line_no, f"Unknown diagram type '{header.strip().split()[0]}'"))
+        return result
+
+    validator = _VALIDATORS.get(chart_type)
+    if validator is None:
+        result.warnings.append((lines[0][0], f"'{chart_type}' diagrams are not validated"))
+        return result
+    validator(lines, result)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# graph / flowchart
+# ---------------------------------------------------------------------------
+_FLOW_HEADER = re.compile(r"^(?:graph|flowchart)(?:[ \t]+([A-Za-z<>^v]+))?[ \t]*;?[ \t]*(.*)$")
+_FLOW_DIRECTIONS = {"TD", "TB", "BT", "RL", "LR", ">", "<", "^", "v"}
+NODE_ID = re.compile(r"\w+(?:-\w+)*")
+# (opening delimiter, accepted closing delimiters), longest openers first
+NODE_SHAPES = (
+    ("(((", (")))",)), ("([", ("])",)), ("[[", ("]]",)), ("[(", (")]",)), ("((", ("))",)),
+    ("{{", ("}}",)), ("[/", ("/]", "\\]")), ("[\\", ("\\]", "/]")), ("[", ("]",)), ("(", (")",)),
+    ("{", ("}",)), (">", ("]",)),
+)
+LABEL_FORBIDDEN = set('[](){}"')
+# (node id, id start, id end, shape with its label or "")
+FlowNode = Tuple[str, int, int, str]
+FLOW_LINK = re.compile(
+    r"<?(?:"
+    r"--[ \t]*[^\s\->|][^|]*?[ \t]*-{2,}[->ox]"  # -- text -->
+    r"|==[ \t]*[^\s=>|][^|]*?[ \t]*={2,}[=>ox]"  # == text ==>
+    r"|-\.[ \t]*[^\s.\->|][^|]*?[ \t]*\.-[>ox]?"  # -. text .->
+    r"|-{2,}[->ox]|={2,}[=>ox]|-\.+-[>ox]?|~{3,}"
+    r")"
+)
+_FLOW_KEYWORDS = ("classDef", "class", "style", "linkStyle", "click", "direction")
+
+
+def _skip_spaces(line: str, pos: int) -> int:
+    while pos < len(line) and line[pos] in " \t":
+        pos += 1
+    return pos
+
+
+def _parse_label(line: str, pos: int, opener: str, closers: Tuple[str, ...]) -> Tuple[int, Optional[str]]:
+    """Parse a node label after its opening delimiter; returns (end position, error)."""
+    start = _skip_spaces(line, pos)
+    if start < len(line) and line[start] == '"':
+        end_quote = line.find('"', start + 1)
+        if end_quote == -1:
+            return pos, "Unclosed quoted label"
+        after = _skip_spaces(line, end_quote + 1)
+        for closer in closers:
+            if line.startswith(closer, after):
+                return after + len(closer), None
+        return pos, f"Expected '{closers[0]}' after quoted label"
+
+    found = [(line.find(closer, pos), closer) for closer in closers]
+    found = [(index, closer) for index, closer in found if index != -1]
+    if not found:
+        return pos, f"Unclosed '{opener}' in node label"
+    index, closer = min(found)
+    label = line[pos:index]
+    if LABEL_FORBIDDEN.intersection(label):
+        return pos, f"Label '{label.strip()}' contains brackets or quotes; wrap it in double quotes"
+    return index + len(closer), None
+
+
+def _parse_node(line: str, pos: int, nodes: List[FlowNode]) -> Tuple[int, Optional[str]]:
+    match = NODE_ID.match(line, pos)
+    if not match:
+        return pos, f"Expected a node id at column {pos + 1}: '{line[pos:pos + 12]}'"
+    if match.group(0) == "end":
+        return pos, "'end' can't be used as a node id"
+    pos = match.end()
+    for opener, closers in NODE_SHAPES:
+        if line.startswith(opener, pos):
+            pos, error = _parse_label(line, pos + len(opener), opener, closers)
+            if error:
+                return pos, error
+            break
+    nodes.append((match.group(0), match.start(), match.end(), line[match.end():pos]))
+    if line.startswith(":::", pos):
+        class_name = NODE_ID.match(line, pos + 3)
+        if not class_name:
+            return pos, "Expected a class name after ':::'"
+        pos = class_name.end()
+    return pos, None
+
+
+def _parse_node_group(line: str, pos: int, nodes: List[FlowNode]) -> Tuple[int, Optional[str]]:
+    pos, error = _parse_node(line, pos, nodes)
+    while not error:
+        after = _skip_spaces(line, pos)
+        if after >= len(line) or line[after] != "&":
+            break
+        pos, error = _parse_node(line, _skip_spaces(line, after + 1), nodes)
+    return pos, error
+
+
+def _parse_flow_statements(line: str, nodes: List[FlowNode]) -> Optional[str]:
+    """Parse one line of node/link statements into `nodes`; returns the first error."""
+    pos = _skip_spaces(line, 0)
+    while pos < len(line):
+        pos, error = _parse_node_group(line, pos, nodes)
+        if error:
+            return error
+        while True:
+            pos = _skip_spaces(line, pos)
+            if pos >= len(line) or line[pos] == ";":
+                break
+            link = FLOW_LINK.match(line, pos)
+            if not link:
+                return f"Expected a link at column {pos + 1}: '{line[pos:pos + 12]}'"
+            pos = _skip_spaces(line, link.end())
+            if pos < len(line) and line[pos] == "|":
+                close = line.find("|", pos + 1)
+                if close == -1:
+                    return "Unclosed '|' link label"
+                pos = _skip_spaces(line, close + 1)
+            if pos >= len(line) or line[pos] == ";":
+                return "Link has no target node"
+            pos, error = _parse_node_group(line, pos, nodes)
+            if error:
+                return error
+        while pos < len(line) and line[pos] in "; \t":
+            pos += 1
+    return None
+
+
+def flow_nodes(line: str) -> Optional[List[FlowNode]]:
+    """The nodes of one flowchart statement line, or None if it doesn't parse."""
+    nodes: List[FlowNode] = []
+    return None if _parse_flow_statements(line, nodes) else nodes
+
+
+def _label_key(shape: str) -> str:
+    return " ".join(shape.replace('"', " ").split())
+
+
+def _validate_flowchart(lines: List[Tuple[int, str]], result: MermaidValidation) -> None:
+    header_line, header = lines[0]
+    match = _FLOW_HEADER.match(header.strip())
+    direction, rest = (match.group(1), match.group(2)) if match else (None, "")
+    if direction and direction not in _FLOW_DIRECTIONS:
+        result.errors.append((header_line, f"Unknown direction '{direction}'"))
+    body = ([(header_line, rest)] if rest else []) + lines[1:]
+
+    subgraphs: List[int] = []
+    labels: Dict[str, str] = {}
+    statements = 0
+    for line_no, raw in body:
+        line = raw.strip()
+        word = line.split(None, 1)[0]
+        if word == "subgraph":
+            subgraphs.append(line_no)
+            continue
+        if line.rstrip(";") == "end":
+            if not subgraphs:
+                result.errors.append((line_no, "'end' without a matching 'subgraph'"))
+            else:
+                subgraphs.pop()
+            continue
+        if word in _FLOW_KEYWORDS or _ACCESSIBILITY.match(line):
+            continue
+        nodes: List[FlowNode] = []
+        error = _parse_flow_statements(line, nodes)
+        if error:
+            result.errors.append((line_no, error))
+        for node_id, _, _, shape in nodes:
+            if not shape:
+                continue
+            label = labels.setdefault(node_id, shape)
+            if _label_key(label) != _label_key(shape):
+                result.errors.append((line_no, f"Node id '{node_id}' is already used for {label}; this merges two different steps"))
+        statements += 1
+
+    for line_no in subgraphs:
+        result.errors.append((line_no, "Unclosed 'subgraph' (missing 'end')"))
+    if not statements:
+        result.errors.append((header_line, "Flowchart has no nodes"))
+
+
+# ---------------------------------------------------------------------------
+# gantt
+# ---------------------------------------------------------------------------
+_GANTT_KEYWORDS = (
+    "title", "axisFormat", "tickInterval", "excludes", "includes", "todayMarker", "weekday",
+    "displayMode", "inclusiveEndDates", "topAxis", "section",
+)
+GANTT_TAGS = {"active", "done", "crit", "milestone"}
+GANTT_DURATION = re.compile(r"^\d+(?:\.\d+)?(?:ms|[smhdwMy])$")
+_TASK_ID = re.compile(r"^[A-Za-z_][\w-]*$")
+_AFTER = re.compile(r"^after\s+([\w-]+(?:\s+[\w-]+)*)$")
+_UNTIL = re.compile(r"^until\s+([\w-]+)$")
+# dayjs format tokens, longest first; lenient on digit counts
+_DATE_TOKENS = (
+    ("YYYY", r"\d{4}"), ("MMMM", r"[A-Za-z]+"), ("MMM", r"[A-Za-z]{3}"), ("YY", r"\d{2}"),
+    ("MM", r"\d{1,2}"), ("DD", r"\d{1,2}"), ("Do", r"\d{1,2}(?:st|nd|rd|th)"), ("HH", r"\d{1,2}"),
+    ("hh", r"\d{1,2}"), ("mm", r"\d{1,2}"), ("ss", r"\d{1,2}"), ("SSS", r"\d{3}"), ("M", r"\d{1,2}"),
+    ("D", r"\d{1,2}"), ("H", r"\d{1,2}"), ("h", r"\d{1,2}"), ("A", r"(?:AM|PM)"), ("a", r"(?:am|pm)"),
+    ("X", r"\d+"), ("x", r"\d+"), ("Z", r"[+-]\d{2}:?\d{2}"),
+)
+_date_patterns: Dict[str, "re.Pattern"] = {}
+
+
+def date_pattern(date_format: str) -> "re.Pattern":
+    pattern = _date_patterns.get(date_format)
+    if pattern is None:
+        parts = []
+        pos = 0
+        while pos < len(date_format):
+            for token, regex in _DATE_TOKENS:
+                if date_format.startswith(token, pos):
+                    parts.append(regex)
+                    pos += len(token)
+                    break
+            else:
+                parts.append(re.escape(date_format[pos]))
+                pos += 1
+        pattern = _date_patterns[date_format] = re.compile("^" + "".join(parts) + "$")
+    return pattern
+
+
+def _validate_gantt(lines: List[Tuple[int, str]], result: MermaidValidation) -> None:
+    date_format = None
+    tasks: List[Tuple[int, List[str]]] = []
+    for line_no, raw in lines[1:]:
+        line = raw.strip()
+        word = line.split(None, 1)[0]
+        if word == "dateFormat":
+            date_format = line[len("dateFormat"):].strip()
+            if not date_format:
+                result.errors.append((line_no, "'dateFormat' needs a format, e.g. YYYY-MM-DD"))
+            continue
+        if word in _GANTT_KEYWORDS or _ACCESSIBILITY.match(line):
+            continue
+        if ":" not in line:
+            result.errors.append((line_no, f"Expected 'Task name : metadata', got '{line[:40]}'"))
+            continue
+        name, metadata = line.split(":", 1)
+        if not name.strip():
+            result.errors.append((line_no, "Task has no name"))
+        tasks.append((line_no, [item.strip() for item in metadata.split(",")]))
+
+    if not tasks:
+        result.errors.append((lines[0][0], "Gantt chart has no tasks"))
+        return
+    if date_format is None:
+        result.warnings.append((lines[0][0], "No dateFormat; Mermaid assumes YYYY-MM-DD"))
+    date = date_pattern(date_format or "YYYY-MM-DD")
+
+    task_ids = set()
+    for _, items in tasks:
+        fields = [item for item in items if item not in GANTT_TAGS]
+        if len(fields) == 3 and _TASK_ID.match(fields[0]):
+            task_ids.add(fields[0])
+
+    def check_reference(line_no: int, ids: str) -> None:
+        for task_id in ids.split():
+            if task_id not in task_ids:
+                result.errors.append((line_no, f"Unknown task id '{task_id}'"))
+
+    for line_no, items in tasks:
+        tags = 0
+        while tags < len(items) and items[tags] in GANTT_TAGS:
+            tags += 1
+        fields = items[tags:]
+        if any(item in GANTT_TAGS for item in fields):
+            result.errors.append((line_no, "Tags (active, done, crit, milestone) must come first"))
+            continue
+        if not fields or len(fields) > 3 or not all(fields):
+            result.errors.append((line_no, "Task metadata must be '[tags,] [id,] [start,] end'"))
+            continue
+
+        end = fields[-1]
+        until = _UNTIL.match(end)
+        if until:
+            check_reference(line_no, until.group(1))
+        elif not GANTT_DURATION.match(end) and not date.match(end):
+            result.errors.append((line_no, f"'{end}' is neither a duration (e.g. 5d) nor a {date_format or 'YYYY-MM-DD'} date"))
+        if len(fields) >= 2:
+            start = fields[-2]
+            after = _AFTER.match(start)
+            if after:
+                check_reference(line_no, after.group(1))
+            elif not date.match(start):
+                result.errors.append((line_no, f"Start '{start}' is neither 'after <id>' nor a {date_format or 'YYYY-MM-DD'} date"))
+        if len(fields) == 3 and not _TASK_ID.match(fields[0]):
+            result.errors.append((line_no, f"Invalid task id '{fields[0]}'"))
+
+
+# ---------------------------------------------------------------------------
+# sequenceDiagram
+# ---------------------------------------------------------------------------
+_SEQ_MESSAGE = re.compile(
+    r"^(?P<source>[^\s:<>+\-][^:<>]*?)\s*(?P<arrow><<-{1,2}>>|-{1,2}>>|-{1,2}>|-{1,2}x|-{1,2}\))\s*[+-]?\s*"
+    r"(?P<target>[^\s:<>+\-][^:]*?)\s*(?::(?P<text>.*))?$"
+)
+_SEQ_PARTICIPANT = re.compile(r"^(?:create\s+)?(?:participant|actor)\s+\S")
+_SEQ_NOTE = re.compile(r"^[Nn]ote\s+(?:left of|right of|over)\s+[^:]+:")
+SEQ_BLOCKS = {"loop", "alt", "opt", "par", "critical", "break", "rect", "box"}
+_SEQ_BRANCHES = {"else": {"alt"}, "and": {"par"}, "option": {"critical"}}
+_SEQ_KEYWORDS = ("autonumber", "title", "activate", "deactivate", "destroy", "link", "links", "properties", "details")
+
+
+def _validate_sequence(lines: List[Tuple[int, str]], result: MermaidValidation) -> None:
+    blocks: List[Tuple[str, int]] = []
+    messages = 0
+    for line_no, raw in lines[1:]:
+        line = raw.strip()
+        word = line.split(None, 1)[0]
+        if word in SEQ_BLOCKS:
+            blocks.append((word, line_no))
+        elif word in _SEQ_BRANCHES:
+            if not blocks or blocks[-1][0] not in _SEQ_BRANCHES[word]:
+                result.errors.append((line_no, f"'{word}' outside of its '{'/'.join(sorted(_SEQ_BRANCHES[word]))}' block"))
+        elif line == "end":
+            if not blocks:
+                result.errors.append((line_no, "'end' without an open block"))
+            else:
+                blocks.pop()
+        elif _SEQ_PARTICIPANT.match(line) or _SEQ_NOTE.match(line) or word in _SEQ_KEYWORDS or _ACCESSIBILITY.match(line):
+            continue
+        elif word.lower() == "note":
+            result.errors.append((line_no, "Notes must be 'Note left of|right of|over <participant>: text'"))
+        else:
+            match = _SEQ_MESSAGE.match(line)
+            if not match:
+                result.errors.append((line_no, f"Expected a message like 'A->>B: text', got '{line[:40]}'"))
+            elif match.group("text") is None:
+                result.errors.append((line_no, "Message needs ': text' after the target"))
+            else:
+                messages += 1
+
+    for block, line_no in blocks:
+        result.errors.append((line_no, f"Unclosed '{block}' (missing 'end')"))
+    if not messages:
+        result.errors.append((lines[0][0], "Sequence diagram has no messages"))
+
+
+# ---------------------------------------------------------------------------
+# pie
+# ---------------------------------------------------------------------------
+_PIE_HEADER = re.compile(r"^pie(?:\s+showData)?(?:\s+title\s+.*)?$")
+_PIE_SLICE = re.compile(r'^"[^"]*"\s*:\s*(?P<value>[^\s]+)$')
+_NUMBER = re.compile(r"^\d+(?:\.\d+)?$")
+
+
+def _validate_pie(lines: List[Tuple[int, str]], result: MermaidValidation) -> None:
+    header_line, header = lines[0]
+    if not _PIE_HEADER.match(header.strip()):
+        result.errors.append((header_line, "Expected 'pie [showData] [title ...]'"))
+    slices = 0
+    for line_no, raw in lines[1:]:
+        line = raw.strip()
+        if line.startswith("title ") or line == "showData" or _ACCESSIBILITY.match(line):
+            continue
+        match = _PIE_SLICE.match(line)
+        if not match:
+            if ":" in line and not line.startswith('"'):
+                result.errors.append((line_no, "Slice labels must be double-quoted"))
+            else:
+                result.errors.append((line_no, f"Expected '\"label\" : value', got '{line[:40]}'"))
+        elif not _NUMBER.match(match.group("value")):
+            result.errors.append((line_no, f"Slice value '{match.group('value')}' must be a positive number"))
+        else:
+            slices += 1
+    if not slices:
+        result.errors.append((header_line, "Pie chart has no slices"))
+
+
+# ---------------------------------------------------------------------------
+# mindmap
+# ---------------------------------------------------------------------------
+MINDMAP_SHAPES = (("((", "))"), ("))", "(("), ("{{", "}}"), ("(", ")"), (")", "("), ("[", "]"))
+
+
+def _validate_mindmap(lines: List[Tuple[int, str]], result: MermaidValidation) -> None:
+    root_indent = None
+    for line_no, raw in lines[1:]:
+        line = raw.strip()
+        if line.startswith("::icon(") or line.startswith(":::"):
+            continue
+        indent = len(raw) - len(raw.lstrip())
+        if root_indent is None:
+            root_indent = indent
+        elif indent <= root_indent:
+            result.errors.append((line_no, "Mindmap can only have one root; indent this node under it"))
+
+        match = NODE_ID.match(line)
+        shape_start = match.end() if match else 0
+        for opener, closer in MINDMAP_SHAPES:
+            if line.startswith(opener, shape_start):
+                label_end = line.rfind(closer)
+                if label_end <= shape_start or not line.endswith(closer):
+                    result.errors.append((line_no, f"Unclosed '{opener}' in node"))
+                elif line[label_end + len(closer):].strip():
+                    result.errors.append((line_no, "Unexpected text after node shape"))
+                break
+    if root_indent is None:
+        result.errors.append((lines[0][0], "Mindmap has no nodes"))
+
+
+# ---------------------------------------------------------------------------
+# journey
+# ---------------------------------------------------------------------------
+def _validate_journey(lines: List[Tuple[int, str]], result: MermaidValidation) -> None:
+    tasks = 0
+    for line_no, raw in lines[1:]:
+        line = raw.strip()
+        word = line.split(None, 1)[0]
+        if word in ("title", "section") or _ACCESSIBILITY.match(line):
+            continue
+        parts = line.split(":")
+        if len(parts) < 2 or not parts[0].strip():
+            result.errors.append((line_no, f"Expected 'Task: score: actors', got '{line[:40]}'"))
+            continue
+        score = parts[1].strip()
+        if not _NUMBER.match(score):
+            result.errors.append((line_no, f"Score '{score}' must be a number (1-5)"))
+            continue
+        if not 1 <= float(score) <= 5:
+            result.warnings.append((line_no, f"Score {score} is outside 1-5"))
+        tasks += 1
+    if not tasks:
+        result.errors.append((lines[0][0], "Journey has no tasks"))
+
+
+_VALIDATORS: Dict[str, Callable[[List[Tuple[int, str]], MermaidValidation], None]] = {
+    "flowchart": _validate_flowchart,
+    "gantt": _validate_gantt,
+    "sequenceDiagram": _validate_sequence,
+    "pie": _validate_pie,
+    "mindmap": _validate_mindmap,
+    "journey": _validate_journey,
+}
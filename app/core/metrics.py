@@ -0,0 +1,292 @@
+import asyncio
+import functools
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import httpx
+
+# Latency buckets (seconds) sized for everything from a DB query to a full one-shot draft
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def total(self, **labels: str) -> float:
+        """Sum of every series whose labels match the given ones."""
+        wanted = [(self.labelnames.index(name), str(value)) for name, value in labels.items()]
+        with self._lock:
+            return sum(value for key, value in self._values.items() if all(key[i] == value_ for i, value_ in wanted))
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            values = dict(self._values)
+        for key, value in values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label values -> (per-bucket counts, sum, count)
+        self._values: Dict[LabelValues, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value, count + 1)
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        for key, (counts, total, count) in values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+
+class CallbackGauge(_Metric):
+    """Gauge whose values are read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], callback: Callable[[], Dict[LabelValues, float]]):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def _samples(self) -> Iterable[str]:
+        for key, value in self.callback().items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+llm_request_duration = registry.register(Histogram(
+    "llm_request_duration_seconds",
+    "Latency of LLM chat completion calls.",
+    ("agent", "task", "model", "attempt", "outcome"),
+))
+llm_tokens = registry.register(Counter(
+    "llm_tokens_total",
+    "Tokens consumed by LLM calls.",
+    ("agent", "task", "model", "kind"),
+))
+http_request_duration = registry.register(Histogram(
+    "http_client_request_duration_seconds",
+    "Latency of outbound HTTP requests.",
+    ("host", "method", "status"),
+))
+db_query_duration = registry.register(Histogram(
+    "db_query_duration_seconds",
+    "Latency of CRUD functions.",
+    ("operation", "outcome"),
+))
+
+
+def llm_outcome(error: Optional[BaseException]) -> str:
+    """Label value for how an LLM call ended."""
+    if error is None:
+        return "ok"
+    name = type(error).__name__
+    if name == "APITimeoutError":
+        return "timeout"
+    if name == "RateLimitError":
+        return "rate_limited"
+    return "error"
+
+
+def record_llm_usage(agent: str, task: Optional[str], model: str, usage) -> None:
+    """Count prompt/completion tokens from a Groq usage object (no-op when absent)."""
+    if usage is None:
+        return
+    for kind in ("prompt", "completion"):
+        tokens = getattr(usage, f"{kind}_tokens", None)
+        if tokens:
+            llm_tokens.inc(tokens, agent=agent, task=task or "default", model=model, kind=kind)
+
+
+# ---------------------------------------------------------------------------
+# httpx instrumentation
+# ---------------------------------------------------------------------------
+def _observe_request(request: httpx.Request, started: float, status: str) -> None:
+    http_request_duration.observe(
+        time.perf_counter() - started,
+        host=request.url.host,
+        method=request.method,
+        status=status,
+    )
+
+
+class TimedAsyncTransport(httpx.AsyncBaseTransport):
+    """Times every request sent through the wrapped transport, per host.
+
+    Requests that fail (timeouts, connect errors, resets) are recorded with
+    status "error" and abandoned ones with "cancelled", so the slowest requests
+    aren't missing from the histogram. The time runs until the response
+    headers arrive; streamed bodies are not included.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = await self._transport.handle_async_request(request)
+            status = str(response.status_code)
+            return response
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        finally:
+            _observe_request(request, started, status)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class TimedTransport(httpx.BaseTransport):
+    """Blocking counterpart of `TimedAsyncTransport`."""
+
+    def __init__(self, transport: httpx.BaseTransport):
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = self._transport.handle_request(request)
+            status = str(response.status_code)
+            return response
+        finally:
+            _observe_request(request, started, status)
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+def timed_async_transport(**kwargs) -> TimedAsyncTransport:
+    """An `httpx.AsyncHTTPTransport(**kwargs)` (e.g. `limits=`) with request timing."""
+    return TimedAsyncTransport(httpx.AsyncHTTPTransport(**kwargs))
+
+
+def timed_transport(**kwargs) -> TimedTransport:
+    """An `httpx.HTTPTransport(**kwargs)` with request timing."""
+    return TimedTransport(httpx.HTTPTransport(**kwargs))
+
+
+# ---------------------------------------------------------------------------
+# DB instrumentation
+# ---------------------------------------------------------------------------
+def timed_db(fn):
+    """Time an async CRUD function under its own name."""
+    operation = fn.__name__
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await fn(*args, **kwargs)
+            outcome = "ok"
+            return result
+        finally:
+            db_query_duration.observe(time.perf_counter() - started, operation=operation, outcome=outcome)
+
+    return wrapper
+
+
+def register_pool_metrics(engine) -> None:
+    """Expose SQLAlchemy connection pool occupancy as gauges."""
+    def pool_stats() -> Dict[LabelValues, float]:
+        pool = engine.pool
+        stats = {}
+        for state in ("size", "checkedin", "checkedout", "overflow"):
+            reader = getattr(pool, state, None)
+            if callable(reader):
+                stats[(state,)] = reader()
+        return stats
+
+    registry.register(CallbackGauge("db_pool_connections", "SQLAlchemy connection pool state.", ("state",), pool_stats))
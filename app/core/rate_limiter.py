@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import re
+import threading
+import time
+from typing import Dict, List, Mapping, Optional
+
+from app.core.config import settings
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """Parse Groq reset headers such as "7.66s", "2m59.56s" or "120ms" into seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    scale = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    return sum(float(amount) * scale[unit] for amount, unit in parts)
+
+
+def estimate_tokens(messages: List[Dict], completion_tokens: Optional[int] = None) -> int:
+    """Rough token estimate (~4 chars/token) used to reserve TPM budget up front."""
+    prompt_chars = sum(len(str(m.get("content") or "")) for m in messages)
+    return prompt_chars // 4 + (completion_tokens or settings.GROQ_COMPLETION_TOKEN_ESTIMATE)
+
+
+class TokenBucketRateLimiter:
+    """Limiter tracking both requests/min and tokens/min for one model.
+
+    Callers reserve capacity before each request. A reservation may drive a
+    bucket negative, in which case the caller waits until the deficit has been
+    refilled; this keeps callers roughly FIFO without a separate queue. State
+    is guarded by a threading lock so the async and blocking entry points can
+    share one instance.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.request_capacity = float(requests_per_minute)
+        self.token_capacity = float(tokens_per_minute)
+        self._request_rate = self.request_capacity / 60.0
+        self._token_rate = self.token_capacity / 60.0
+        self._requests = self.request_capacity
+        self._tokens = self.token_capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self._counters = {"acquired": 0, "waited": 0, "wait_seconds": 0.0, "rate_limited": 0}
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._requests = min(self.request_capacity, self._requests + elapsed * self._request_rate)
+            self._tokens = min(self.token_capacity, self._tokens + elapsed * self._token_rate)
+            self._updated = now
+
+    def reserve(self, tokens: int) -> float:
+        """Reserve one request and `tokens` tokens; returns how long to wait before sending."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._requests -= 1
+            self._tokens -= tokens
+            wait = max(
+                0.0,
+                -self._requests / self._request_rate if self._requests < 0 else 0.0,
+                -self._tokens / self._token_rate if self._tokens < 0 else 0.0,
+                self._blocked_until - now,
+            )
+            self._counters["acquired"] += 1
+            if wait > 0:
+                self._counters["waited"] += 1
+                self._counters["wait_seconds"] += wait
+            return wait
+
+    def expected_wait(self, tokens: int) -> float:
+        """How long a reservation of `tokens` would wait right now, without reserving."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            requests = self._requests - 1
+            remaining_tokens = self._tokens - tokens
+            return max(
+                0.0,
+                -requests / self._request_rate if requests < 0 else 0.0,
+                -remaining_tokens / self._token_rate if remaining_tokens < 0 else 0.0,
+                self._blocked_until - now,
+            )
+
+    async def acquire(self, tokens: int) -> None:
+        wait = self.reserve(tokens)
+        if wait > 0:
+            logging.info(f"Rate limiter: waiting {wait:.2f}s before next LLM request")
+            await asyncio.sleep(wait)
+
+    def acquire_blocking(self, tokens: int) -> None:
+        """Blocking variant for code that still runs in worker threads."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            logging.info(f"Rate limiter: waiting {wait:.2f}s before next LLM request")
+            time.sleep(wait)
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Return (or charge) the difference between the reserved and the real token usage."""
+        if actual_tokens is None:
+            return
+        with self._lock:
+            self._tokens = min(self.token_capacity, self._tokens + (estimated_tokens - actual_tokens))
+
+    def update_from_headers(self, headers: Mapping[str, str], rate_limited: bool = False) -> None:
+        """Align local state with the server's view of our quota.
+
+        `retry-after` (sent with 429s) blocks every caller until it elapses; the
+        `x-ratelimit-remaining-*` headers clamp the local buckets so we never
+        believe we have more budget than the server does.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+
+            retry_after = parse_reset_duration(headers.get("retry-after"))
+            if rate_limited:
+                self._counters["rate_limited"] += 1
+                if retry_after is None:
+                    retry_after = settings.GROQ_RATE_LIMIT_DEFAULT_BACKOFF
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+
+            for kind in ("requests", "tokens"):
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                if remaining is None:
+                    continue
+                try:
+                    remaining = float(remaining)
+                except ValueError:
+                    continue
+                if kind == "requests":
+                    self._requests = min(self._requests, remaining)
+                else:
+                    self._tokens = min(self._tokens, remaining)
+                if remaining <= 0:
+                    reset = parse_reset_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                    if reset:
+                        self._blocked_until = max(self._blocked_until, now + reset)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                **self._counters,
+                "wait_seconds": round(self._counters["wait_seconds"], 3),
+                "available_requests": round(self._requests, 2),
+                "available_tokens": round(self._tokens, 2),
+            }
+
+
+_limiters: Dict[str, TokenBucketRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def rate_limiter_for(model: str) -> TokenBucketRateLimiter:
+    """Process-wide limiter for a model; Groq enforces quotas per model."""
+    with _limiters_lock:
+        limiter = _limiters.get(model)
+        if limiter is None:
+            limiter = _limiters[model] = TokenBucketRateLimiter(
+                requests_per_minute=settings.GROQ_REQUESTS_PER_MINUTE,
+                tokens_per_minute=settings.GROQ_TOKENS_PER_MINUTE,
+            )
+        return limiter
+
+
+def rate_limiter_stats() -> Dict[str, Dict[str, float]]:
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {model: limiter.stats() for model, limiter in limiters.items()}
+
@@ -0,0 +1,72 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call:
+    """A shared in-flight task and the number of callers still awaiting it."""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one underlying call.
+
+    The first caller for a key starts the work as a task; callers arriving
+    while it is in flight await the same task. Each waiter is shielded, so a
+    cancelled caller does not cancel the work the others are waiting on, but
+    when the last waiter is cancelled the work is cancelled too and the key
+    dropped, so nothing keeps running that no one will read.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, _Call] = {}
+        self._counters = {"calls": 0, "executions": 0, "deduplicated": 0, "cancelled": 0}
+
+    def _finished(self, key: Hashable, call: _Call) -> None:
+        if self._inflight.get(key) is call:
+            del self._inflight[key]
+        task = call.task
+        # Mark the exception as retrieved in case every waiter was cancelled
+        if not task.cancelled() and task.exception() is not None:
+            logging.debug(f"SingleFlight '{self.name}': shared call failed: {task.exception()}")
+
+    def _abandon(self, key: Hashable, call: _Call) -> None:
+        """Cancel work whose every waiter was cancelled."""
+        if self._inflight.get(key) is call:
+            del self._inflight[key]
+        call.task.cancel()
+        self._counters["cancelled"] += 1
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        self._counters["calls"] += 1
+        call = self._inflight.get(key)
+        if call is None:
+            self._counters["executions"] += 1
+            call = _Call(asyncio.ensure_future(fn()))
+            self._inflight[key] = call
+            call.task.add_done_callback(lambda t: self._finished(key, call))
+        else:
+            self._counters["deduplicated"] += 1
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            # Only a cancelled waiter leaves before the task is done
+            if not call.waiters and not call.task.done():
+                self._abandon(key, call)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.name, **self._counters, "in_flight": len(self._inflight)}
+
+
+llm_singleflight = SingleFlight("llm")
+image_search_singleflight = SingleFlight("image_search")
@@ -1,15 +1,19 @@
+import datetime
 import logging
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, update, or_
 from sqlalchemy.orm import selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from . import models, schemas
+from .agents.rfp_digest_agent import rfp_digest_agent
+from .core.metrics import timed_db
 
 
 # ---------------------------------------------------------------------------
 # USER IMAGE CRUD
 # ---------------------------------------------------------------------------
 
+@timed_db
 async def get_user_images(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[models.UserImage]:
     """
     Retrieves a list of user images with pagination.
@@ -22,6 +26,7 @@ async def get_user_images(db: AsyncSession, skip: int = 0, limit: int = 100) ->
     )
     return result.scalars().all()
 
+@timed_db
 async def create_user_image(db: AsyncSession, image: schemas.UserImageCreate) -> models.UserImage:
     """
     Creates a new user image record in the database.
@@ -32,6 +37,7 @@ async def create_user_image(db: AsyncSession, image: schemas.UserImageCreate) ->
     await db.refresh(db_image)
     return db_image
 
+@timed_db
 async def delete_user_image(db: AsyncSession, image_id: int) -> Optional[models.UserImage]:
     """
     Deletes a user image from the database by its ID.
@@ -48,6 +54,7 @@ async def delete_user_image(db: AsyncSession, image_id: int) -> Optional[models.
 # IMAGE DELETION (correct version)
 # ---------------------------------------------------------------------------
 
+@timed_db
 async def delete_image_from_section(db: AsyncSession, section_id: int, image_id: int) -> models.Section:
     section = await get_section(db, section_id)
     if not section:
@@ -66,6 +73,7 @@ async def delete_image_from_section(db: AsyncSession, section_id: int, image_id:
 # PROPOSAL CRUD
 # ---------------------------------------------------------------------------
 
+@timed_db
 async def get_proposal(db: AsyncSession, proposal_id: int) -> Optional[dict]:
     result = await db.execute(
         select(models.Proposal).options(
@@ -110,6 +118,7 @@ async def get_proposal(db: AsyncSession, proposal_id: int) -> Optional[dict]:
     }
     return proposal_dict
 
+@timed_db
 async def add_image_to_section(db: AsyncSession, section_id: int, image: schemas.ImageCreate) -> models.Section:
     section = await get_section(db, section_id)
     if not section:
@@ -126,11 +135,13 @@ async def add_image_to_section(db: AsyncSession, section_id: int, image: schemas
     return section
 
 
+@timed_db
 async def get_proposals(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[models.Proposal]:
     result = await db.execute(select(models.Proposal).offset(skip).limit(limit))
     return result.scalars().all()
 
 
+@timed_db
 async def create_proposal(db: AsyncSession, proposal: schemas.ProposalCreate) -> models.Proposal:
     db_proposal = models.Proposal(**proposal.model_dump())
     db.add(db_proposal)
@@ -138,17 +149,21 @@ async def create_proposal(db: AsyncSession, proposal: schemas.ProposalCreate) ->
     await db.refresh(db_proposal)
     return await get_proposal(db, db_proposal.id)
 
+@timed_db
 async def update_proposal(db: AsyncSession, proposal_id: int, proposal: schemas.ProposalUpdate) -> Optional[dict]:
     result = await db.execute(select(models.Proposal).filter(models.Proposal.id == proposal_id))
     db_proposal = result.scalar_one_or_none()
     if not db_proposal:
         return None
     update_data = proposal.model_dump(exclude_unset=True)
+    rfp_changed = "rfpText" in update_data and update_data["rfpText"] != db_proposal.rfpText
     for key, value in update_data.items():
         setattr(db_proposal, key, value)
     db.add(db_proposal)
     await db.commit()
     await db.refresh(db_proposal)
+    if rfp_changed:
+        rfp_digest_agent.invalidate(proposal_id)
     return await get_proposal(db, db_proposal.id)
 
 
@@ -156,6 +171,7 @@ async def update_proposal(db: AsyncSession, proposal_id: int, proposal: schemas.
 # SECTION CRUD
 # ---------------------------------------------------------------------------
 
+@timed_db
 async def get_section(db: AsyncSession, section_id: int) -> Optional[models.Section]:
     result = await db.execute(
         select(models.Section)
@@ -164,6 +180,18 @@ async def get_section(db: AsyncSession, section_id: int) -> Optional[models.Sect
     return result.scalar_one_or_none()
 
 
+@timed_db
+async def get_section_at(db: AsyncSession, proposal_id: int, order: int) -> Optional[models.Section]:
+    result = await db.execute(
+        select(models.Section)
+        .where(models.Section.proposal_id == proposal_id, models.Section.order == order)
+        .order_by(models.Section.id.desc())
+        .limit(1)
+    )
+    return result.scalar_one_or_none()
+
+
+@timed_db
 async def create_section(db: AsyncSession, proposal_id: int, section: schemas.SectionCreate, order: Optional[int] = None) -> models.Section:
     # If an order is specified, shift existing sections to make space
     if order is not None:
@@ -210,6 +238,7 @@ async def create_section(db: AsyncSession, proposal_id: int, section: schemas.Se
     return db_section
 
 
+@timed_db
 async def update_section(db: AsyncSession, section_id: int, section: schemas.SectionUpdate) -> Optional[models.Section]:
     db_section = await get_section(db, section_id)
     if not db_section:
@@ -233,6 +262,7 @@ async def update_section(db: AsyncSession, section_id: int, section: schemas.Sec
     return db_section
 
 
+@timed_db
 async def delete_section(db: AsyncSession, section_id: int) -> Optional[models.Section]:
     db_section = await get_section(db, section_id)
     if db_section:
@@ -241,11 +271,13 @@ async def delete_section(db: AsyncSession, section_id: int) -> Optional[models.S
     return db_section
 
 
+@timed_db
 async def delete_sections_by_proposal_id(db: AsyncSession, proposal_id: int) -> None:
     await db.execute(models.Section.__table__.delete().where(models.Section.proposal_id == proposal_id))
     await db.commit()
 
 
+@timed_db
 async def reorder_sections(db: AsyncSession, reorder_requests: List[schemas.ReorderSection]) -> bool:
     for reorder_request in reorder_requests:
         db_section = await get_section(db, reorder_request.sectionId)
@@ -255,3 +287,118 @@ async def reorder_sections(db: AsyncSession, reorder_requests: List[schemas.Reor
     return True
 
 
+
+# ---------------------------------------------------------------------------
+# GENERATION JOB CRUD (these take a session on the job queue database)
+# ---------------------------------------------------------------------------
+
+@timed_db
+async def create_generation_job(db: AsyncSession, proposal_id: int, sections: Optional[List[str]] = None, strategy: Optional[str] = None) -> models.GenerationJob:
+    db_job = models.GenerationJob(proposal_id=proposal_id, sections_requested=sections, strategy=strategy, timings={})
+    db.add(db_job)
+    await db.commit()
+    await db.refresh(db_job)
+    return db_job
+
+
+@timed_db
+async def get_generation_job(db: AsyncSession, job_id: int) -> Optional[models.GenerationJob]:
+    result = await db.execute(
+        select(models.GenerationJob)
+        .filter(models.GenerationJob.id == job_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one_or_none()
+
+
+def _lease_expiry(lease_seconds: float) -> datetime.datetime:
+    return datetime.datetime.utcnow() + datetime.timedelta(seconds=lease_seconds)
+
+
+@timed_db
+async def claim_next_generation_job(db: AsyncSession, owner: str, lease_seconds: float) -> Optional[models.GenerationJob]:
+    """
+    Atomically moves the oldest queued job to "running" under a lease held by
+    `owner` and returns it.
+    The conditional update makes this safe with several workers or processes.
+    """
+    while True:
+        result = await db.execute(
+            select(models.GenerationJob.id)
+            .where(models.GenerationJob.status == "queued")
+            .order_by(models.GenerationJob.id)
+            .limit(1)
+        )
+        job_id = result.scalar_one_or_none()
+        if job_id is None:
+            return None
+
+        claimed = await db.execute(
+            update(models.GenerationJob)
+            .where(models.GenerationJob.id == job_id, models.GenerationJob.status == "queued")
+            .values(
+                status="running",
+                stage="starting",
+                attempts=models.GenerationJob.attempts + 1,
+                started_at=datetime.datetime.utcnow(),
+                owner=owner,
+                lease_expires_at=_lease_expiry(lease_seconds),
+            )
+        )
+        await db.commit()
+        if claimed.rowcount == 1:
+            return await get_generation_job(db, job_id)
+
+
+@timed_db
+async def update_generation_job(db: AsyncSession, job_id: int, owned_by: Optional[str] = None, **fields) -> bool:
+    """
+    Updates a job; with `owned_by`, only while that worker still owns it.
+    Returns whether the job was updated.
+    """
+    statement = update(models.GenerationJob).where(models.GenerationJob.id == job_id)
+    if owned_by is not None:
+        statement = statement.where(models.GenerationJob.owner == owned_by)
+    result = await db.execute(statement.values(**fields))
+    await db.commit()
+    return result.rowcount == 1
+
+
+@timed_db
+async def renew_generation_job_lease(db: AsyncSession, job_id: int, owner: str, lease_seconds: float) -> bool:
+    """
+    Extends `owner`'s lease on a running job.
+    Returns False if the job is no longer running under that owner.
+    """
+    result = await db.execute(
+        update(models.GenerationJob)
+        .where(
+            models.GenerationJob.id == job_id,
+            models.GenerationJob.owner == owner,
+            models.GenerationJob.status == "running",
+        )
+        .values(lease_expires_at=_lease_expiry(lease_seconds))
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+
+@timed_db
+async def requeue_expired_generation_jobs(db: AsyncSession) -> int:
+    """
+    Puts running jobs whose lease ran out back in the queue.
+    Their worker stopped renewing it: the process died or lost the database.
+    """
+    result = await db.execute(
+        update(models.GenerationJob)
+        .where(
+            models.GenerationJob.status == "running",
+            or_(
+                models.GenerationJob.lease_expires_at.is_(None),
+                models.GenerationJob.lease_expires_at < datetime.datetime.utcnow(),
+            ),
+        )
+        .values(status="queued", stage="queued", owner=None, lease_expires_at=None)
+    )
+    await db.commit()
+    return result.rowcount
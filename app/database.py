@@ -2,6 +2,7 @@ from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, Asyn
 from sqlalchemy.orm import declarative_base
 
 from .core.config import settings
+from .core.metrics import register_pool_metrics
 
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
@@ -12,6 +13,7 @@ engine = create_async_engine(
     pool_recycle=3600, # Recycle connections every hour
     echo=False # Set to True to see generated SQL statements
 )
+register_pool_metrics(engine)
 
 AsyncSessionLocal = async_sessionmaker(
     autocommit=False, 
@@ -22,6 +24,19 @@ AsyncSessionLocal = async_sessionmaker(
 
 Base = declarative_base()
 
+# The job queue can live in its own database (e.g. SQLite for local runs and tests)
+job_engine = create_async_engine(settings.JOB_QUEUE_DATABASE_URL) if settings.JOB_QUEUE_DATABASE_URL else engine
+
+JobSessionLocal = async_sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=job_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+)
+
+JobBase = declarative_base()
+
 
 def as_dict(self):
     return {c.name: getattr(self, c.name) for c in self.__table__.columns}
@@ -4,11 +4,14 @@ from dotenv import load_dotenv
 load_dotenv()
 from fastapi import FastAPI, HTTPException, Request
 from starlette.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from .api.v1.api import api_router
 from .core.config import settings
 from .database import Base, engine, AsyncSessionLocal
+from .core.llm_client import close_async_client
+from .core.metrics import registry as metrics_registry
+from .services.generation_jobs import generation_worker_pool, init_job_queue
 
 async def init_db():
     async with engine.begin() as conn:
@@ -31,6 +34,13 @@ async def value_error_exception_handler(request: Request, exc: ValueError):
 @app.on_event("startup")
 async def on_startup():
     await init_db()
+    await init_job_queue()
+    generation_worker_pool.start(settings.JOB_WORKERS)
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await generation_worker_pool.stop()
+    await close_async_client()
 
 # CORS
 if settings.BACKEND_CORS_ORIGINS:
@@ -45,6 +55,11 @@ if settings.BACKEND_CORS_ORIGINS:
 # Routers
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+# Prometheus scrape endpoint (kept outside the versioned API)
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
 # Temp Directory
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 TEMP_DIR = os.path.join(BASE_DIR, "..", "temp")
@@ -3,7 +3,7 @@ from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Text, Table
 from sqlalchemy.orm import relationship
 from sqlalchemy.types import JSON
 
-from .database import Base
+from .database import Base, JobBase
 import datetime
 
 class Proposal(Base):
@@ -47,3 +47,28 @@ class UserImage(Base):
     id = Column(Integer, primary_key=True, index=True)
     url = Column(String(255), nullable=False)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class GenerationJob(JobBase):
+    __tablename__ = "generation_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # No foreign key: the queue may live in a separate database
+    proposal_id = Column(Integer, index=True, nullable=False)
+    status = Column(String(20), index=True, nullable=False, default="queued")  # queued, running, succeeded, failed
+    stage = Column(String(50), nullable=False, default="queued")
+    sections_requested = Column(JSON, nullable=True)
+    strategy = Column(String(20), nullable=True)
+    # Generated sections are kept so a retry only re-runs the persistence step
+    result = Column(JSON, nullable=True)
+    sections_total = Column(Integer, nullable=False, default=0)
+    sections_done = Column(Integer, nullable=False, default=0)
+    sections_persisted = Column(Integer, nullable=False, default=0)
+    attempts = Column(Integer, nullable=False, default=0)
+    # Worker running the job and until when it holds it; see JOB_LEASE_SECONDS
+    owner = Column(String(100), nullable=True)
+    lease_expires_at = Column(DateTime, index=True, nullable=True)
+    error = Column(Text, nullable=True)
+    timings = Column(JSON, nullable=True, default=dict)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
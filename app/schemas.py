@@ -1,5 +1,5 @@
-from typing import List, Optional, Dict
-from pydantic import BaseModel
+from typing import List, Literal, Optional, Dict
+from pydantic import BaseModel, Field
 from datetime import date, datetime
 from enum import Enum
 
@@ -113,6 +113,22 @@ class SectionUpdate(BaseModel):
     chart_type: Optional[str] = None
     layout: Optional[str] = None
 
+class RfpDigest(BaseModel):
+    summary: str
+    key_requirements: List[str] = []
+    tech_mentions: List[str] = []
+    keywords: List[str] = []
+
+# Structured LLM outputs; list elements are validated one at a time so a
+# malformed element can be re-requested on its own
+class DraftSection(BaseModel):
+    title: str = Field(min_length=1)
+    contentHtml: str = Field(min_length=1)
+
+class TechStackItem(BaseModel):
+    name: str = Field(min_length=1)
+    description: str = Field(min_length=1)
+
 class ReorderSection(BaseModel):
     sectionId: int
     newOrder: int
@@ -123,11 +139,46 @@ class GenerateContentRequest(BaseModel):
 
 class GenerateProposalDraftRequest(BaseModel):
     sections: List[str]
+    # "one_shot" writes every section in one streamed call, "fan_out" one call per section; defaults to DRAFT_STRATEGY
+    strategy: Optional[Literal["one_shot", "fan_out"]] = None
+
+class GenerationJob(BaseModel):
+    id: int
+    proposal_id: int
+    status: str
+    stage: str
+    strategy: Optional[str] = None
+    sections_total: int
+    sections_done: int
+    sections_persisted: int
+    attempts: int
+    error: Optional[str] = None
+    timings: Dict[str, float] = {}
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
 
 class GenerateChartForSectionRequest(BaseModel):
     section_id: int
     description: str
     chart_type: str
+    regenerate: bool = False  # skip the chart cache and ask for a different chart
+    speculative: bool = False  # race several LLM candidates and keep the first valid one
+
+class AutoChart(BaseModel):
+    section_id: Optional[int] = None
+    title: Optional[str] = None
+    chart_type: str
+    confidence: float
+    chart_code: Optional[str] = None
+    reason: Optional[str] = None  # why no chart was generated
+
+class AutoChartsResponse(BaseModel):
+    charts: List[AutoChart] = []
+    failures: List[AutoChart] = []
 
 class EnhanceSectionRequest(BaseModel):
     section_id: int
@@ -0,0 +1,219 @@
+import asyncio
+import datetime
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from app import crud, models, schemas
+from app.agents.proposal_manager_agent import proposal_manager_agent
+from app.core.config import settings
+from app.database import AsyncSessionLocal, JobBase, JobSessionLocal, job_engine
+
+
+async def init_job_queue() -> None:
+    """Create the job table on the queue database."""
+    async with job_engine.begin() as conn:
+        await conn.run_sync(JobBase.metadata.create_all)
+
+
+async def enqueue_generation_job(proposal_id: int, sections: Optional[List[str]], strategy: Optional[str] = None) -> models.GenerationJob:
+    async with JobSessionLocal() as jobs_db:
+        job = await crud.create_generation_job(jobs_db, proposal_id, sections, strategy)
+    generation_worker_pool.notify()
+    return job
+
+
+class GenerationWorkerPool:
+    """Async workers that run queued draft generation jobs.
+
+    Jobs are claimed from the queue table, so they survive client disconnects
+    and restarts. A failed job is requeued until it has used
+    `JOB_MAX_ATTEMPTS`. The generated sections are saved on the job before
+    they're persisted, so a retry after a persistence failure doesn't
+    regenerate the draft.
+
+    A claimed job is leased to this pool for `JOB_LEASE_SECONDS` and the lease
+    renewed while it runs. Idle workers requeue jobs whose lease ran out, so
+    the jobs of a dead process are picked up again while those of live
+    workers in other processes are left alone. A worker that loses its lease
+    stops the job and writes nothing more to it.
+    """
+
+    def __init__(self):
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._workers: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+
+    def notify(self) -> None:
+        """Wake idle workers after a job was enqueued."""
+        self._wakeup.set()
+
+    def start(self, workers: int) -> None:
+        for n in range(workers):
+            self._workers.append(asyncio.create_task(self._work(n)))
+        if workers:
+            logging.info(f"Started {workers} generation worker(s)")
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+
+    async def _work(self, n: int) -> None:
+        while True:
+            try:
+                async with JobSessionLocal() as jobs_db:
+                    job = await crud.claim_next_generation_job(jobs_db, self.owner, settings.JOB_LEASE_SECONDS)
+                    if job is None and await self._requeue_expired(jobs_db):
+                        continue
+            except Exception as e:
+                logging.error(f"Generation worker {n} could not claim a job: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            logging.info(f"Generation worker {n} picked up job {job.id} (attempt {job.attempts})")
+            await self._run(job)
+
+    async def _requeue_expired(self, jobs_db) -> int:
+        requeued = await crud.requeue_expired_generation_jobs(jobs_db)
+        if requeued:
+            logging.warning(f"Requeued {requeued} generation job(s) whose worker stopped renewing its lease")
+        return requeued
+
+    async def _run(self, job: models.GenerationJob) -> None:
+        """Run a job while renewing its lease; stop it if the lease is lost."""
+        execution = asyncio.create_task(self._execute(job))
+        lease = asyncio.create_task(self._keep_lease(job.id, execution))
+        try:
+            await execution
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                raise
+            # Cancelled by _keep_lease; another worker may own the job now
+        finally:
+            lease.cancel()
+
+    async def _keep_lease(self, job_id: int, execution: asyncio.Task) -> None:
+        while True:
+            await asyncio.sleep(settings.JOB_LEASE_SECONDS / 3)
+            try:
+                async with JobSessionLocal() as jobs_db:
+                    renewed = await crud.renew_generation_job_lease(jobs_db, job_id, self.owner, settings.JOB_LEASE_SECONDS)
+            except Exception as e:
+                # The lease outlasts two missed renewals
+                logging.error(f"Could not renew the lease on generation job {job_id}: {e}")
+                continue
+            if not renewed:
+                logging.warning(f"Lost the lease on generation job {job_id}; stopping it")
+                execution.cancel()
+                return
+
+    async def _execute(self, job: models.GenerationJob) -> None:
+        started = time.monotonic()
+        timings: Dict[str, float] = dict(job.timings or {})
+        if job.created_at and job.started_at and "queued" not in timings:
+            timings["queued"] = round((job.started_at - job.created_at).total_seconds(), 3)
+
+        def mark(stage: str) -> Dict[str, float]:
+            timings[stage] = round(time.monotonic() - started, 3)
+            return dict(timings)
+
+        async with JobSessionLocal() as jobs_db:
+            async def update(**fields) -> None:
+                # A no-op once the lease is lost
+                await crud.update_generation_job(jobs_db, job.id, owned_by=self.owner, **fields)
+
+            try:
+                async with AsyncSessionLocal() as db:
+                    sections = job.result
+                    if sections is None:
+                        sections = await self._generate(job, db, update, mark)
+                        await update(result=sections, sections_total=len(sections), stage="persisting", timings=mark("generated"))
+                    else:
+                        await update(stage="persisting")
+
+                    for index in range(job.sections_persisted, len(sections)):
+                        section = schemas.SectionCreate(**sections[index])
+                        if index == job.sections_persisted and await self._already_persisted(db, job, index, section):
+                            logging.info(f"Generation job {job.id}: section {index} was saved by a previous attempt")
+                        else:
+                            await crud.create_section(db, job.proposal_id, section, index)
+                        await update(sections_persisted=index + 1)
+
+                await update(
+                    status="succeeded", stage="done", error=None, timings=mark("persisted"),
+                    finished_at=datetime.datetime.utcnow(), lease_expires_at=None,
+                )
+                logging.info(f"Generation job {job.id} finished in {timings['persisted']}s")
+            except asyncio.CancelledError:
+                # Shutting down: hand the job back so the next start picks it up
+                await asyncio.shield(update(status="queued", stage="queued", owner=None, lease_expires_at=None))
+                raise
+            except Exception as e:
+                retry = job.attempts < settings.JOB_MAX_ATTEMPTS and not isinstance(e, LookupError)
+                logging.exception(f"Generation job {job.id} failed (attempt {job.attempts}/{settings.JOB_MAX_ATTEMPTS})")
+                await update(
+                    status="queued" if retry else "failed",
+                    stage="queued" if retry else "failed",
+                    error=str(e) or type(e).__name__,
+                    timings=dict(timings),
+                    finished_at=None if retry else datetime.datetime.utcnow(),
+                    owner=None if retry else self.owner,
+                    lease_expires_at=None,
+                )
+                if retry:
+                    self.notify()
+
+    async def _already_persisted(self, db, job: models.GenerationJob, index: int, section: schemas.SectionCreate) -> bool:
+        """Whether an earlier attempt saved this section but stopped before counting it.
+
+        The section and the job counter are committed separately (the queue may
+        be in another database), so a crash or lost lease between the two
+        leaves the counter one behind. Such a section sits at its draft index
+        with the same title and content.
+        """
+        if job.attempts < 2:
+            return False
+        existing = await crud.get_section_at(db, job.proposal_id, index)
+        return existing is not None and existing.title == section.title and (existing.contentHtml or "") == (section.contentHtml or "")
+
+    async def _generate(self, job: models.GenerationJob, db, update, mark) -> List[Dict]:
+        proposal = await crud.get_proposal(db, job.proposal_id)
+        if not proposal:
+            raise LookupError(f"Proposal {job.proposal_id} not found")
+        await update(stage="generating")
+
+        sections_done = 0
+
+        async def on_event(event: Dict) -> None:
+            nonlocal sections_done
+            if event["event"] == "content_parsed":
+                await update(stage="post_processing", sections_total=event["data"]["count"], timings=mark("content_parsed"))
+            elif event["event"] == "section_ready":
+                sections_done += 1
+                await update(sections_done=sections_done)
+
+        draft = await proposal_manager_agent.generate_proposal_draft(
+            schemas.Proposal(**proposal), db, sections=job.sections_requested, strategy=job.strategy, on_event=on_event
+        )
+        sections = jsonable_encoder(draft.get("sections", []))
+        for section_data in sections:
+            if section_data.get("contentHtml") is None:
+                section_data["contentHtml"] = ""
+        return sections
+
+
+generation_worker_pool = GenerationWorkerPool()
@@ -0,0 +1,7 @@
+import os
+
+# Required settings without defaults; real deployments take them from .env
+os.environ.setdefault("PROJECT_NAME", "proposal-generator-tests")
+os.environ.setdefault("API_V1_STR", "/api/v1")
+os.environ.setdefault("GROQ_API_KEY", "test")
+os.environ.setdefault("PIXABAY_API_KEY", "test")
@@ -0,0 +1,19 @@
+import pytest
+
+from app.benchmarks.chart_type_corpus import CORPUS
+from app.core.chart_classifier import CHART_TYPES, NO_CHART, classify_chart
+
+
+@pytest.mark.parametrize("title, content, expected", CORPUS, ids=[title for title, _, _ in CORPUS])
+def test_suggestion_matches_label(title, content, expected):
+    suggestion = classify_chart(title, content)
+    assert suggestion.chart_type == expected, suggestion.to_dict()
+
+
+def test_corpus_labels_are_known_types():
+    assert {expected for _, _, expected in CORPUS} <= set(CHART_TYPES) | {NO_CHART}
+
+
+def test_empty_section_gets_no_chart():
+    suggestion = classify_chart("", "")
+    assert (suggestion.chart_type, suggestion.confidence) == (NO_CHART, 1.0)
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from app.agents.diagram_agent import ChartGenerationError, DiagramAgent, diagram_agent
+
+
+class _FakeModel:
+    """Stands in for `_acall_model`: answers after `delay` seconds and records what happened to each call."""
+
+    def __init__(self, delay: float, content: str = "graph TD\n    A --> B"):
+        self.delay = delay
+        self.content = content
+        self.started = 0
+        self.finished = 0
+        self.cancelled = 0
+
+    async def __call__(self, messages, model, route, final=True, task=None, attempt=1) -> str:
+        self.started += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        self.finished += 1
+        return self.content
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    monkeypatch.setattr(diagram_agent, "_backoff_delay", lambda attempt: 0.0)
+    return diagram_agent
+
+
+def _counts(model: _FakeModel):
+    return model.started, model.finished, model.cancelled
+
+
+def test_deadline_cancels_the_in_flight_call(agent: DiagramAgent, monkeypatch):
+    model = _FakeModel(delay=1.0)
+    monkeypatch.setattr(agent, "_acall_model", model)
+
+    async def scenario():
+        with pytest.raises(ChartGenerationError, match="Deadline exceeded"):
+            await agent._agenerate_chart("test: deadline cancels the call", deadline=0.1, refresh=True)
+        await asyncio.sleep(0.05)
+        return _counts(model)
+
+    assert asyncio.run(scenario()) == (1, 0, 1)
+
+
+def test_cancelling_the_caller_cancels_the_in_flight_call(agent: DiagramAgent, monkeypatch):
+    model = _FakeModel(delay=1.0)
+    monkeypatch.setattr(agent, "_acall_model", model)
+
+    async def scenario():
+        caller = asyncio.ensure_future(agent._agenerate_chart("test: caller cancels the call", refresh=True))
+        await asyncio.sleep(0.05)
+        caller.cancel()
+        await asyncio.gather(caller, return_exceptions=True)
+        await asyncio.sleep(0.05)
+        return _counts(model)
+
+    assert asyncio.run(scenario()) == (1, 0, 1)
+
+
+def test_speculative_losers_are_cancelled(agent: DiagramAgent, monkeypatch):
+    model = _FakeModel(delay=1.0)
+
+    async def first_candidate_wins(messages, model_name, route, final=True, task=None, attempt=1):
+        # Variants carry a "(Variant n: ...)" suffix; the plain prompt answers at once
+        model.delay = 1.0 if "(Variant" in messages[-1]["content"] else 0.01
+        return await model(messages, model_name, route, final, task, attempt)
+
+    monkeypatch.setattr(agent, "_acall_model", first_candidate_wins)
+
+    async def scenario():
+        chart = await agent._aspeculate_chart("test: speculative losers", candidates=3, max_calls=5, refresh=True)
+        await asyncio.sleep(0.05)
+        return chart, _counts(model)
+
+    chart, counts = asyncio.run(scenario())
+    assert chart.startswith("graph TD")
+    assert counts == (3, 1, 2)
+
+
+@pytest.mark.parametrize("retries, deadline", [(0, None), (3, 0.0)])
+def test_no_attempt_is_reported_as_such(agent: DiagramAgent, monkeypatch, retries, deadline):
+    model = _FakeModel(delay=0.0)
+    monkeypatch.setattr(agent, "_acall_model", model)
+
+    with pytest.raises(ChartGenerationError, match="after 0 attempt"):
+        asyncio.run(agent._agenerate_chart("test: no attempt", retries=retries, deadline=deadline))
+    assert model.started == 0
@@ -0,0 +1,87 @@
+import asyncio
+from types import SimpleNamespace
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app import crud, models, schemas
+from app.database import Base, JobBase
+from app.services.generation_jobs import GenerationWorkerPool
+
+
+def _run(scenario):
+    async def with_queue():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(JobBase.metadata.create_all)
+        sessions = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        try:
+            async with sessions() as db:
+                return await scenario(db)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(with_queue())
+
+
+def test_live_lease_is_not_requeued():
+    async def scenario(db):
+        job = await crud.create_generation_job(db, proposal_id=1)
+        claimed = await crud.claim_next_generation_job(db, "worker-a", lease_seconds=60)
+        requeued = await crud.requeue_expired_generation_jobs(db)
+        job = await crud.get_generation_job(db, job.id)
+        return claimed.owner, requeued, job.status
+
+    assert _run(scenario) == ("worker-a", 0, "running")
+
+
+def test_expired_lease_is_requeued_and_its_owner_locked_out():
+    async def scenario(db):
+        job = await crud.create_generation_job(db, proposal_id=1)
+        await crud.claim_next_generation_job(db, "worker-a", lease_seconds=-1)
+        requeued = await crud.requeue_expired_generation_jobs(db)
+        reclaimed = await crud.claim_next_generation_job(db, "worker-b", lease_seconds=60)
+        renewed = await crud.renew_generation_job_lease(db, job.id, "worker-a", lease_seconds=60)
+        updated = await crud.update_generation_job(db, job.id, owned_by="worker-a", status="succeeded")
+        job = await crud.get_generation_job(db, job.id)
+        return requeued, reclaimed.owner, reclaimed.attempts, renewed, updated, job.status
+
+    assert _run(scenario) == (1, "worker-b", 2, False, False, "running")
+
+
+def test_owner_renews_its_lease():
+    async def scenario(db):
+        job = await crud.create_generation_job(db, proposal_id=1)
+        claimed = await crud.claim_next_generation_job(db, "worker-a", lease_seconds=1)
+        first_expiry = claimed.lease_expires_at
+        renewed = await crud.renew_generation_job_lease(db, job.id, "worker-a", lease_seconds=60)
+        job = await crud.get_generation_job(db, job.id)
+        return renewed, job.lease_expires_at > first_expiry
+
+    assert _run(scenario) == (True, True)
+
+
+def test_section_saved_by_an_interrupted_attempt_is_not_saved_again():
+    async def scenario():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        try:
+            async with AsyncSession(engine, expire_on_commit=False) as db:
+                db.add(models.Proposal(id=1, clientName="Acme"))
+                await db.commit()
+                section = schemas.SectionCreate(title="Timeline", contentHtml="<p>Q1</p>")
+                await crud.create_section(db, 1, section, 0)
+
+                pool = GenerationWorkerPool()
+                retry, first_attempt = SimpleNamespace(proposal_id=1, attempts=2), SimpleNamespace(proposal_id=1, attempts=1)
+                other = schemas.SectionCreate(title="Timeline", contentHtml="<p>Q2</p>")
+                return (
+                    await pool._already_persisted(db, retry, 0, section),
+                    await pool._already_persisted(db, first_attempt, 0, section),
+                    await pool._already_persisted(db, retry, 0, other),
+                    await pool._already_persisted(db, retry, 1, section),
+                )
+        finally:
+            await engine.dispose()
+
+    assert asyncio.run(scenario()) == (True, False, False, False)
@@ -0,0 +1,89 @@
+import asyncio
+
+from app.core.hedging import Hedger
+
+
+def _warm(hedger: Hedger, key: str, seconds: float) -> None:
+    for _ in range(hedger.min_samples):
+        hedger.latencies.record(key, seconds)
+
+
+def test_cancelling_the_caller_cancels_the_attempt():
+    async def scenario():
+        hedger = Hedger("test", percentile=95.0, min_samples=5, max_rate=1.0, window=50)
+        # The hedge delay (0.1 s) is still running when the caller gives up
+        _warm(hedger, "key", 0.1)
+        events = []
+
+        async def attempt():
+            try:
+                await asyncio.sleep(1.0)
+            except asyncio.CancelledError:
+                events.append("cancelled")
+                raise
+            events.append("finished")
+
+        caller = asyncio.ensure_future(hedger.run("key", attempt))
+        await asyncio.sleep(0.05)
+        caller.cancel()
+        await asyncio.gather(caller, return_exceptions=True)
+        await asyncio.sleep(0.01)
+        return list(events)
+
+    assert asyncio.run(scenario()) == ["cancelled"]
+
+
+def test_slow_attempt_is_hedged_and_the_loser_cancelled():
+    async def scenario():
+        hedger = Hedger("test", percentile=95.0, min_samples=5, max_rate=1.0, window=50)
+        _warm(hedger, "key", 0.05)
+        durations = iter([1.0, 0.01])
+        events = []
+
+        async def attempt():
+            duration = next(durations)
+            try:
+                await asyncio.sleep(duration)
+            except asyncio.CancelledError:
+                events.append(f"cancelled {duration}")
+                raise
+            return duration
+
+        result = await hedger.run("key", attempt)
+        await asyncio.sleep(0.01)
+        return result, list(events), hedger.stats()
+
+    result, events, stats = asyncio.run(scenario())
+    assert result == 0.01
+    assert events == ["cancelled 1.0"]
+    assert stats["hedge_wins"] == 1
+
+
+def test_losing_and_failed_attempts_are_recorded():
+    async def scenario():
+        hedger = Hedger("test", percentile=95.0, min_samples=5, max_rate=1.0, window=50)
+        _warm(hedger, "key", 0.05)
+        durations = iter([0.3, 0.01])
+
+        async def attempt():
+            await asyncio.sleep(next(durations))
+            return "ok"
+
+        await hedger.run("key", attempt)
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream error")
+
+        hedger_without_samples = Hedger("test", percentile=95.0, min_samples=5, max_rate=1.0, window=50)
+        try:
+            await hedger_without_samples.run("key", failing)
+        except RuntimeError:
+            pass
+        return sorted(hedger.latencies._samples["key"]), hedger_without_samples.latencies.stats()["key"]["samples"]
+
+    samples, failed_samples = asyncio.run(scenario())
+    # The winning hedge and the slow primary, which had run for at least the hedge delay
+    assert len(samples) == 7
+    assert sum(1 for sample in samples if sample >= 0.05) == 6
+    assert failed_samples == 1
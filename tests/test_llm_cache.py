@@ -0,0 +1,41 @@
+import asyncio
+
+from app.agents.diagram_agent import diagram_agent
+from app.core.config import LLMRoute
+from app.core.llm_cache import llm_cache_key
+
+MESSAGES = [{"role": "user", "content": "List three colours."}]
+
+
+def _key(task="section", **route) -> str:
+    return llm_cache_key(task, LLMRoute(model="m", **route), "system", MESSAGES)
+
+
+def test_key_covers_the_output_contract():
+    assert _key() == _key()
+    assert _key(json_mode=True) != _key()
+    assert _key(max_tokens=24) != _key(max_tokens=1024)
+    assert _key(temperature=0.2) != _key()
+    assert _key(task="image_query") != _key()
+
+
+def test_refresh_does_not_join_an_in_flight_request(monkeypatch):
+    calls = []
+
+    async def call_model(messages, model, route, final=True, task=None, attempt=1):
+        calls.append(attempt)
+        answer = f"answer {len(calls)}"
+        await asyncio.sleep(0.05)
+        return answer
+
+    monkeypatch.setattr(diagram_agent, "_acall_model", call_model)
+
+    async def scenario():
+        messages = [{"role": "user", "content": "test: refresh bypasses coalescing"}]
+        return await asyncio.gather(
+            diagram_agent._acreate_completion(messages, task="chart", refresh_cache=True),
+            diagram_agent._acreate_completion(messages, task="chart", refresh_cache=True),
+        )
+
+    assert sorted(asyncio.run(scenario())) == ["answer 1", "answer 2"]
+    assert len(calls) == 2
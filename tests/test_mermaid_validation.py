@@ -0,0 +1,35 @@
+import pytest
+
+from app.benchmarks.mermaid_corpus import CORPUS, REPAIRS
+from app.core.mermaid_repair import MermaidRepairer
+from app.core.mermaid_validator import validate_mermaid
+
+VALID = [(name, code) for name, code, expected in CORPUS if expected]
+INVALID = [(name, code) for name, code, expected in CORPUS if not expected]
+
+
+def test_repairs_name_invalid_corpus_charts():
+    assert set(REPAIRS) <= {name for name, _ in INVALID}
+
+
+@pytest.mark.parametrize("name, code, expected", CORPUS, ids=[name for name, _, _ in CORPUS])
+def test_verdict_matches_label(name, code, expected):
+    result = validate_mermaid(code)
+    assert result.valid == expected, "; ".join(result.error_messages()) or "no errors"
+
+
+@pytest.mark.parametrize("name, code", INVALID, ids=[name for name, _ in INVALID])
+def test_repair(name, code):
+    result = MermaidRepairer().repair(code)
+    if name in REPAIRS:
+        assert result.valid, "; ".join(result.validation.error_messages())
+        assert tuple(result.fixes) == REPAIRS[name]
+    else:
+        # Left for the LLM; the repair must not claim otherwise
+        assert result.valid == validate_mermaid(result.code).valid
+
+
+@pytest.mark.parametrize("name, code", VALID, ids=[name for name, _ in VALID])
+def test_repair_leaves_valid_charts_alone(name, code):
+    result = MermaidRepairer().repair(code)
+    assert (result.code, result.fixes) == (code, [])
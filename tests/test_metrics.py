@@ -0,0 +1,38 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.metrics import TimedAsyncTransport, TimedTransport, http_request_duration
+
+
+def _count(host: str, status: str) -> int:
+    values = http_request_duration._values.get((host, "GET", status))
+    return values[2] if values else 0
+
+
+def _handler(request: httpx.Request) -> httpx.Response:
+    if request.url.host == "down.test":
+        raise httpx.ConnectError("connection refused", request=request)
+    return httpx.Response(204)
+
+
+def test_async_requests_are_timed_including_failures():
+    async def scenario():
+        async with httpx.AsyncClient(transport=TimedAsyncTransport(httpx.MockTransport(_handler))) as client:
+            await client.get("http://up.test/")
+            with pytest.raises(httpx.ConnectError):
+                await client.get("http://down.test/")
+
+    before = _count("up.test", "204"), _count("down.test", "error")
+    asyncio.run(scenario())
+    assert (_count("up.test", "204"), _count("down.test", "error")) == (before[0] + 1, before[1] + 1)
+
+
+def test_blocking_requests_are_timed_including_failures():
+    before = _count("up.test", "204"), _count("down.test", "error")
+    with httpx.Client(transport=TimedTransport(httpx.MockTransport(_handler))) as client:
+        client.get("http://up.test/")
+        with pytest.raises(httpx.ConnectError):
+            client.get("http://down.test/")
+    assert (_count("up.test", "204"), _count("down.test", "error")) == (before[0] + 1, before[1] + 1)
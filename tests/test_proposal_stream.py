@@ -0,0 +1,60 @@
+import asyncio
+
+from app.api.v1.endpoints.proposals import _with_heartbeat
+
+
+class _Source:
+    """An event stream that goes quiet after its first event and records being closed."""
+
+    def __init__(self):
+        self.closed = False
+
+    async def events(self):
+        try:
+            yield "event: first\n\n"
+            await asyncio.sleep(10)
+            yield "event: second\n\n"
+        finally:
+            self.closed = True
+
+
+def test_heartbeat_fills_quiet_periods():
+    async def scenario():
+        source = _Source()
+        stream = _with_heartbeat(source.events(), interval=0.05)
+        received = [await stream.__anext__(), await stream.__anext__()]
+        await stream.aclose()
+        return received
+
+    assert asyncio.run(scenario()) == ["event: first\n\n", ": keep-alive\n\n"]
+
+
+def test_disconnect_while_waiting_for_an_event_closes_the_source():
+    async def scenario():
+        source = _Source()
+        stream = _with_heartbeat(source.events(), interval=0.05)
+        await stream.__anext__()
+        # The source's next event is pending when the client goes away
+        await stream.__anext__()
+        await stream.aclose()
+        return source.closed
+
+    assert asyncio.run(scenario())
+
+
+def test_cancelled_response_closes_the_source():
+    async def scenario():
+        source = _Source()
+        received = []
+
+        async def respond():
+            async for chunk in _with_heartbeat(source.events(), interval=1.0):
+                received.append(chunk)
+
+        response = asyncio.ensure_future(respond())
+        await asyncio.sleep(0.05)
+        response.cancel()
+        await asyncio.gather(response, return_exceptions=True)
+        return list(received), source.closed
+
+    assert asyncio.run(scenario()) == (["event: first\n\n"], True)
@@ -0,0 +1,74 @@
+import asyncio
+
+from app.core.singleflight import SingleFlight
+
+
+class _Work:
+    """A slow call that records whether it ran to completion or was cancelled."""
+
+    def __init__(self):
+        self.started = 0
+        self.finished = 0
+        self.cancelled = 0
+
+    async def __call__(self) -> str:
+        self.started += 1
+        try:
+            await asyncio.sleep(0.2)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        self.finished += 1
+        return "done"
+
+
+def test_waiters_share_one_call():
+    async def scenario():
+        flight, work = SingleFlight("test"), _Work()
+        results = await asyncio.gather(flight.do("key", work), flight.do("key", work))
+        return flight, work, results
+
+    flight, work, results = asyncio.run(scenario())
+    assert results == ["done", "done"]
+    assert work.started == 1
+    assert flight.stats()["deduplicated"] == 1
+
+
+def test_cancelling_one_waiter_keeps_the_call_running():
+    async def scenario():
+        flight, work = SingleFlight("test"), _Work()
+        first = asyncio.ensure_future(flight.do("key", work))
+        second = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        return flight, work, first, await second
+
+    flight, work, first, result = asyncio.run(scenario())
+    assert first.cancelled()
+    assert result == "done"
+    assert (work.finished, work.cancelled) == (1, 0)
+    assert flight.stats()["cancelled"] == 0
+
+
+def test_cancelling_every_waiter_cancels_the_call():
+    async def scenario():
+        flight, work = SingleFlight("test"), _Work()
+        waiters = [asyncio.ensure_future(flight.do("key", work)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        waiters[0].cancel()
+        await asyncio.sleep(0.01)
+        assert flight.stats()["in_flight"] == 1
+        waiters[1].cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        # Let the shared task see its cancellation
+        await asyncio.sleep(0.01)
+        in_flight = flight.stats()["in_flight"]
+        # A new call for the key starts fresh work instead of joining the cancelled one
+        again = await flight.do("key", work)
+        return flight, work, in_flight, again
+
+    flight, work, in_flight, again = asyncio.run(scenario())
+    assert in_flight == 0
+    assert (work.started, work.finished, work.cancelled) == (2, 1, 1)
+    assert again == "done"
+    assert flight.stats()["cancelled"] == 1